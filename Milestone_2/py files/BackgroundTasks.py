@@ -0,0 +1,161 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_WORKERS = 2
+# Datasets at least this large are searched and filtered on a worker thread
+BACKGROUND_ROWS = 200000
+
+
+def _wx_call_after(function, *args):
+    import wx  # Only needed once a task finishes, so this module loads without wx
+    wx.CallAfter(function, *args)
+
+
+class TaskCancelled(Exception):
+    """ Raised inside a task by check_cancelled or report_progress once the task has been cancelled. """
+
+
+class Task:
+    """
+    Handle to one background operation. The running function receives it to report progress and
+    to check for cancellation; the UI keeps it to cancel. Callbacks always run on the GUI thread,
+    and none run after cancel() has been called.
+    """
+
+    def __init__(self, executor, on_done=None, on_progress=None, on_error=None):
+        self.executor = executor
+        self.on_done = on_done
+        self.on_progress = on_progress
+        self.on_error = on_error
+        self.future = None
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()  # Only stops a task that has not started yet
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise TaskCancelled()
+
+    def report_progress(self, done, total, message=''):
+        """ Send progress to on_progress; also a cancellation point. """
+        self.check_cancelled()
+        if self.on_progress is not None:
+            self.send(self.on_progress, done, total, message)
+
+    def send(self, callback, *args):
+        """ Call callback(*args) on the GUI thread, unless the task is cancelled first; e.g. to hand over partial results. """
+        self.executor.call_after(self._deliver, callback, *args)
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+    def _deliver(self, callback, *args):
+        if not self.cancelled:
+            callback(*args)
+
+
+class TaskExecutor:
+    """
+    Runs slow operations (loading, filtering, plan generation) on a small thread pool so the wx
+    main loop keeps handling events. Results, errors and progress are handed back to the GUI
+    thread through call_after, which is wx.CallAfter in the application.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, max_workers=MAX_WORKERS, call_after=None):
+        self.call_after = call_after or _wx_call_after
+        self.pool = ThreadPoolExecutor(max_workers, thread_name_prefix='background-task')
+
+    @classmethod
+    def get_instance(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def submit(self, function, *args, on_done=None, on_progress=None, on_error=None, **kwargs):
+        """
+        Run function(task, *args, **kwargs) in the background and return the Task. on_done gets its
+        result, on_error any exception it raised and on_progress (done, total, message).
+        """
+        task = Task(self, on_done, on_progress, on_error)
+        task.future = self.pool.submit(self._run, task, function, args, kwargs)
+        return task
+
+    def _run(self, task, function, args, kwargs):
+        try:
+            result = function(task, *args, **kwargs)
+        except TaskCancelled:
+            return None
+        except Exception as e:
+            if task.on_error is not None:
+                self.call_after(task._deliver, task.on_error, e)
+            else:
+                print(f"Background task failed: {e}")
+            raise
+        if task.on_done is not None:
+            self.call_after(task._deliver, task.on_done, result)
+        return result
+
+    def shutdown(self, wait=False):
+        self.pool.shutdown(wait=wait, cancel_futures=True)
+
+
+class QueryRunner:
+    """
+    Runs the searches and filters of one view through a QueryCache. In the background, a newer
+    query cancels a pending one, so only the latest results are shown.
+    """
+
+    def __init__(self, on_error, executor=None):
+        self.on_error = on_error
+        self.executor = executor
+        self.task = None
+
+    @property
+    def pending(self):
+        return self.task is not None
+
+    def run(self, query_cache, key, compute, on_result, background=False):
+        """
+        Pass the cached result for key, or else compute's result, to on_result. With background,
+        compute runs on a worker thread and on_result is called on the GUI thread once it is done.
+        """
+        self.cancel()
+        result = query_cache.get(key)
+        if result is None and background:
+            def run(task):
+                result = compute()
+                task.check_cancelled()
+                query_cache.put(key, result)
+                return result
+
+            def on_done(result):
+                self.task = None
+                on_result(result)
+
+            def on_error(error):
+                self.task = None
+                self.on_error(error)
+
+            executor = self.executor or TaskExecutor.get_instance()
+            self.task = executor.submit(run, on_done=on_done, on_error=on_error)
+            return
+        if result is None:
+            result = compute()
+            query_cache.put(key, result)
+        on_result(result)
+
+    def cancel(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
@@ -0,0 +1,48 @@
+import numpy as np
+from matplotlib.figure import Figure
+
+NUTRIENTS = ['Calories', 'Protein', 'Carbs', 'Fat']
+GROUP_WIDTH = 0.8
+
+
+class ComparisonChart:
+    """
+    Grouped bar chart of the comparison table on one long-lived Figure. The figure is not created
+    through pyplot, so nothing keeps it alive after its canvas is destroyed. Showing the same number
+    of foods again only sets the bar heights and tick labels; only a different number of foods
+    replaces the bars, never the figure.
+    """
+
+    def __init__(self, figure=None):
+        self.figure = figure if figure is not None else Figure(figsize=(6, 3))
+        self.axes = self.figure.add_subplot()
+        self.axes.set_title('Nutrient Comparison')
+        self.axes.set_xlabel('Food')
+        self.axes.set_ylabel('Amount')
+        self.bars = []  # One BarContainer per nutrient
+        self.food_count = 0
+
+    def update(self, foods, values):
+        """ Show values, a (len(foods), len(NUTRIENTS)) array, as one group of bars per food. """
+        # Nutrients missing from the dataset are drawn as 0
+        values = np.nan_to_num(np.asarray(values, dtype=np.float64).reshape(len(foods), len(NUTRIENTS)))
+        if not self.bars or len(foods) != self.food_count:
+            self._create_bars(len(foods))
+        for container, heights in zip(self.bars, values.T):
+            for bar, height in zip(container, heights):
+                bar.set_height(height)
+        self.axes.set_xticks(np.arange(len(foods)))
+        self.axes.set_xticklabels(foods, rotation=20, ha='right')
+        top = values.max() if values.size else 0
+        self.axes.set_ylim(0, top * 1.1 if top > 0 else 1)
+
+    def _create_bars(self, count):
+        for container in self.bars:
+            container.remove()
+        width = GROUP_WIDTH / len(NUTRIENTS)
+        positions = np.arange(count)
+        self.bars = [self.axes.bar(positions + (i - (len(NUTRIENTS) - 1) / 2) * width, np.zeros(count), width,
+                                   label=nutrient)
+                     for i, nutrient in enumerate(NUTRIENTS)]
+        self.axes.legend(loc='best')
+        self.food_count = count
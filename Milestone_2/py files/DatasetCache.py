@@ -0,0 +1,146 @@
+import os
+import hashlib
+import zipfile
+import numpy as np
+import pandas as pd
+from DatasetIngest import DatasetIngest
+from FoodSearchIndex import FoodSearchIndex, INDEX_ARRAYS
+
+CACHE_FORMAT_VERSION = 4
+CACHE_SUFFIX = '.cache.npz'
+
+
+def get_cache_path(csv_path):
+    """ The cache lives next to the CSV, e.g. Food_Nutrition_Dataset.cache.npz """
+    return os.path.splitext(csv_path)[0] + CACHE_SUFFIX
+
+
+def hash_file(file_path, chunk_size=1024 * 1024):
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_cache(food_data, cache_path, source_mtime, source_size, source_hash, search_index=None):
+    """
+    Write the dataset as one array per column: float32 for nutrients, codes + categories for text.
+    Missing text values get the code -1, so they are read back as NaN, as a fresh parse gives.
+    The arrays of search_index, if given, are saved too, so it is not rebuilt on the next start.
+    """
+    arrays = {
+        'format_version': np.array(CACHE_FORMAT_VERSION),
+        'columns': np.array(food_data.columns.tolist(), dtype=str),
+        'source_mtime': np.array(source_mtime, dtype=np.int64),
+        'source_size': np.array(source_size, dtype=np.int64),
+        'source_hash': np.array(source_hash),
+    }
+    for i, column in enumerate(food_data.columns):
+        values = food_data[column]
+        if pd.api.types.is_numeric_dtype(values):
+            arrays[f'col_{i}'] = values.to_numpy(dtype=np.float32)
+        else:
+            codes, categories = pd.factorize(values)
+            arrays[f'col_{i}_codes'] = codes.astype(np.int32)
+            arrays[f'col_{i}_categories'] = np.array(categories, dtype=str)
+    if search_index is not None:
+        for name, array in search_index.to_arrays().items():
+            arrays[f'index_{name}'] = array
+
+    temp_path = cache_path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(temp_path, cache_path)
+
+
+def read_cache(cache_path):
+    """
+    Return (dataframe, metadata, search_index) from a cache file, or None if it is missing or
+    unreadable. search_index is None if the cache was written without one.
+    """
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        with np.load(cache_path, allow_pickle=False) as cache:
+            if int(cache['format_version']) != CACHE_FORMAT_VERSION:
+                return None
+            columns = cache['columns'].tolist()
+            data = {}
+            for i, column in enumerate(columns):
+                if f'col_{i}' in cache.files:
+                    data[column] = cache[f'col_{i}']
+                else:
+                    categories = cache[f'col_{i}_categories'].astype(object)
+                    if i == 0:
+                        name_categories = categories
+                    codes = cache[f'col_{i}_codes']
+                    values = np.full(len(codes), np.nan, dtype=object)
+                    present = codes >= 0
+                    values[present] = categories[codes[present]]
+                    data[column] = values
+            search_index = None
+            if 'index_sorted_rows' in cache.files and 'col_0_codes' in cache.files:
+                # The index's names are the lowercase food names, so only the distinct names are lowered
+                names = np.array(list(map(str.lower, name_categories)) + [''], dtype=object)
+                search_index = FoodSearchIndex(names[cache['col_0_codes']],
+                                               arrays={name: cache[f'index_{name}'] for name in INDEX_ARRAYS})
+            metadata = {
+                'source_mtime': int(cache['source_mtime']),
+                'source_size': int(cache['source_size']),
+                'source_hash': str(cache['source_hash']),
+            }
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile) as e:
+        print(f"Ignoring unreadable dataset cache {cache_path}: {e}")
+        return None
+    return pd.DataFrame(data, columns=columns), metadata, search_index
+
+
+def check_source(metadata, csv_path, stat):
+    """
+    Compare a cache's recorded source with the CSV on disk. mtime and size are checked first and
+    the content hash only when they differ. Returns (unchanged, source_hash); source_hash is None
+    when it did not need to be computed.
+    """
+    if metadata['source_mtime'] == stat.st_mtime_ns and metadata['source_size'] == stat.st_size:
+        return True, None
+    source_hash = hash_file(csv_path)
+    return metadata['source_hash'] == source_hash, source_hash
+
+
+def load_dataset(csv_path, use_cache=True, ingest=None):
+    """
+    Load the dataset, using the binary cache when it is still valid for the CSV.
+    Otherwise the CSV is streamed through ingest, a DatasetIngest, whose search index and column
+    statistics the caller can then reuse; on a cache hit ingest.search_index is the saved index.
+    Returns (dataframe, loaded_from_cache).
+    """
+    ingest = ingest or DatasetIngest(csv_path)
+    if not use_cache:
+        return ingest.run(csv_path), False
+
+    stat = os.stat(csv_path)
+    cache_path = get_cache_path(csv_path)
+    cached = read_cache(cache_path)
+    source_hash = None
+
+    if cached is not None:
+        food_data, metadata, search_index = cached
+        unchanged, source_hash = check_source(metadata, csv_path, stat)
+        if unchanged:
+            if source_hash is not None:
+                # The file was only touched; record the new mtime so the hash is not needed next time
+                _try_write_cache(food_data, cache_path, stat, source_hash, search_index)
+            ingest.search_index = search_index
+            return food_data, True
+
+    food_data = ingest.run(csv_path)
+    _try_write_cache(food_data, cache_path, stat, source_hash or hash_file(csv_path), ingest.search_index)
+    return food_data, False
+
+
+def _try_write_cache(food_data, cache_path, stat, source_hash, search_index=None):
+    try:
+        write_cache(food_data, cache_path, stat.st_mtime_ns, stat.st_size, source_hash, search_index)
+    except OSError as e:
+        print(f"Could not write dataset cache {cache_path}: {e}")
@@ -0,0 +1,117 @@
+import os
+import numpy as np
+import pandas as pd
+from DatasetCache import load_dataset
+from FoodSchema import NAME_COLUMN, NUTRIENT_COLUMNS, NUTRIENT_DTYPE
+from FoodSearchIndex import SearchIndexBuilder, gram_pairs, normalize_name
+
+
+def dedup_key(name):
+    """ Names that only differ in case or spacing, e.g. 'Apple  Pie' and 'apple pie', are the same food. """
+    return ' '.join(name.lower().split()) if isinstance(name, str) else ''
+
+
+def file_stamp(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class DataSource:
+    """ One CSV of a federation and what was read from it, kept until the file changes. """
+
+    def __init__(self, path, use_cache=True):
+        self.path = path
+        self.stamp = file_stamp(path)
+        self.food_data, self.loaded_from_cache = load_dataset(path, use_cache)
+        names = self.food_data.iloc[:, 0].tolist()
+        self.keys = np.array([dedup_key(name) for name in names], dtype=object)
+        self.search_names = [normalize_name(name) for name in names]
+        self.grams = gram_pairs(self.search_names)
+
+    def __len__(self):
+        return len(self.food_data)
+
+    def is_current(self):
+        return os.path.exists(self.path) and file_stamp(self.path) == self.stamp
+
+
+class FederatedDataset:
+    """
+    Several CSVs in the dataset's format merged into one dataset. A food whose name appears in
+    more than one place is kept once, from the earliest source in paths and the earliest row
+    in that source; foods without a name are all kept. refresh() re-reads only the files that
+    changed and then re-merges the sources already in memory, reusing each one's trigrams to
+    build the merged search index.
+    """
+
+    def __init__(self, paths, use_cache=True):
+        self.paths = list(paths)
+        self.use_cache = use_cache
+        self.sources = {}
+        self.food_data = None
+        self.search_index = None
+        self.source_ids = None  # Index into paths of the source every merged row came from
+        self.source_rows = None  # Row of every merged row in its source
+        self.refresh()
+
+    @property
+    def loaded_from_cache(self):
+        return all(source.loaded_from_cache for source in self.sources.values())
+
+    def refresh(self):
+        """ Re-read the sources that are new or changed on disk and re-merge; returns their paths. """
+        changed = [path for path in self.paths if path not in self.sources or not self.sources[path].is_current()]
+        for path in changed:
+            self.sources[path] = DataSource(path, self.use_cache)
+        removed = set(self.sources) - set(self.paths)
+        for path in removed:
+            del self.sources[path]
+        if changed or removed or self.food_data is None:
+            self.merge()
+        return changed
+
+    def add_source(self, path):
+        if path not in self.paths:
+            self.paths.append(path)
+        return self.refresh()
+
+    def remove_source(self, path):
+        self.paths.remove(path)
+        self.refresh()
+
+    def merge(self):
+        sources = [self.sources[path] for path in self.paths]
+        keys = np.concatenate([source.keys for source in sources]) if sources else np.array([], dtype=object)
+        keep = ~pd.Series(keys, dtype=object).duplicated().to_numpy() | (keys == '')
+        offsets = np.cumsum([0] + [len(source) for source in sources])
+        source_ids = np.repeat(np.arange(len(sources)), [len(source) for source in sources])
+
+        columns = [NAME_COLUMN] + [column for column in NUTRIENT_COLUMNS
+                                   if any(column in source.food_data.columns for source in sources)]
+        frames = []
+        builder = SearchIndexBuilder()
+        for source, start, end in zip(sources, offsets[:-1], offsets[1:]):
+            kept = np.flatnonzero(keep[start:end])
+            frames.append(source.food_data.iloc[kept].reindex(columns=columns))
+            # Renumber the source's trigram rows to its kept rows, dropping the duplicates
+            new_rows = np.full(len(source), -1, dtype=np.int64)
+            new_rows[kept] = np.arange(len(kept))
+            gram_keys, gram_rows = source.grams
+            kept_grams = keep[start + gram_rows]
+            builder.add([source.search_names[row] for row in kept],
+                        (gram_keys[kept_grams], new_rows[gram_rows[kept_grams]]))
+
+        if frames:
+            food_data = pd.concat(frames, ignore_index=True)
+        else:
+            food_data = pd.DataFrame({column: [] for column in columns})
+        for column in columns[1:]:
+            food_data[column] = food_data[column].to_numpy(dtype=NUTRIENT_DTYPE)
+        self.food_data = food_data
+        self.search_index = builder.build()
+        self.source_ids = source_ids[keep]
+        self.source_rows = (np.arange(len(keys)) - offsets[source_ids])[keep]
+
+    def get_source(self, row_id):
+        """ Return (path, row) of the source row a merged row came from. """
+        return self.paths[self.source_ids[row_id]], int(self.source_rows[row_id])
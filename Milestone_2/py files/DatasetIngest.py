@@ -0,0 +1,114 @@
+import sys
+import numpy as np
+import pandas as pd
+from FoodSchema import NAME_COLUMN, NUTRIENT_DTYPE, get_dtypes, read_header, validate_header
+from FoodSearchIndex import SearchIndexBuilder
+
+INGEST_CHUNK_SIZE = 50000
+
+
+class ColumnStats:
+    """ Count of present values, minimum, maximum and sum of every nutrient column, updated a chunk at a time. """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.count = np.zeros(len(self.columns), dtype=np.int64)
+        self.minimum = np.full(len(self.columns), np.nan)
+        self.maximum = np.full(len(self.columns), np.nan)
+        self.total = np.zeros(len(self.columns))
+
+    @classmethod
+    def of(cls, food_data, chunk_size=INGEST_CHUNK_SIZE):
+        """ Statistics of an already loaded dataset, e.g. one read from the cache, a chunk at a time. """
+        stats = cls([str(column) for column in food_data.columns[1:]])
+        for start in range(0, len(food_data), chunk_size):
+            stats.update(food_data.iloc[start:start + chunk_size, 1:].to_numpy(dtype=np.float64))
+        return stats
+
+    def update(self, matrix):
+        """ Add a (rows, columns) chunk; missing values are skipped. """
+        if len(matrix) == 0:
+            return
+        # fmin and fmax ignore NaN unless both sides are NaN, so all-missing columns stay NaN
+        self.count += (~np.isnan(matrix)).sum(axis=0)
+        self.minimum = np.fmin(self.minimum, np.fmin.reduce(matrix, axis=0))
+        self.maximum = np.fmax(self.maximum, np.fmax.reduce(matrix, axis=0))
+        self.total += np.nansum(matrix, axis=0, dtype=np.float64)
+
+    def mean(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 0, self.total / self.count, np.nan)
+
+    def get(self, column):
+        i = self.columns.index(column)
+        return {'count': int(self.count[i]), 'minimum': float(self.minimum[i]),
+                'maximum': float(self.maximum[i]), 'mean': float(self.mean()[i])}
+
+
+class DatasetIngest:
+    """
+    Reads a nutrition CSV chunk_size rows at a time instead of in one read_csv call. Each chunk
+    is parsed straight to float32 nutrients and interned names, added to the search index and
+    column statistics, and copied into per-column pieces, so the parser's temporary objects
+    never exist for more than one chunk. on_chunk(rows_read, preview) is called after every
+    chunk; preview is the first chunk as a typed DataFrame, which can be shown before the rest
+    of the file is read.
+    """
+
+    def __init__(self, csv_path, chunk_size=INGEST_CHUNK_SIZE, on_chunk=None):
+        self.csv_path = csv_path
+        self.chunk_size = chunk_size
+        self.on_chunk = on_chunk
+        self.food_data = None
+        self.search_index = None
+        self.stats = None
+        self.preview = None
+        self.rows_read = 0
+
+    @property
+    def done(self):
+        return self.food_data is not None
+
+    def run(self, csv_path=None):
+        """ Read the whole file and return the dataset; the index and statistics are kept on self. """
+        csv_path = csv_path or self.csv_path
+        columns = validate_header(read_header(csv_path))
+        nutrient_columns = columns[1:]
+        names = []
+        pieces = [[] for _ in nutrient_columns]
+        builder = SearchIndexBuilder()
+        self.stats = ColumnStats(nutrient_columns)
+        self.rows_read = 0
+
+        reader = pd.read_csv(csv_path, usecols=columns, dtype=get_dtypes(columns), chunksize=self.chunk_size)
+        for chunk in reader:
+            # Interned, so a name repeated across the file is stored once
+            chunk_names = [sys.intern(name) if isinstance(name, str) else name for name in chunk[NAME_COLUMN]]
+            matrix = chunk[nutrient_columns].to_numpy(dtype=NUTRIENT_DTYPE)
+            for column_pieces, values in zip(pieces, matrix.T):
+                column_pieces.append(values.copy())  # Copies, so the chunk itself can be freed
+            self.stats.update(matrix)
+            builder.add(chunk_names)
+            names.extend(chunk_names)
+            self.rows_read += len(chunk)
+            if self.preview is None:
+                self.preview = self._frame(columns, chunk_names, list(matrix.T))
+            if self.on_chunk is not None:
+                self.on_chunk(self.rows_read, self.preview)
+
+        # Joined one column at a time, freeing its pieces before the next is joined
+        values = []
+        for column_pieces in pieces:
+            values.append(np.concatenate(column_pieces) if column_pieces else np.zeros(0, dtype=NUTRIENT_DTYPE))
+            column_pieces.clear()
+        self.search_index = builder.build()
+        self.food_data = self._frame(columns, names, values)
+        if self.preview is None:
+            self.preview = self.food_data
+        return self.food_data
+
+    @staticmethod
+    def _frame(columns, names, values):
+        data = {NAME_COLUMN: np.array(names, dtype=object)}
+        data.update(zip(columns[1:], values))
+        return pd.DataFrame(data, columns=columns)
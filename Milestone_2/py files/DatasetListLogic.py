@@ -1,28 +1,40 @@
 import wx
 import wx.grid
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 from DatasetList import DatassetList
+from FoodRepository import FoodRepository, format_value
+from FoodSchema import SchemaError, PROTEIN, CARBS, FAT
+from FoodSearchIndex import FoodSearchIndex, make_incremental_search
+from LiveSearch import LiveSearch
+from FoodGridTable import FoodGridTable
+from NutrientFilter import NutrientFilter, NutrientRange
+from QueryCache import QueryCache
+from BackgroundTasks import QueryRunner, BACKGROUND_ROWS
+# A SqliteFoodStore filter reads this many matching row ids at a time, the next page once the
+# food list is scrolled to within FILTER_PREFETCH_ROWS rows of the last one read
+FILTER_PAGE_SIZE = 500
+FILTER_PREFETCH_ROWS = 100
 
 
 class DatasetListLogic(DatassetList):
-    def __init__(self, parent, meal_plan_manager):
+    def __init__(self, parent, meal_plan_manager, preview=None):
         super().__init__(parent)
 
         self.meal_plan_manager = meal_plan_manager
-
-        try:
-            self.food_data = pd.read_csv('Food_Nutrition_Dataset.csv')
-            print("Dataset loaded successfully.")
-            print("Columns in the dataset:", self.food_data.columns.tolist())
-            print("First few rows of the dataset:")
-            print(self.food_data.head())
-        except Exception as e:
-            print(f"Error loading dataset: {e}")
-            wx.MessageBox(f"Error loading dataset: {e}", "Error", wx.OK | wx.ICON_ERROR)
-            self.food_data = pd.DataFrame()
-
-        self.comparison_foods = []
+        self.repository = None
+        self.food_data = pd.DataFrame()
+        self.search_index = FoodSearchIndex([])
+        self.nutrient_filter = None
+        self.query_cache = QueryCache()
+        self.dataset_version = 0
+        self.comparison_foods = []  # FoodRecords shown in the comparison table, in row order
+        self.comparison_chart = None  # Embedded below the comparison table on first use
+        self.query_runner = QueryRunner(self.on_query_error)
+        self.nutrient_filter_source = None
+        self.paged_ranges = None  # Ranges of a store filter whose further matches are read on scroll
+        self.incremental_search = make_incremental_search(self.search_index)
+        self.live_search = LiveSearch(self.search_input, self.on_search)
 
         self.search_button.Bind(wx.EVT_BUTTON, self.on_search)
         self.apply_filters.Bind(wx.EVT_BUTTON, self.on_apply_filters)
@@ -32,17 +44,62 @@ class DatasetListLogic(DatassetList):
         self.go_to_meal_plan.Bind(wx.EVT_BUTTON, self.on_go_to_meal_plan)
         self.back_to_main_menu1.Bind(wx.EVT_BUTTON, self.on_back_to_main_menu)
         self.add_to_comaprison_table.Bind(wx.EVT_BUTTON, self.on_add_to_comparison)
+        self.food_list.Bind(wx.EVT_SCROLLWIN, self.on_food_list_scroll)
+        self.food_list.GetGridWindow().Bind(wx.EVT_MOUSEWHEEL, self.on_food_list_scroll)
+        self.food_list.Bind(wx.grid.EVT_GRID_SELECT_CELL, self.on_food_list_scroll)
 
         self.initialize_grid_controls()
+        if preview is not None:
+            self.show_preview(preview)
+            return
+        try:
+            self.bind_repository(FoodRepository.get_instance())
+            print("Dataset loaded successfully.")
+            print("Columns in the dataset:", list(self.food_data.columns))
+            print("First few rows of the dataset:")
+            print(self.food_data.head())
+        except Exception as e:
+            print(f"Error loading dataset: {e}")
+            wx.MessageBox(f"Error loading dataset: {e}", "Error", wx.OK | wx.ICON_ERROR)
+
+    def show_preview(self, preview):
+        """
+        Show the first rows of a dataset that is still being read. Their row ids are the same as in
+        the whole dataset, so foods can already be compared; searching, filtering and adding to the
+        meal plan wait for bind_repository.
+        """
+        self.food_data = preview
+        self.enable_dataset_controls(False)
+        self.display_results(preview)
+        self.food_table.autosize_columns(self.food_list)
+
+    def bind_repository(self, repository, meal_plan_manager=None):
+        """ Show the repository's current dataset, e.g. once it has finished loading after a preview. """
+        self.cancel_query()
+        self.repository = repository
+        self.food_data = repository.get_view()
+        self.search_index = repository.search_index
+        # Row ids from the repository's filter line up with the view, so its sorted indexes are shared
+        self.nutrient_filter = repository.nutrient_filter
+        self.nutrient_filter_source = self.food_data
+        self.query_cache = repository.query_cache
+        self.dataset_version = repository.version
+        self.incremental_search = make_incremental_search(self.search_index)
+        if meal_plan_manager is not None:
+            self.meal_plan_manager = meal_plan_manager
+        self.enable_dataset_controls(True)
         self.display_results(self.food_data)
+        self.food_table.autosize_columns(self.food_list)
+
+    def enable_dataset_controls(self, enable):
+        for control in [self.search_input, self.search_button, self.apply_filters, self.add_to_meal_plan]:
+            control.Enable(enable)
 
     def initialize_grid_controls(self):
-        self.food_list.ClearGrid()
-        if self.food_list.GetNumberCols() > 0:
-            self.food_list.DeleteCols(0, self.food_list.GetNumberCols())
-        self.food_list.AppendCols(len(self.food_data.columns))
-        for i, column in enumerate(self.food_data.columns):
-            self.food_list.SetColLabelValue(i, column)
+        # The food list is virtual: cells are read from the dataset only when they are drawn
+        self.food_table = FoodGridTable(self.food_data)
+        self.food_list.SetTable(self.food_table, True)
+        self.food_list.EnableEditing(False)
 
         self.comparison_list.ClearGrid()
         if self.comparison_list.GetNumberCols() > 0:
@@ -54,62 +111,123 @@ class DatasetListLogic(DatassetList):
         self.comparison_list.SetColLabelValue(3, "Carbs")
         self.comparison_list.SetColLabelValue(4, "Fat")
 
-    def display_results(self, results):
-        self.food_list.ClearGrid()
-        if self.food_list.GetNumberRows() > 0:
-            self.food_list.DeleteRows(0, self.food_list.GetNumberRows())
-        self.food_list.AppendRows(len(results))
-
-        for row_idx, (_, row) in enumerate(results.iterrows()):
-            for col_idx, value in enumerate(row):
-                self.food_list.SetCellValue(row_idx, col_idx, str(value))
-
-        for col in range(self.food_list.GetNumberCols()):
-            self.food_list.AutoSizeColumn(col)
+    def display_results(self, results, rows=None):
+        self.paged_ranges = None
+        self.food_table.set_data(results, rows)
+        self.food_list.ClearSelection()
 
     def on_search(self, event):
         query = self.search_input.GetValue().lower()
-        results = self.food_data[self.food_data.iloc[:, 0].str.lower().str.contains(query)]
-        self.display_results(results)
+        self.live_search.cancel()
+        if query:
+            key = QueryCache.make_key(query, [], self.dataset_version)
+            # IncrementalSearch keeps state between calls, so worker threads use the stateless index
+            search = self.search_index if self.runs_in_background() else self.incremental_search
+            self.run_query(key, lambda: search.ranked_search(query),
+                           lambda result: self.display_results(self.food_data, result[0]))
+        else:
+            self.cancel_query()
+            self.display_results(self.food_data)  # An empty query shows the whole dataset
 
-    def on_apply_filters(self, event):
-        filtered_data = self.food_data.copy()
+    def runs_in_background(self):
+        return len(self.food_data) >= BACKGROUND_ROWS
 
-        protein_col = self.food_data.columns[self.food_data.columns.str.contains('Protein', case=False)][0]
-        carbs_col = self.food_data.columns[self.food_data.columns.str.contains('Carbohydrate', case=False)][0]
-        fat_col = self.food_data.columns[self.food_data.columns.str.contains('Fat', case=False)][0]
+    def run_query(self, key, compute, on_result):
+        """ Pass the cached result for key, or else compute's result, to on_result; in the background on large datasets. """
+        self.query_runner.run(self.query_cache, key, compute, on_result, self.runs_in_background())
 
+    def cancel_query(self):
+        self.query_runner.cancel()
+
+    def on_query_error(self, error):
+        wx.MessageBox(f"Error running query: {error}", "Error", wx.OK | wx.ICON_ERROR)
+
+    def get_nutrient_filter(self):
+        # Built once per dataset, so column lookups and sorted indexes are not repeated on every click
+        if self.nutrient_filter is None or self.nutrient_filter_source is not self.food_data:
+            self.nutrient_filter = NutrientFilter(self.food_data)
+            self.nutrient_filter_source = self.food_data
+        return self.nutrient_filter
+
+    def get_active_filters(self):
+        ranges = []
         if self.filter_protein.GetValue():
-            filtered_data = filtered_data[filtered_data[protein_col] > 20]
+            ranges.append(NutrientRange(PROTEIN, minimum=20, inclusive=False))
         if self.filter_carbs.GetValue():
-            filtered_data = filtered_data[filtered_data[carbs_col] < 20]
+            ranges.append(NutrientRange(CARBS, maximum=20, inclusive=False))
         if self.filter_fat.GetValue():
-            filtered_data = filtered_data[filtered_data[fat_col] < 5]
+            ranges.append(NutrientRange(FAT, maximum=5, inclusive=False))
+        return ranges
+
+    def on_apply_filters(self, event):
+        self.apply_nutrient_filters(self.get_active_filters())
+
+    def apply_nutrient_filters(self, ranges):
+        """
+        Show the foods matching every NutrientRange in ranges. A SqliteFoodStore only reads the
+        first FILTER_PAGE_SIZE matches; the rest are read a page at a time as the list is scrolled.
+        """
+        key = QueryCache.make_key('', ranges, self.dataset_version)
+        nutrient_filter = self.get_nutrient_filter()
+        if isinstance(nutrient_filter, NutrientFilter):
+            self.run_query(key, lambda: (nutrient_filter.apply(ranges),),
+                           lambda result: self.display_results(self.food_data, result[0]))
+        else:
+            self.load_filter_page(ranges, np.zeros(0, dtype=np.int64))
+
+    def load_filter_page(self, ranges, shown):
+        """ Read the page of the store's matches for ranges that follows the row ids already shown. """
+        key = QueryCache.make_key('', ranges, self.dataset_version) + (len(shown),)
+        nutrient_filter, offset = self.nutrient_filter, len(shown)
+        self.run_query(key, lambda: (nutrient_filter.apply(ranges, FILTER_PAGE_SIZE, offset),),
+                       lambda result: self.show_filter_page(ranges, shown, result[0]))
+
+    def show_filter_page(self, ranges, shown, page):
+        if len(shown) == 0:
+            self.display_results(self.food_data, page)
+        else:
+            # Appending rows keeps the list's scroll position and selection
+            self.food_table.set_data(self.food_data, np.concatenate([shown, page]))
+        # A short page is the last one
+        self.paged_ranges = ranges if len(page) == FILTER_PAGE_SIZE else None
+
+    def on_food_list_scroll(self, event):
+        event.Skip()
+        if self.paged_ranges is not None:
+            wx.CallAfter(self.load_more_filter_rows)  # Once the grid has scrolled
+
+    def load_more_filter_rows(self):
+        """ Read the next page of a store filter's matches when the list nears the last row read. """
+        if self.paged_ranges is None or self.query_runner.pending:
+            return
+        if self.get_last_visible_row() >= self.food_table.GetNumberRows() - FILTER_PREFETCH_ROWS:
+            self.load_filter_page(self.paged_ranges, self.food_table.rows)
 
-        self.display_results(filtered_data)
+    def get_last_visible_row(self):
+        _, bottom = self.food_list.CalcUnscrolledPosition(0, self.food_list.GetGridWindow().GetClientSize().height)
+        row = self.food_list.YToRow(bottom)
+        return self.food_table.GetNumberRows() - 1 if row == wx.NOT_FOUND else row
 
     def on_add_to_comparison(self, event):
         selected_row = self.food_list.GetGridCursorRow()
         if selected_row != -1:
             food = self.get_food_from_grid(selected_row)
             if food:
-                print(f"Current rows in comparison table: {self.comparison_list.GetNumberRows()}")
-                print(f"Current non-empty rows: {self.get_non_empty_rows()}")
-
-                non_empty_rows = self.get_non_empty_rows()
-                if len(non_empty_rows) < 5:
-                    new_row = len(non_empty_rows)
+                if len(self.comparison_foods) < 5:
+                    new_row = len(self.comparison_foods)
+                    self.comparison_foods.append(food)
                     if new_row >= self.comparison_list.GetNumberRows():
                         self.comparison_list.AppendRows(1)
 
-                    self.comparison_list.SetCellValue(new_row, 0, food['name'])
-                    self.comparison_list.SetCellValue(new_row, 1, str(food['calories']))
-                    self.comparison_list.SetCellValue(new_row, 2, str(food['protein']))
-                    self.comparison_list.SetCellValue(new_row, 3, str(food['carbs']))
-                    self.comparison_list.SetCellValue(new_row, 4, str(food['fat']))
+                    # The cells are only for display; the chart reads the records
+                    self.comparison_list.SetCellValue(new_row, 0, food.name)
+                    self.comparison_list.SetCellValue(new_row, 1, format_value(food.calories))
+                    self.comparison_list.SetCellValue(new_row, 2, format_value(food.protein))
+                    self.comparison_list.SetCellValue(new_row, 3, format_value(food.carbs))
+                    self.comparison_list.SetCellValue(new_row, 4, format_value(food.fat))
 
                     self.comparison_list.AutoSize()
-                    wx.MessageBox(f"Added {food['name']} to comparison table", "Food Added",
+                    wx.MessageBox(f"Added {food.name} to comparison table", "Food Added",
                                   wx.OK | wx.ICON_INFORMATION)
                 else:
                     wx.MessageBox("Comparison table is full. Remove some items to add more.", "Table Full",
@@ -117,72 +235,57 @@ class DatasetListLogic(DatassetList):
         else:
             wx.MessageBox("Please select a food item from the list.", "No Selection", wx.OK | wx.ICON_INFORMATION)
 
-    def get_non_empty_rows(self):
-        non_empty_rows = []
-        for row in range(self.comparison_list.GetNumberRows()):
-            if self.comparison_list.GetCellValue(row, 0):
-                non_empty_rows.append(row)
-        return non_empty_rows
-
     def get_food_from_grid(self, row):
+        """ Return the FoodRecord of a food list row, read from the dataset by its row id. """
         try:
-            return {
-                'name': self.food_list.GetCellValue(row, 0),
-                'calories': float(self.food_list.GetCellValue(row, 1)),
-                'protein': float(self.food_list.GetCellValue(row, 8)),
-                'carbs': float(self.food_list.GetCellValue(row, 6)),
-                'fat': float(self.food_list.GetCellValue(row, 2))
-            }
-        except ValueError as e:
+            return self.food_table.get_record(row)
+        except (SchemaError, IndexError) as e:
             print(f"Error retrieving food data: {e}")
             wx.MessageBox(f"Error retrieving food data. Please check the values.", "Data Error", wx.OK | wx.ICON_ERROR)
             return None
 
     def on_generate_chart(self, event):
-        if self.comparison_list.GetNumberRows() == 0:
+        if not self.comparison_foods:
             wx.MessageBox("Please add items to the comparison table first.", "Empty Comparison",
                           wx.OK | wx.ICON_INFORMATION)
             return
 
-        data = []
-        for i in range(self.comparison_list.GetNumberRows()):
-            food = self.comparison_list.GetCellValue(i, 0)
-            calories = self.comparison_list.GetCellValue(i, 1)
-            protein = self.comparison_list.GetCellValue(i, 2)
-            carbs = self.comparison_list.GetCellValue(i, 3)
-            fat = self.comparison_list.GetCellValue(i, 4)
-
-            try:
-                calories = float(calories) if calories else 0
-                protein = float(protein) if protein else 0
-                carbs = float(carbs) if carbs else 0
-                fat = float(fat) if fat else 0
-            except ValueError:
-                wx.MessageBox(f"Invalid data for {food}. Please check the values.", "Data Error", wx.OK | wx.ICON_ERROR)
-                return
-
-            data.append([food, calories, protein, carbs, fat])
-
-        df = pd.DataFrame(data, columns=['Food', 'Calories', 'Protein', 'Carbs', 'Fat'])
-        df.set_index('Food', inplace=True)
-
-        ax = df.plot(kind='bar', figsize=(10, 6))
-        plt.title('Nutrient Comparison')
-        plt.xlabel('Food')
-        plt.ylabel('Amount')
-        plt.legend(loc='best')
-        plt.tight_layout()
-        plt.show()
+        foods = [food.name for food in self.comparison_foods]
+        data = [[food.calories, food.protein, food.carbs, food.fat] for food in self.comparison_foods]
+
+        chart = self.get_comparison_chart()
+        chart.update(foods, data)
+        self.chart_canvas.draw_idle()
+
+    def get_comparison_chart(self):
+        """ Create the chart canvas inside the comparison box the first time; later charts reuse it. """
+        if self.comparison_chart is None:
+            # Slow to import, so only loaded once a chart is needed
+            from matplotlib.backends.backend_wxagg import FigureCanvasWxAgg
+            from ComparisonChart import ComparisonChart
+
+            self.comparison_chart = ComparisonChart()
+            self.chart_canvas = FigureCanvasWxAgg(self.comparison_list.GetParent(), wx.ID_ANY,
+                                                  self.comparison_chart.figure)
+            self.chart_canvas.SetMinSize((-1, 260))
+            self.comparison_list.GetContainingSizer().Add(self.chart_canvas, 1, wx.ALL | wx.EXPAND, 5)
+            self.Layout()
+        return self.comparison_chart
 
     def on_clear_comparison(self, event):
+        self.comparison_foods.clear()
         self.comparison_list.ClearGrid()
         if self.comparison_list.GetNumberRows() > 0:
             self.comparison_list.DeleteRows(0, self.comparison_list.GetNumberRows())
+        if self.comparison_chart is not None:
+            self.comparison_chart.update([], [])
+            self.chart_canvas.draw_idle()
 
     def on_add_to_meal_plan(self, event):
         selected_row = self.food_list.GetGridCursorRow()
         if selected_row != -1:
             food = self.get_food_from_grid(selected_row)
+            version = self.dataset_version
             if food:
                 dialog = wx.Dialog(self, title="Add to Meal Plan")
                 dialog_sizer = wx.BoxSizer(wx.VERTICAL)
@@ -209,8 +312,15 @@ class DatasetListLogic(DatassetList):
                 if dialog.ShowModal() == wx.ID_OK:
                     day = days[day_choice.GetSelection()]
                     meal = self.get_selected_meal()
-                    self.meal_plan_manager.add_food(day, meal, food)
-                    wx.MessageBox(f"Added {food['name']} to {meal} on {day}", "Food Added", wx.OK | wx.ICON_INFORMATION)
+                    if version != self.dataset_version:
+                        # Reloaded while the day was chosen, so the food's row id may hold another food
+                        food = self.repository.current_record(food, version)
+                    if food:
+                        self.meal_plan_manager.add_food(day, meal, food)
+                        wx.MessageBox(f"Added {food.name} to {meal} on {day}", "Food Added", wx.OK | wx.ICON_INFORMATION)
+                    else:
+                        wx.MessageBox("The dataset was reloaded and this food is no longer in it.", "Food Not Found",
+                                      wx.OK | wx.ICON_WARNING)
 
                 dialog.Destroy()
         else:
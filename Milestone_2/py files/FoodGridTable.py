@@ -0,0 +1,106 @@
+import wx
+import wx.grid
+from FoodRepository import format_value
+from FoodRecord import FoodRecordReader
+from FoodSchema import column_values
+
+AUTOSIZE_SAMPLE_ROWS = 200
+COLUMN_PADDING = 16
+
+
+class FoodGridTable(wx.grid.GridTableBase):
+    """
+    Virtual table that reads cells straight from a DataFrame, or from a SqliteFoodStore a page of
+    rows at a time. The grid only asks for the cells that are visible, so showing 2 million rows
+    costs the same as showing 2 thousand.
+    """
+
+    def __init__(self, food_data, columns=None):
+        super().__init__()
+        self.column_names = columns  # Dataset columns to show, in order; None shows them all
+        self.food_data = None
+        self.rows = None
+        self.columns = []
+        self.values = []
+        self.record_reader = None
+        self.set_data(food_data)
+
+    def set_data(self, food_data, rows=None):
+        """
+        Show food_data, or only the given row ids of it, and tell the attached grid how many rows
+        and columns came or went. Passing row ids avoids copying the selected rows.
+        """
+        old_rows, old_cols = self.GetNumberRows(), self.GetNumberCols()
+        columns = [str(column) for column in food_data.columns]
+        positions = range(len(columns))
+        if self.column_names is not None:
+            positions = [columns.index(column) for column in self.column_names if column in columns]
+        self.food_data = food_data
+        self.rows = rows
+        self.columns = [columns[i] for i in positions]
+        # Column arrays are views, so looking up a cell does not go through pandas indexing
+        self.values = [column_values(food_data, i) for i in positions]
+        self.record_reader = None
+        self._notify_resize(old_rows, self.GetNumberRows(),
+                            wx.grid.GRIDTABLE_NOTIFY_ROWS_APPENDED, wx.grid.GRIDTABLE_NOTIFY_ROWS_DELETED)
+        self._notify_resize(old_cols, self.GetNumberCols(),
+                            wx.grid.GRIDTABLE_NOTIFY_COLS_APPENDED, wx.grid.GRIDTABLE_NOTIFY_COLS_DELETED)
+        view = self.GetView()
+        if view is not None:
+            view.ForceRefresh()
+
+    def _notify_resize(self, old_count, new_count, appended, deleted):
+        view = self.GetView()
+        if view is None or old_count == new_count:
+            return
+        if new_count > old_count:
+            message = wx.grid.GridTableMessage(self, appended, new_count - old_count)
+        else:
+            message = wx.grid.GridTableMessage(self, deleted, new_count, old_count - new_count)
+        view.ProcessTableMessage(message)
+
+    def GetNumberRows(self):
+        if self.rows is not None:
+            return len(self.rows)
+        return 0 if self.food_data is None else len(self.food_data)
+
+    def GetNumberCols(self):
+        return len(self.columns)
+
+    def GetColLabelValue(self, col):
+        return self.columns[col]
+
+    def GetRowLabelValue(self, row):
+        return str(row + 1)
+
+    def get_row_id(self, row):
+        """ Map a grid row to its position in food_data. """
+        return row if self.rows is None else self.rows[row]
+
+    def get_record(self, row):
+        """ Return the FoodRecord shown in a grid row, read from the dataset rather than the cell text. """
+        if self.record_reader is None:
+            self.record_reader = FoodRecordReader(self.food_data)
+        return self.record_reader.read(self.get_row_id(row))
+
+    def IsEmptyCell(self, row, col):
+        return False
+
+    def GetValue(self, row, col):
+        return format_value(self.values[col][self.get_row_id(row)])
+
+    def SetValue(self, row, col, value):
+        pass  # The dataset is read-only
+
+    def autosize_columns(self, grid, sample_rows=AUTOSIZE_SAMPLE_ROWS):
+        """ Size the columns from their labels and the first sample_rows rows instead of every row. """
+        dc = wx.ClientDC(grid)
+        dc.SetFont(grid.GetDefaultCellFont())
+        label_font = grid.GetLabelFont()
+        for col, column in enumerate(self.columns):
+            samples = [self.GetValue(row, col) for row in range(min(sample_rows, self.GetNumberRows()))]
+            width = max([dc.GetTextExtent(text)[0] for text in samples] or [0])
+            dc.SetFont(label_font)
+            width = max(width, dc.GetTextExtent(column)[0])
+            dc.SetFont(grid.GetDefaultCellFont())
+            grid.SetColSize(col, width + COLUMN_PADDING)
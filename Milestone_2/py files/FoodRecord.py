@@ -0,0 +1,43 @@
+from FoodSchema import FoodSchema, FOOD_COLUMNS
+
+
+class FoodRecord:
+    """
+    One food as typed values read straight from the dataset arrays, with the row id it came
+    from. Fields can also be read as record['name'], like the food dicts used before.
+    """
+
+    __slots__ = ('row_id', 'name', 'calories', 'protein', 'carbs', 'fat')
+
+    def __init__(self, row_id, name, calories, protein, carbs, fat):
+        self.row_id = row_id
+        self.name = name
+        self.calories = calories
+        self.protein = protein
+        self.carbs = carbs
+        self.fat = fat
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def __repr__(self):
+        return (f"FoodRecord(row_id={self.row_id}, name={self.name!r}, calories={self.calories}, "
+                f"protein={self.protein}, carbs={self.carbs}, fat={self.fat})")
+
+
+class FoodRecordReader:
+    """ Builds FoodRecords by row id from a dataset's column arrays, which are views, not copies. """
+
+    def __init__(self, food_data, schema=None):
+        schema = schema or FoodSchema.of(food_data)
+        self.names = schema.name.values(food_data)
+        self.values = [schema.column(column).values(food_data) for column in FOOD_COLUMNS.values()]
+
+    def read(self, row_id):
+        row_id = int(row_id)
+        return FoodRecord(row_id, str(self.names[row_id]), *(float(values[row_id]) for values in self.values))
@@ -0,0 +1,236 @@
+import os
+import time
+import threading
+import numpy as np
+import pandas as pd
+from DatasetCache import load_dataset
+from DatasetIngest import DatasetIngest, ColumnStats
+from DatasetFederation import FederatedDataset, file_stamp
+from NutrientMatrixStore import load_nutrient_matrix
+from SqliteFoodStore import open_food_store
+from FoodSearchIndex import FoodSearchIndex
+from NutrientFilter import NutrientFilter
+from QueryCache import QueryCache
+from MealPlanOptimizer import build_candidate_pool, COOKED_KEYWORDS
+from FoodSchema import FoodSchema
+from FoodRecord import FoodRecordReader
+
+DEFAULT_DATASET_PATH = 'Food_Nutrition_Dataset.csv'
+# Set NUTRIPRO_DATASET_SOURCES to several CSVs, separated like PATH, to load them as one federated dataset
+DEFAULT_SOURCES = [path for path in os.environ.get('NUTRIPRO_DATASET_SOURCES', '').split(os.pathsep) if path] or DEFAULT_DATASET_PATH
+# 'pandas' keeps the whole dataset in memory, 'mmap' maps the nutrient matrix from disk and
+# 'sqlite' queries a database imported from the CSV, reading rows only when they are used
+BACKENDS = ('pandas', 'mmap', 'sqlite')
+DEFAULT_BACKEND = os.environ.get('NUTRIPRO_DATASET_BACKEND', 'pandas')
+QUERY_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+
+class FoodRepository:
+    """
+    Process-wide holder of the food dataset. The CSV is parsed once and every frame and dialog
+    shares it. file_path may also be a list of CSVs, which are merged into one FederatedDataset.
+    """
+
+    _instances = {}
+    _lock = threading.Lock()
+
+    def __init__(self, file_path=DEFAULT_SOURCES, use_cache=True, backend=DEFAULT_BACKEND, on_chunk=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown dataset backend '{backend}', expected one of {BACKENDS}")
+        self.file_paths = [file_path] if isinstance(file_path, str) else list(file_path)
+        if len(self.file_paths) > 1 and backend != 'pandas':
+            raise ValueError("Several dataset sources can only be loaded with the 'pandas' backend")
+        self.file_path = file_path
+        self.use_cache = use_cache
+        self.backend = backend
+        self.on_chunk = on_chunk  # on_chunk(rows_read, preview) while a CSV is streamed in on the first load
+        self.food_data = None
+        self.schema = None
+        self.nutrient_matrix = None
+        self.store = None
+        self.search_index = None
+        self.nutrient_filter = None
+        self.column_stats = None
+        self.federation = None
+        self.source_stamps = {}
+        # Keys include the dataset version, so the cache survives reloads without serving stale rows
+        self.query_cache = QueryCache(QUERY_CACHE_MAX_BYTES)
+        self.candidate_pools = {}
+        self._pool_lock = threading.Lock()
+        self.loaded_from_cache = False
+        self.load_time = 0.0
+        self.memory_usage = 0
+        self.mapped_bytes = 0
+        self.version = 0
+        self.load()
+
+    @classmethod
+    def get_instance(cls, file_path=DEFAULT_SOURCES, use_cache=True, backend=DEFAULT_BACKEND, on_chunk=None):
+        """ Return the shared repository for file_path, loading the dataset on first use. """
+        paths = [file_path] if isinstance(file_path, str) else file_path
+        key = tuple(os.path.abspath(path) for path in paths)
+        with cls._lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(file_path, use_cache, backend, on_chunk)
+            return cls._instances[key]
+
+    @classmethod
+    def clear_instances(cls):
+        with cls._lock:
+            cls._instances.clear()
+
+    def load(self):
+        """
+        Read the dataset and build its search index and filter. They replace the current ones
+        together, under the pool lock, so a reload on a worker thread never exposes a mix of
+        the old and new dataset to get_candidate_pool; frames switch over with get_view.
+        """
+        start = time.perf_counter()
+        ingest = DatasetIngest(self.file_paths[0], on_chunk=self.on_chunk)
+        # Reloads by refresh() run in the background, with nobody waiting on their progress
+        self.on_chunk = None
+        self.source_stamps = {path: file_stamp(path) for path in self.file_paths if os.path.exists(path)}
+        store = None
+        if len(self.file_paths) > 1:
+            # Only the sources that changed since the last load are read again
+            if self.federation is None:
+                self.federation = FederatedDataset(self.file_paths, self.use_cache)
+            else:
+                self.federation.refresh()
+            food_data, self.loaded_from_cache = self.federation.food_data, self.federation.loaded_from_cache
+            self.load_time = time.perf_counter() - start
+            self.memory_usage = int(food_data.memory_usage(deep=True).sum())
+        elif self.backend == 'mmap':
+            self.nutrient_matrix, self.loaded_from_cache = load_nutrient_matrix(self.file_paths[0])
+            food_data = self.nutrient_matrix
+            self.load_time = time.perf_counter() - start
+            self.memory_usage = 0  # Names, nutrients and the search index are paged in by the OS on demand
+            self.mapped_bytes = int(self.nutrient_matrix.nbytes)
+        elif self.backend == 'sqlite':
+            # A replaced store is not closed: frames may read it until they switch to the new one
+            store, self.loaded_from_cache = open_food_store(self.file_paths[0])
+            food_data = store
+            self.load_time = time.perf_counter() - start
+            self.memory_usage = 0  # Rows are read through the store's bounded page cache
+            self.mapped_bytes = os.path.getsize(store.database_path)
+        else:
+            food_data, self.loaded_from_cache = load_dataset(self.file_paths[0], self.use_cache, ingest)
+            self.load_time = time.perf_counter() - start
+            self.memory_usage = int(food_data.memory_usage(deep=True).sum())
+        schema = FoodSchema.of(food_data)
+        if store is not None:
+            # Searches and filters run as SQL queries on the store
+            search_index, nutrient_filter, column_stats = store, store, None
+        else:
+            if self.federation is not None:
+                search_index, column_stats = self.federation.search_index, None
+            elif self.nutrient_matrix is not None:
+                # Mapped from the store; the statistics are computed on first use, so it is not read in full
+                search_index, column_stats = self.nutrient_matrix.search_index, None
+            elif ingest.search_index is not None:
+                # Built chunk by chunk while the CSV was read, or saved with the dataset cache
+                search_index, column_stats = ingest.search_index, ingest.stats
+            else:
+                search_index = FoodSearchIndex(schema.name.values(food_data))
+                column_stats = None  # Computed on first use
+            nutrient_filter = NutrientFilter(food_data, schema)  # Sorted column indexes are built on first use
+        with self._pool_lock:
+            self.food_data, self.store, self.schema = food_data, store, schema
+            self.search_index, self.nutrient_filter, self.column_stats = search_index, nutrient_filter, column_stats
+            self.candidate_pools = {}
+            self.version += 1
+        print(f"Dataset loaded {'from cache ' if self.loaded_from_cache else ''}in {self.load_time * 1000:.1f} ms, "
+              f"using {self.memory_usage / (1024 * 1024):.2f} MB.")
+
+    def refresh(self):
+        """ Reload the dataset if any of its files changed on disk; returns whether it did. """
+        stamps = {path: file_stamp(path) for path in self.file_paths if os.path.exists(path)}
+        if stamps == self.source_stamps:
+            return False
+        self.load()
+        return True
+
+    def _snapshot(self):
+        """ The dataset, store, schema and version, read together, since a reload on a worker thread swaps them. """
+        with self._pool_lock:
+            return self.food_data, self.store, self.schema, self.version
+
+    def find_rows(self, names):
+        """ Return the first row id of every food name in names, or -1 where the dataset has no such food. """
+        return self._find_rows(self._snapshot(), names)
+
+    @staticmethod
+    def _find_rows(snapshot, names):
+        food_data, store, schema, _ = snapshot
+        if store is not None:
+            return store.find_rows(names)
+        food_names = schema.name.values(food_data)
+        first_rows = np.flatnonzero(~pd.Index(food_names).duplicated())
+        positions = pd.Index(food_names[first_rows]).get_indexer(list(names))
+        return np.where(positions >= 0, first_rows[positions], -1)
+
+    def current_record(self, record, version):
+        """
+        Return record, a FoodRecord read from dataset version, as a record of the current dataset,
+        or None if its food is no longer in it. After a reload its row id may hold another food.
+        """
+        snapshot = self._snapshot()
+        food_data, _, schema, current_version = snapshot
+        if version == current_version:
+            return record
+        row = self._find_rows(snapshot, [record.name])[0]
+        return None if row < 0 else FoodRecordReader(food_data, schema).read(row)
+
+    def get_view(self):
+        """
+        Return a view of the dataset. Columns share memory with the repository, nothing is copied.
+        With the mmap and sqlite backends this is the NutrientMatrix or SqliteFoodStore itself.
+        """
+        food_data = self._snapshot()[0]
+        if not isinstance(food_data, pd.DataFrame):
+            return food_data
+        return food_data.copy(deep=False)
+
+    def get_column_stats(self):
+        """ Return the ColumnStats of every nutrient column. """
+        with self._pool_lock:
+            food_data, column_stats, version = self.food_data, self.column_stats, self.version
+        if column_stats is None:
+            if isinstance(food_data, pd.DataFrame):
+                column_stats = ColumnStats.of(food_data)
+            else:
+                column_stats = food_data.column_stats()
+            with self._pool_lock:
+                if self.version == version:  # Not kept if the dataset was reloaded meanwhile
+                    self.column_stats = column_stats
+        return column_stats
+
+    def get_candidate_pool(self, keywords=COOKED_KEYWORDS):
+        """ Return the meal generator's CandidatePool for keywords, built once per dataset version. """
+        with self._pool_lock:
+            key = tuple(keywords), self.version
+            if key not in self.candidate_pools and self.store is not None:
+                self.candidate_pools[key] = self.store.candidate_pool(keywords)
+            elif key not in self.candidate_pools:
+                self.candidate_pools[key] = build_candidate_pool(self.food_data, keywords, self.search_index)
+            return self.candidate_pools[key]
+
+    def get_stats(self):
+        return {
+            'file_path': self.file_path,
+            'backend': self.backend,
+            'rows': len(self.food_data),
+            'columns': len(self.food_data.columns),
+            'load_time': self.load_time,
+            'loaded_from_cache': self.loaded_from_cache,
+            'memory_usage': self.memory_usage,
+            'mapped_bytes': self.mapped_bytes,
+            'query_cache': self.query_cache.get_stats(),
+        }
+
+
+def format_value(value):
+    """ Format a dataset value for display. Nutrients are stored as float32, so show at most 7 significant digits. """
+    if isinstance(value, (float, np.floating)):
+        return f'{value:.7g}'
+    return str(value)
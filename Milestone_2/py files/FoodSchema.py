@@ -0,0 +1,132 @@
+import numpy as np
+
+NAME_COLUMN = 'food'
+CALORIES = 'Caloric Value'
+PROTEIN = 'Protein'
+CARBS = 'Carbohydrates'
+FAT = 'Fat'
+# Every nutrient column the app knows, in Food_Nutrition_Dataset.csv order
+NUTRIENT_COLUMNS = [
+    CALORIES, FAT, 'Saturated Fats', 'Monounsaturated Fats', 'Polyunsaturated Fats', CARBS, 'Sugars',
+    PROTEIN, 'Dietary Fiber', 'Cholesterol', 'Sodium', 'Water', 'Vitamin A', 'Vitamin B1', 'Vitamin B11',
+    'Vitamin B12', 'Vitamin B2', 'Vitamin B3', 'Vitamin B5', 'Vitamin B6', 'Vitamin C', 'Vitamin D',
+    'Vitamin E', 'Vitamin K', 'Calcium', 'Copper', 'Iron', 'Magnesium', 'Manganese', 'Phosphorus',
+    'Potassium', 'Selenium', 'Zinc', 'Nutrition Density',
+]
+NUTRIENT_DTYPE = np.float32
+# Food record fields and the dataset columns they are read from
+FOOD_COLUMNS = {'calories': CALORIES, 'protein': PROTEIN, 'carbs': CARBS, 'fat': FAT}
+# Lowercase names a nutrient column may also be asked for by, such as NutrientRange('Carbs', ...)
+COLUMN_ALIASES = {**{column.lower(): column for column in NUTRIENT_COLUMNS}, **FOOD_COLUMNS}
+
+
+class SchemaError(ValueError):
+    """ Raised when a dataset header does not match the schema, or a needed column is missing. """
+
+
+def validate_header(columns):
+    """
+    Check a CSV header and return the columns the app reads from it, in file order: the name
+    column, which must come first, then every known nutrient column. Unknown columns are left out.
+    """
+    columns = [str(column) for column in columns]
+    if not columns or columns[0] != NAME_COLUMN:
+        raise SchemaError(f"The first column must be '{NAME_COLUMN}', found {columns[:1]}")
+    duplicates = sorted({column for column in columns if columns.count(column) > 1})
+    if duplicates:
+        raise SchemaError(f"Duplicate columns in dataset header: {duplicates}")
+    return [column for column in columns if column == NAME_COLUMN or column in NUTRIENT_COLUMNS]
+
+
+def get_dtypes(columns):
+    """ read_csv dtypes for columns: text for the name, float32 for every nutrient. """
+    return {column: object if column == NAME_COLUMN else NUTRIENT_DTYPE for column in columns}
+
+
+def read_header(csv_path):
+    import pandas as pd  # Imported here, so main.py can import the column names without loading pandas
+    return pd.read_csv(csv_path, nrows=0).columns.tolist()
+
+
+def read_food_csv(csv_path, **kwargs):
+    """ Validate the CSV's header, then parse only the schema's columns with their final dtypes. """
+    import pandas as pd
+    columns = validate_header(read_header(csv_path))
+    return pd.read_csv(csv_path, usecols=columns, dtype=get_dtypes(columns), **kwargs)
+
+
+def column_values(food_data, position):
+    """
+    The array of the column at position. food_data is a DataFrame, whose array is a view, or a
+    table such as SqliteFoodStore whose column_values() reads rows from its database on demand.
+    """
+    if hasattr(food_data, 'column_values'):
+        return food_data.column_values(position)
+    return food_data.iloc[:, position].to_numpy()
+
+
+class ColumnHandle:
+    """ A column resolved once against a dataset: its name, position and dtype. """
+
+    __slots__ = ('name', 'position', 'dtype')
+
+    def __init__(self, name, position, dtype):
+        self.name = name
+        self.position = position
+        self.dtype = dtype
+
+    def values(self, food_data):
+        """ The column's array; a view of the dataset, not a copy. """
+        return column_values(food_data, self.position)
+
+    def __repr__(self):
+        return f"ColumnHandle({self.name!r}, position={self.position})"
+
+
+class FoodSchema:
+    """
+    The columns of one loaded dataset, validated once and resolved to ColumnHandles, so code
+    reads nutrients by name instead of by position or by searching the header.
+    """
+
+    def __init__(self, columns):
+        columns = [str(column) for column in columns]
+        validate_header(columns)
+        self.columns = columns
+        self.handles = {column: ColumnHandle(column, position, get_dtypes([column])[column])
+                        for position, column in enumerate(columns)}
+        self.name = self.handles[NAME_COLUMN]
+        self.nutrients = [self.handles[column] for column in columns if column in NUTRIENT_COLUMNS]
+
+    @classmethod
+    def of(cls, food_data):
+        return cls(food_data.columns)
+
+    def __contains__(self, column):
+        return column in self.handles
+
+    def column(self, column):
+        """
+        Return the handle of column, given by name or by one of its COLUMN_ALIASES, raising
+        SchemaError if this dataset does not have it.
+        """
+        handle = self.handles.get(column) or self.handles.get(COLUMN_ALIASES.get(str(column).lower()))
+        if handle is None:
+            raise SchemaError(f"The dataset has no '{column}' column")
+        return handle
+
+    @property
+    def calories(self):
+        return self.column(CALORIES)
+
+    @property
+    def protein(self):
+        return self.column(PROTEIN)
+
+    @property
+    def carbs(self):
+        return self.column(CARBS)
+
+    @property
+    def fat(self):
+        return self.column(FAT)
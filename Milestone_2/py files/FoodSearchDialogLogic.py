@@ -1,43 +1,65 @@
 import wx
 import wx.grid
-import pandas as pd
+import numpy as np
 from FoodSearchDialog import FoodSearchDialog
+from FoodRepository import FoodRepository
+from FoodGridTable import FoodGridTable
+from FoodSearchIndex import make_incremental_search
+from LiveSearch import LiveSearch
+from QueryCache import QueryCache
+from BackgroundTasks import QueryRunner, BACKGROUND_ROWS
+from FoodSchema import NAME_COLUMN, CALORIES, PROTEIN, CARBS, FAT
+
+# Columns shown in the dialog's results
+DIALOG_COLUMNS = [NAME_COLUMN, CALORIES, PROTEIN, CARBS, FAT]
 
 
 class FoodSearchDialogLogic(FoodSearchDialog):
     def __init__(self, parent):
         super().__init__(parent)
 
-        self.food_data = pd.read_csv('Food_Nutrition_Dataset.csv')
         self.selected_food = None
+        self.query_runner = QueryRunner(self.on_query_error)
+        self.set_repository(FoodRepository.get_instance())
 
         self.search_button.Bind(wx.EVT_BUTTON, self.on_search)
+        self.live_search = LiveSearch(self.search_input, self.on_search)
         self.add_food_button.Bind(wx.EVT_BUTTON, self.on_select_food)
+        self.Bind(wx.EVT_WINDOW_DESTROY, self.on_destroy)
 
         self.initialize_grid()
         self.adjust_layout()
 
         self.SetSize((800, 600))
 
-    def initialize_grid(self):
-        self.food_list.ClearGrid()
-
-        if self.food_list.GetNumberCols() > 0:
-            self.food_list.DeleteCols(0, self.food_list.GetNumberCols())
-
-        self.food_list.AppendCols(5)
+    def set_repository(self, repository):
+        self.food_data = repository.get_view()
+        self.search_index = repository.search_index  # Shared with the dataset list
+        self.incremental_search = make_incremental_search(self.search_index)
+        self.query_cache = repository.query_cache
+        self.dataset_version = repository.version
+
+    def bind_repository(self, repository):
+        """
+        Switch to the repository's reloaded dataset while the dialog is open, and search it again,
+        so the row id of the food picked is one of the new dataset.
+        """
+        self.set_repository(repository)
+        self.selected_food = None
+        self.on_search(None)
 
-        # Set column labels
-        column_labels = self.food_data.columns[:5].tolist()
-        for col, label in enumerate(column_labels):
-            self.food_list.SetColLabelValue(col, label)
+    def initialize_grid(self):
+        # Virtual table over the name and macro columns; it starts empty until the first search
+        self.food_table = FoodGridTable(self.food_data, columns=DIALOG_COLUMNS)
+        self.food_table.set_data(self.food_data, np.zeros(0, dtype=np.int64))
+        self.food_list.SetTable(self.food_table, True)
+        self.food_list.EnableEditing(False)
 
         self.food_list.SetMinSize((600, 400))
 
         self.food_list.EnableScrolling(True, True)
 
-        self.food_list.AutoSizeColumns()
-        self.food_list.AutoSizeRows()
+        self.food_table.autosize_columns(self.food_list)
 
     def adjust_layout(self):
         main_sizer = self.GetSizer()
@@ -52,35 +74,35 @@ class FoodSearchDialogLogic(FoodSearchDialog):
 
     def on_search(self, event):
         query = self.search_input.GetValue().lower()
-        results = self.food_data[self.food_data.iloc[:, 0].str.lower().str.contains(query)]
-        self.display_results(results)
-
-    def display_results(self, results):
-        self.food_list.ClearGrid()
-        if self.food_list.GetNumberRows() > 0:
-            self.food_list.DeleteRows(0, self.food_list.GetNumberRows())
-
-        self.food_list.AppendRows(len(results))
-
-        for row_idx, (_, row) in enumerate(results.iterrows()):
-            for col_idx in range(5):
-                self.food_list.SetCellValue(row_idx, col_idx, str(row.iloc[col_idx]))
-
-        self.food_list.AutoSizeColumns()
+        self.live_search.cancel()
+        if query:
+            key = QueryCache.make_key(query, [], self.dataset_version)
+            # Searched like the dataset list: on a worker thread on large datasets, with the stateless index
+            background = len(self.food_data) >= BACKGROUND_ROWS
+            search = self.search_index if background else self.incremental_search
+            self.query_runner.run(self.query_cache, key, lambda: search.ranked_search(query),
+                                  lambda result: self.display_results(self.food_data, result[0]), background)
+        else:
+            self.query_runner.cancel()
+            self.display_results(self.food_data)  # An empty query shows the whole dataset
+
+    def on_query_error(self, error):
+        wx.MessageBox(f"Error running query: {error}", "Error", wx.OK | wx.ICON_ERROR)
+
+    def display_results(self, results, rows=None):
+        """ Show results, or only the given row ids of it; the grid reads the cells it draws. """
+        self.food_table.set_data(results, rows)
+        self.food_list.ClearSelection()
 
     def on_select_food(self, event):
         selected_row = self.food_list.GetGridCursorRow()
-        if selected_row != -1:
-            self.selected_food = {
-                'name': self.food_list.GetCellValue(selected_row, 0),
-                'calories': float(self.food_list.GetCellValue(selected_row, 1)),
-                'protein': float(self.food_list.GetCellValue(selected_row, 2)),
-                'carbs': float(self.food_list.GetCellValue(selected_row, 3)),
-                'fat': float(self.food_list.GetCellValue(selected_row, 4))
-            }
+        if 0 <= selected_row < self.food_table.GetNumberRows():
+            self.selected_food = self.food_table.get_record(selected_row)
             self.EndModal(wx.ID_OK)
 
     def get_selected_food(self):
         return self.selected_food
 
-
+    def on_destroy(self, event):
+        event.Skip()
+        self.query_runner.cancel()  # Its results would otherwise reach the destroyed grid
@@ -0,0 +1,320 @@
+import bisect
+import sys
+import numpy as np
+
+NGRAM_SIZE = 3
+SEARCH_RESULT_LIMIT = 100
+FUZZY_MIN_SCORE = 0.3
+# What to_arrays saves of an index besides its names
+INDEX_ARRAYS = ('name_lengths', 'name_tails', 'gram_keys', 'gram_offsets', 'gram_rows', 'gram_counts', 'sorted_rows')
+# Bits per code point in a packed trigram key
+CHAR_BITS = 21
+
+
+def normalize_name(name):
+    return name.lower() if isinstance(name, str) else ''
+
+
+class FoodSearchIndex:
+    """
+    Inverted trigram index over the food names, built once when the dataset is loaded.
+    Substring queries intersect the posting lists of the query's trigrams and only check the
+    few remaining candidates; prefix queries are a binary search over the sorted names.
+    Queries shorter than a trigram are answered from the trigrams they start, plus the last two
+    characters of every name, which start none.
+    """
+
+    def __init__(self, names, postings=None, arrays=None):
+        """
+        postings, if given, are the CSR posting lists of names, and arrays the to_arrays() of an
+        index saved earlier, which is reopened without rebuilding anything. With either, names
+        must be normalized already.
+        """
+        if arrays is None:
+            if hasattr(names, 'tolist'):
+                names = names.tolist()
+            if postings is None:
+                names = [normalize_name(name) for name in names]
+                postings = _to_csr(*gram_pairs(names))
+            gram_keys, gram_offsets, gram_rows = postings
+            arrays = {
+                'name_lengths': np.array([len(name) for name in names], dtype=np.int64),
+                'name_tails': _name_tails(names),
+                'gram_keys': gram_keys,
+                'gram_offsets': gram_offsets,
+                'gram_rows': gram_rows,
+                'gram_counts': np.bincount(gram_rows, minlength=len(names)),
+                'sorted_rows': np.array(sorted(range(len(names)), key=names.__getitem__), dtype=np.int64),
+            }
+        self.names = names
+        for name in INDEX_ARRAYS:
+            setattr(self, name, arrays[name])
+        self.all_rows = np.arange(len(self.names), dtype=np.int64)
+        self.sorted_names = SortedNames(self.names, self.sorted_rows)
+
+    def to_arrays(self):
+        """ The index's arrays by name, to save next to the dataset; the names are saved with it. """
+        return {name: getattr(self, name) for name in INDEX_ARRAYS}
+
+    def __len__(self):
+        return len(self.names)
+
+    def _postings(self, key):
+        position = np.searchsorted(self.gram_keys, key)
+        if position == len(self.gram_keys) or self.gram_keys[position] != key:
+            return None
+        return self.gram_rows[self.gram_offsets[position]:self.gram_offsets[position + 1]]
+
+    def search(self, query, within=None):
+        """
+        Return the row ids, in dataset order, of every food whose name contains query.
+        within optionally restricts the search to a sorted array of rows known to hold every match.
+        """
+        query = query.lower()
+        rows = self.all_rows if within is None else within
+        if not query:
+            return rows
+        if len(query) < NGRAM_SIZE:
+            return self._short_search(query, rows)
+
+        grams = _query_grams(query)
+        lists = sorted((self._postings(key) for key in grams), key=lambda rows: 0 if rows is None else len(rows))
+        if lists[0] is None:
+            return self.all_rows[:0]
+        if within is not None and len(within) < len(lists[0]):
+            # Narrowing the previous results is cheaper than starting from the shortest posting list
+            lists.insert(0, within)
+        candidates = lists[0]
+        for rows in lists[1:]:
+            candidates = np.intersect1d(candidates, rows, assume_unique=True)
+            if len(candidates) == 0:
+                return candidates
+        if len(grams) == 1 and len(query) == NGRAM_SIZE:
+            return candidates
+        # Every trigram matching does not guarantee the trigrams are adjacent, so confirm the candidates
+        return self._scan(query, candidates)
+
+    def ranked_search(self, query, limit=SEARCH_RESULT_LIMIT, min_score=FUZZY_MIN_SCORE):
+        """ Return the top limit (rows, scores) for query, best first. See rank for the scoring. """
+        return self.rank(query, self.search(query), limit, min_score)
+
+    def rank(self, query, exact_rows, limit=SEARCH_RESULT_LIMIT, min_score=FUZZY_MIN_SCORE):
+        """
+        Rank the exact substring matches of query and, if there are fewer than limit of them, fill up
+        with typo-tolerant trigram matches such as 'brocoli' -> 'broccoli'.
+
+        Exact matches score 1 plus the share of the name the query covers, so 'apple' ranks above
+        'apple pie', plus 1 more if the name starts with the query. Fuzzy matches score between
+        min_score and 1: the mean of the share of the query's trigrams found in the name and the
+        trigram Jaccard similarity of the two.
+        An empty query matches everything in dataset order.
+        """
+        query = query.lower()
+        if not query:
+            return exact_rows, np.ones(len(exact_rows))
+
+        exact_scores = 1.0 + len(query) / np.maximum(self.name_lengths[exact_rows], 1)
+        exact_scores += np.isin(exact_rows, self.prefix_search(query), assume_unique=True)
+        rows, scores = _top(exact_rows, exact_scores, limit)
+        grams = _query_grams(query)
+        if len(rows) >= limit or not grams:
+            return rows, scores
+
+        posting_lists = [self._postings(key) for key in grams]
+        posting_lists = [rows for rows in posting_lists if rows is not None]
+        if not posting_lists:
+            return rows, scores
+        candidates, shared = np.unique(np.concatenate(posting_lists), return_counts=True)
+        containment = shared / len(grams)
+        jaccard = shared / (len(grams) + self.gram_counts[candidates] - shared)
+        fuzzy_scores = (containment + jaccard) / 2
+        keep = (fuzzy_scores >= min_score) & ~np.isin(candidates, exact_rows, assume_unique=True)
+        fuzzy_rows, fuzzy_scores = _top(candidates[keep], fuzzy_scores[keep], limit - len(rows))
+        return np.concatenate([rows, fuzzy_rows]), np.concatenate([scores, fuzzy_scores])
+
+    def prefix_search(self, prefix):
+        """ Return the row ids, in dataset order, of every food whose name starts with prefix. """
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self.sorted_names, prefix)
+        end = bisect.bisect_left(self.sorted_names, prefix + '\uffff', lo=start)
+        return np.sort(self.sorted_rows[start:end])
+
+    def _short_search(self, query, rows):
+        """
+        Return the rows whose name contains query, one or two characters long. Every occurrence
+        of it starts a trigram, whose keys form one contiguous range, or lies in the name's tail.
+        """
+        query_key = 0
+        for char in query:
+            query_key = (query_key << CHAR_BITS) | ord(char)
+        shift = np.uint64(CHAR_BITS * (NGRAM_SIZE - len(query)))
+        start, end = np.searchsorted(self.gram_keys, [np.uint64(query_key) << shift, np.uint64(query_key + 1) << shift])
+        matches = np.zeros(len(self.names), dtype=bool)
+        matches[self.gram_rows[self.gram_offsets[start]:self.gram_offsets[end]]] = True
+        if len(query) == 2:
+            matches |= self.name_tails == query_key
+        else:
+            last_char = (1 << CHAR_BITS) - 1
+            matches |= ((self.name_tails >> CHAR_BITS) == query_key) | ((self.name_tails & last_char) == query_key)
+        return rows[matches[rows]]
+
+    def _scan(self, query, rows):
+        names = self.names
+        return np.array([row for row in rows if query in names[row]], dtype=np.int64)
+
+
+class SortedNames:
+    """ The names in sorted order, for bisect, read through the sort order instead of copied. """
+
+    def __init__(self, names, order):
+        self.names = names
+        self.order = order
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, i):
+        return self.names[self.order[i]]
+
+
+class IncrementalSearch:
+    """ Remembers the last query's results, so a query that extends it only narrows those rows. """
+
+    def __init__(self, index):
+        self.index = index
+        self.last_query = None
+        self.last_rows = None
+
+    def search(self, query):
+        query = query.lower()
+        within = None
+        if self.last_query is not None and self.last_query in query:
+            within = self.last_rows
+        rows = self.index.search(query, within)
+        self.last_query, self.last_rows = query, rows
+        return rows
+
+    def ranked_search(self, query, limit=SEARCH_RESULT_LIMIT, min_score=FUZZY_MIN_SCORE):
+        return self.index.rank(query, self.search(query), limit, min_score)
+
+    def reset(self):
+        self.last_query = None
+        self.last_rows = None
+
+
+def make_incremental_search(index):
+    """
+    IncrementalSearch over a FoodSearchIndex. Other indexes, such as a SqliteFoodStore that ranks
+    and pages its matches in SQL, are returned as they are, since there is nothing to narrow.
+    """
+    return IncrementalSearch(index) if isinstance(index, FoodSearchIndex) else index
+
+
+class SearchIndexBuilder:
+    """
+    Builds a FoodSearchIndex from names added a chunk at a time, e.g. while a CSV is being read.
+    Each chunk's trigrams are extracted and sorted when it is added; build() only merges them.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.keys = []
+        self.rows = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, names, pairs=None):
+        """
+        Add the next names. pairs, if given, are their (keys, rows) from gram_pairs with rows
+        counted from 0, e.g. kept from an earlier build, and names must be normalized already.
+        """
+        if pairs is None:
+            # Interned, so names repeated across chunks share one lowercase copy
+            names = [sys.intern(normalize_name(name)) for name in names]
+            keys, rows = gram_pairs(names, len(self.names))
+        else:
+            keys, rows = pairs[0], pairs[1] + len(self.names)
+        self.keys.append(keys)
+        self.rows.append(rows)
+        self.names.extend(names)
+
+    def build(self):
+        if not self.keys:
+            return FoodSearchIndex([])
+        # Each chunk's pieces are freed as soon as they are joined, and each array as soon as it is reordered
+        keys = np.concatenate(self.keys)
+        self.keys = []
+        # Chunks were added in row order, so a stable sort keeps every posting list sorted
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        rows = np.concatenate(self.rows)
+        self.rows = []
+        rows = rows[order]
+        del order
+        return FoodSearchIndex(self.names, _to_csr(keys, rows))
+
+
+def gram_pairs(names, first_row=0):
+    """
+    Return (keys, rows) for every distinct trigram of every name, sorted by key and then row.
+    keys are trigrams packed into integers and rows are numbered from first_row.
+    """
+    if not names:
+        return np.array([], dtype=np.uint64), np.array([], dtype=np.int64)
+    # Every name followed by a separator, as one array of code points
+    chars = np.frombuffer('\0'.join(names).encode('utf-32-le') + b'\0\0\0\0', dtype=np.uint32)
+    lengths = np.array([len(name) + 1 for name in names])
+    char_rows = np.repeat(np.arange(first_row, first_row + len(names), dtype=np.int64), lengths)
+
+    keys = _pack_grams(chars)
+    rows = char_rows[:len(keys)]
+    valid = (chars[:-2] != 0) & (chars[1:-1] != 0) & (chars[2:] != 0)
+    keys, rows = keys[valid], rows[valid]
+
+    # rows are ascending already, so a stable sort on the key keeps each posting list sorted
+    order = np.argsort(keys, kind='stable')
+    keys, rows = keys[order], rows[order]
+    distinct = np.ones(len(keys), dtype=bool)
+    distinct[1:] = (keys[1:] != keys[:-1]) | (rows[1:] != rows[:-1])
+    return keys[distinct], rows[distinct]
+
+
+def _to_csr(keys, rows):
+    """
+    Turn sorted (keys, rows) pairs into posting lists in CSR form: gram_keys holds each distinct
+    trigram, and gram_rows[gram_offsets[i]:gram_offsets[i + 1]] the sorted rows containing it.
+    """
+    # keys are sorted, so each distinct key starts where it differs from the previous one
+    starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]])) if len(keys) else np.zeros(0, dtype=np.int64)
+    return keys[starts], np.append(starts, len(keys)).astype(np.int64), rows
+
+
+def _name_tails(names):
+    """ The last two code points of every name, packed like a trigram key's last two; 0 pads short names. """
+    lengths = np.array([len(name) for name in names], dtype=np.int64)
+    # Every name followed by a separator, after two separators so the first name has characters before it
+    chars = np.frombuffer(('\0\0' + '\0'.join(names) + '\0').encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+    ends = np.cumsum(lengths + 1) + 1  # Position of each name's separator
+    last = np.where(lengths >= 1, chars[ends - 1], 0)
+    second_last = np.where(lengths >= 2, chars[ends - 2], 0)
+    return (second_last << CHAR_BITS) | last
+
+
+def _pack_grams(chars):
+    """ Pack every run of three code points (21 bits each) into one integer key. """
+    chars = chars.astype(np.uint64)
+    return (chars[:-2] << np.uint64(2 * CHAR_BITS)) | (chars[1:-1] << np.uint64(CHAR_BITS)) | chars[2:]
+
+
+def _query_grams(query):
+    return set(_pack_grams(np.frombuffer(query.encode('utf-32-le'), dtype=np.uint32)).tolist())
+
+
+def _top(rows, scores, limit):
+    """ The limit best rows by score, best first; ties keep dataset order. """
+    if len(rows) > limit:
+        best = np.argpartition(-scores, limit - 1)[:limit]
+        rows, scores = rows[best], scores[best]
+    order = np.lexsort((rows, -scores))
+    return rows[order], scores[order]
@@ -0,0 +1,35 @@
+import wx
+
+SEARCH_DELAY_MS = 250
+
+
+class LiveSearch:
+    """
+    Runs a search as the user types. The search only starts once typing has paused for delay_ms;
+    every keystroke before that restarts the timer, so queries that are already stale never run.
+    """
+
+    def __init__(self, text_ctrl, callback, delay_ms=SEARCH_DELAY_MS):
+        self.text_ctrl = text_ctrl
+        self.callback = callback
+        self.delay_ms = delay_ms
+        self.timer = None
+
+        self.text_ctrl.Bind(wx.EVT_TEXT, self.on_text)
+        self.text_ctrl.Bind(wx.EVT_WINDOW_DESTROY, self.on_destroy)
+
+    def on_text(self, event):
+        event.Skip()
+        if self.timer is not None and self.timer.IsRunning():
+            self.timer.Restart(self.delay_ms)
+        else:
+            self.timer = wx.CallLater(self.delay_ms, self.callback, None)
+
+    def cancel(self):
+        """ Drop a pending search, e.g. because the Search button ran it already. """
+        if self.timer is not None and self.timer.IsRunning():
+            self.timer.Stop()
+
+    def on_destroy(self, event):
+        event.Skip()
+        self.cancel()
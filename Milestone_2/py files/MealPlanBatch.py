@@ -0,0 +1,92 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from MealPlanOptimizer import CandidatePool, MealPlanOptimizer
+
+PLANS_PER_TASK = 8
+# Workers never fork the GUI process, which has wx and worker threads running: forkserver forks
+# them from a clean single-threaded server, and spawn, where forkserver is missing, starts them fresh
+MP_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+# Set in each worker process by _init_worker
+_worker_optimizer = None
+_worker_memory = []
+
+
+def _share_array(array):
+    """ Copy array into a new shared memory block; returns (block, description for the workers). """
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    return block, (block.name, array.shape, array.dtype.str)
+
+
+def _attach_array(description):
+    name, shape, dtype = description
+    block = shared_memory.SharedMemory(name=name)
+    _worker_memory.append(block)  # Keeps the mapping alive as long as the worker
+    return np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _init_worker(rows_description, nutrients_description):
+    global _worker_optimizer
+    pool = CandidatePool(_attach_array(rows_description), _attach_array(nutrients_description))
+    _worker_optimizer = MealPlanOptimizer(pool)
+
+
+def _generate(optimizer, seeds, days, meals, meal_targets):
+    results = []
+    for seed in seeds:
+        week = optimizer.generate_week(days, meals, meal_targets, seed)
+        results.append((optimizer.week_error(week, meal_targets), week))
+    return results
+
+
+def _generate_in_worker(seeds, days, meals, meal_targets):
+    return _generate(_worker_optimizer, seeds, days, meals, meal_targets)
+
+
+def generate_plans(pool, days, meals, count, top_n=1, meal_targets=None, seed=None, workers=None, progress=None):
+    """
+    Generate count weekly plans and return the top_n best as a list of (error, week), best first;
+    see MealPlanOptimizer.generate_week and week_error. Plans are spread over a process pool of
+    workers processes (one per CPU by default) that read the candidate pool from shared memory
+    instead of each receiving a copy. Every plan has its own seed derived from seed, so the result
+    does not depend on the number of workers. progress(plans_done, count) is called after every
+    PLANS_PER_TASK plans; if it raises, e.g. TaskCancelled, the plans not started are dropped.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(count)
+    batches = [seeds[i:i + PLANS_PER_TASK] for i in range(0, count, PLANS_PER_TASK)]
+    workers = min(workers or os.cpu_count() or 1, len(batches))
+    results = []
+    if workers <= 1:
+        optimizer = MealPlanOptimizer(pool)
+        for batch in batches:
+            results += _generate(optimizer, batch, days, meals, meal_targets)
+            if progress is not None:
+                progress(len(results), count)
+    else:
+        blocks = []
+        try:
+            rows_block, rows_description = _share_array(pool.rows)
+            blocks.append(rows_block)
+            nutrients_block, nutrients_description = _share_array(pool.nutrients)
+            blocks.append(nutrients_block)
+            executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context(MP_START_METHOD),
+                                           initializer=_init_worker, initargs=(rows_description, nutrients_description))
+            try:
+                tasks = [executor.submit(_generate_in_worker, batch, days, meals, meal_targets) for batch in batches]
+                for task in tasks:
+                    results += task.result()
+                    if progress is not None:
+                        progress(len(results), count)
+            finally:
+                executor.shutdown(cancel_futures=True)
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+    # Plans in seed order, so ties go to the earlier plan
+    order = sorted(range(len(results)), key=lambda i: results[i][0])
+    return [results[i] for i in order[:top_n]]
@@ -1,9 +1,26 @@
-import random
-import pandas as pd
+import numpy as np
 import wx
 import wx.grid
 from MealPlanFrame import MealPlanFrame
 from FoodSearchDialogLogic import FoodSearchDialogLogic
+from FoodRepository import FoodRepository
+from MealPlanGridTable import MealPlanGridTable, COLUMNS, DAYS, MEALS
+from MealPlanOptimizer import MealPlanOptimizer, DEFAULT_MEAL_TARGETS
+from BackgroundTasks import TaskExecutor
+from FoodRecord import FoodRecordReader
+from FoodSchema import CALORIES, PROTEIN, CARBS, FAT
+
+# Nutrients shown below the calorie and macro totals, one line per group
+SUMMARY_DETAIL_LINES = [
+    ['Dietary Fiber', 'Sugars', 'Saturated Fats', 'Cholesterol', 'Sodium'],
+    ['Calcium', 'Iron', 'Magnesium', 'Potassium', 'Zinc'],
+    ['Vitamin A', 'Vitamin B12', 'Vitamin C', 'Vitamin D', 'Vitamin E'],
+]
+# Weekly plans generated across worker processes by the best-plan button; the one closest to the targets is kept
+ALTERNATIVE_PLANS = 64
+GENERATE_LABEL = "Generate Meal Plan"
+BEST_PLAN_LABEL = f"Best of {ALTERNATIVE_PLANS} Plans"
+CANCEL_LABEL = "Cancel Generation"
 
 
 class MealPlanFrameLogic(MealPlanFrame):
@@ -13,18 +30,27 @@ class MealPlanFrameLogic(MealPlanFrame):
         self.meal_plan_manager = meal_plan_manager
         self.current_view = 'daily'
 
-        self.food_dataset = pd.read_csv('Food_Nutrition_Dataset.csv')  # Load dataset into a DataFrame
+        self.repository = FoodRepository.get_instance()
+        self.food_dataset = self.repository.get_view()  # Shared dataset, not reloaded
+        self.optimizer = None
+        self.record_reader = None
+        self.meal_targets = dict(DEFAULT_MEAL_TARGETS)  # Meal -> MealTargets, used by the generator
+        self.seed = None  # Set to make generated plans reproducible
+        self.generation_task = None
+        self.search_dialog = None  # The open FoodSearchDialogLogic, rebound when the dataset is reloaded
 
-        self.day_choice.SetItems(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'])
+        self.day_choice.SetItems(DAYS)
         self.day_choice.SetSelection(0)
 
         self.initialize_grid()
+        self.add_best_plan_button()
         self.adjust_layout()
 
         # Bind events
         self.day_choice.Bind(wx.EVT_CHOICE, self.on_day_selected)
         self.weekly_view_button.Bind(wx.EVT_BUTTON, self.toggle_view)
         self.generate_meal_plan_button1.Bind(wx.EVT_BUTTON, self.on_generate_random_meal_plan)
+        self.best_plan_button.Bind(wx.EVT_BUTTON, self.on_generate_best_plan)
         self.add_food_button.Bind(wx.EVT_BUTTON, self.on_add_food)
         self.change_food_button.Bind(wx.EVT_BUTTON, self.on_change_food)
         self.remove_food_button.Bind(wx.EVT_BUTTON, self.on_remove_food)
@@ -36,24 +62,36 @@ class MealPlanFrameLogic(MealPlanFrame):
 
         self.SetSize((650, 600))
 
-    def initialize_grid(self):
-        self.meal_plan_list.ClearGrid()
-
-        if self.meal_plan_list.GetNumberCols() > 0:
-            self.meal_plan_list.DeleteCols(0, self.meal_plan_list.GetNumberCols())
+    def bind_repository(self, repository):
+        """ Switch to the repository's reloaded dataset; a plan being generated from the old one is cancelled. """
+        self.cancel_generation()
+        self.repository = repository
+        self.food_dataset = repository.get_view()
+        self.optimizer = None
+        self.record_reader = None
+        if self.search_dialog is not None:
+            self.search_dialog.bind_repository(repository)
+        self.update_meal_plan_display()
 
-        self.meal_plan_list.AppendCols(7)
+    def initialize_grid(self):
+        self.meal_plan_table = MealPlanGridTable()
+        self.meal_plan_list.SetTable(self.meal_plan_table, True)
+        self.meal_plan_list.EnableEditing(False)
 
-        column_labels = ["Day", "Meal", "Food", "Calories", "Protein (g)", "Carbs (g)", "Fat (g)"]
-        for col, label in enumerate(column_labels):
-            self.meal_plan_list.SetColLabelValue(col, label)
+        for col, (_, _, width) in enumerate(COLUMNS):
+            self.meal_plan_list.SetColSize(col, width)
 
         self.meal_plan_list.SetMinSize((600, 400))
 
         self.meal_plan_list.EnableScrolling(True, True)
 
-        self.meal_plan_list.AutoSizeColumns()
-        self.meal_plan_list.AutoSizeRows()
+    def add_best_plan_button(self):
+        """ Added here rather than in the generated frame, next to the generate button and styled like it. """
+        generate_button = self.generate_meal_plan_button1
+        self.best_plan_button = wx.Button(generate_button.GetParent(), wx.ID_ANY, BEST_PLAN_LABEL)
+        self.best_plan_button.SetForegroundColour(generate_button.GetForegroundColour())
+        self.best_plan_button.SetBackgroundColour(generate_button.GetBackgroundColour())
+        generate_button.GetContainingSizer().Add(self.best_plan_button, 0, wx.ALL, 5)
 
     def adjust_layout(self):
         main_sizer = self.GetSizer()
@@ -76,144 +114,197 @@ class MealPlanFrameLogic(MealPlanFrame):
         self.update_meal_plan_display()
 
     def update_meal_plan_display(self):
-        self.meal_plan_list.ClearGrid()
-        if self.meal_plan_list.GetNumberRows() > 0:
-            self.meal_plan_list.DeleteRows(0, self.meal_plan_list.GetNumberRows())
+        """ Reload every row; used when the day or view changes or the whole plan is replaced. """
         meal_plan = self.meal_plan_manager.get_meal_plan()
         if self.current_view == 'daily':
             day = self.day_choice.GetStringSelection()
-            self.display_day(day, meal_plan[day])
-        else:
-            for day in meal_plan:
-                self.display_day(day, meal_plan[day])
+            meal_plan = {day: meal_plan[day]}
+        self.meal_plan_table.set_entries(meal_plan)
         self.update_nutrient_summary()
-        self.meal_plan_list.AutoSizeColumns()
-
-    def display_day(self, day, day_plan):
-        for meal, foods in day_plan.items():
-            for food in foods:
-                row = self.meal_plan_list.GetNumberRows()
-                self.meal_plan_list.AppendRows(1)
-                self.meal_plan_list.SetCellValue(row, 0, day)
-                self.meal_plan_list.SetCellValue(row, 1, meal)
-                self.meal_plan_list.SetCellValue(row, 2, food['name'])
-                self.meal_plan_list.SetCellValue(row, 3, str(food['calories']))
-                self.meal_plan_list.SetCellValue(row, 4, str(food['protein']))
-                self.meal_plan_list.SetCellValue(row, 5, str(food['carbs']))
-                self.meal_plan_list.SetCellValue(row, 6, str(food['fat']))
-
-        self.meal_plan_list.SetColSize(0, 100)  # Day column
-        self.meal_plan_list.SetColSize(1, 80)  # Meal column
-        self.meal_plan_list.SetColSize(2, 200)  # Food column
-        for i in range(3, 7):
-            self.meal_plan_list.SetColSize(i, 80)  # Nutrient columns
 
     def update_nutrient_summary(self):
-        meal_plan = self.meal_plan_manager.get_meal_plan()
+        """ Read the running totals kept by the meal plan manager. """
         if self.current_view == 'daily':
-            day = self.day_choice.GetStringSelection()
-            total_calories = sum(float(food['calories']) for meal in meal_plan[day].values() for food in meal)
-            total_protein = sum(float(food['protein']) for meal in meal_plan[day].values() for food in meal)
-            total_carbs = sum(float(food['carbs']) for meal in meal_plan[day].values() for food in meal)
-            total_fat = sum(float(food['fat']) for meal in meal_plan[day].values() for food in meal)
+            totals = self.meal_plan_manager.get_totals(self.day_choice.GetStringSelection())
         else:
-            total_calories = sum(
-                float(food['calories']) for day in meal_plan.values() for meal in day.values() for food in meal)
-            total_protein = sum(
-                float(food['protein']) for day in meal_plan.values() for meal in day.values() for food in meal)
-            total_carbs = sum(
-                float(food['carbs']) for day in meal_plan.values() for meal in day.values() for food in meal)
-            total_fat = sum(float(food['fat']) for day in meal_plan.values() for meal in day.values() for food in meal)
+            totals = self.meal_plan_manager.get_totals()
+        total_calories, total_protein = totals[CALORIES], totals[PROTEIN]
+        total_carbs, total_fat = totals[CARBS], totals[FAT]
 
         summary = f"Total for the {'week' if self.current_view == 'weekly' else 'day'}: "
         summary += f"Calories: {total_calories:.0f}, Protein: {total_protein:.1f}g, Carbs: {total_carbs:.1f}g, Fat: {total_fat:.1f}g"
+        for columns in SUMMARY_DETAIL_LINES:
+            details = [f"{column}: {totals[column]:.1f}" for column in columns if column in totals]
+            if details:
+                summary += "\n" + ", ".join(details)
         self.nutrient_summary.SetLabel(summary)
+        self.Layout()
+
+    def get_optimizer(self):
+        """ The candidate pool is shared through the repository, so it is only rebuilt when the dataset is. """
+        pool = self.repository.get_candidate_pool()
+        if self.optimizer is None or self.optimizer.pool is not pool:
+            self.optimizer = MealPlanOptimizer(pool)
+        return self.optimizer
 
     def on_generate_random_meal_plan(self, event):
-        """ Generate a random well-balanced meal plan for the entire week. """
-        days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        meals = ['Breakfast', 'Lunch', 'Dinner', 'Snack']
+        """ Generate a well-balanced meal plan for the entire week in the background; clicking again cancels. """
+        if self.cancel_generation():
+            return
+        optimizer = self.get_optimizer()
+        if len(optimizer) == 0:
+            print("No cooked meals found in the dataset.")
+        self.on_generation_started(self.generate_meal_plan_button1)
+        self.generation_task = TaskExecutor.get_instance().submit(
+            self.generate_week, optimizer, on_done=self.on_week_generated,
+            on_progress=self.on_generation_progress, on_error=self.on_generation_error)
+
+    def on_generate_best_plan(self, event):
+        """ Generate ALTERNATIVE_PLANS weekly plans across worker processes in the background and keep the best one. """
+        if self.cancel_generation():
+            return
+        pool = self.repository.get_candidate_pool()
+        if len(pool) == 0:
+            print("No cooked meals found in the dataset.")
+        self.on_generation_started(self.best_plan_button)
+        self.generation_task = TaskExecutor.get_instance().submit(
+            self.generate_alternative_plans, pool, ALTERNATIVE_PLANS, 1, on_done=self.on_best_plan_generated,
+            on_progress=self.on_plans_progress, on_error=self.on_generation_error)
+
+    def cancel_generation(self):
+        """ Cancel a running generation, so either generate button stops it when clicked again; returns whether one ran. """
+        if self.generation_task is None:
+            return False
+        self.generation_task.cancel()
+        self.on_generation_finished()
+        self.update_nutrient_summary()
+        return True
+
+    def generate_week(self, task, optimizer):
+        """ Runs on a worker thread; reporting progress after each day is also where cancellation stops it. """
+        return optimizer.generate_week(DAYS, MEALS, self.meal_targets, self.seed, progress=task.report_progress)
+
+    def generate_alternative_plans(self, task, pool, count, top_n):
+        """
+        Runs on a worker thread, which waits for the worker processes; returns the top_n of count
+        weekly plans as (error, week), best first. Cancelling drops the plans not started yet.
+        """
+        from MealPlanBatch import generate_plans  # Pulls in multiprocessing, which startup does not need
+        return generate_plans(pool, DAYS, MEALS, count, top_n, self.meal_targets, self.seed,
+                              progress=task.report_progress)
+
+    def on_generation_started(self, button):
+        self.generate_meal_plan_button1.SetLabel(GENERATE_LABEL)
+        self.best_plan_button.SetLabel(BEST_PLAN_LABEL)
+        button.SetLabel(CANCEL_LABEL)
+        self.nutrient_summary.SetLabel("Generating meal plan...")
+
+    def on_generation_progress(self, done, total, message):
+        self.nutrient_summary.SetLabel(f"Generating meal plan... {done}/{total} days")
+
+    def on_plans_progress(self, done, total, message):
+        self.nutrient_summary.SetLabel(f"Generating meal plans... {done}/{total} plans")
+
+    def on_week_generated(self, week):
+        self.on_generation_finished()
         self.meal_plan_manager.clear_meal_plan()
-        for day in days:
-            for meal in meals:
-                selected_foods = self.generate_balanced_meal()
-                for food in selected_foods:
-                    self.meal_plan_manager.add_food(day, meal, food)
+        for day, meals in week.items():
+            for meal, (rows, portions) in meals.items():
+                for row_id, portion in zip(rows, portions):
+                    self.meal_plan_manager.add_food(day, meal, int(row_id), portion)
         self.update_meal_plan_display()
 
-    def generate_balanced_meal(self):
-        """ Selects a random set of food items from the dataset that form a balanced meal. """
-        calorie_target = 600
-        protein_target = 30
-        carb_target = 50
-        fat_target = 20
-        selected_foods = []
-        total_calories, total_protein, total_carbs, total_fat = 0, 0, 0, 0
-        keywords = ['cooked', 'baked', 'grilled', 'roasted', 'fried', 'stewed', 'braised']
-        potential_foods = self.food_dataset[
-            self.food_dataset['food'].str.contains('|'.join(keywords), case=False, na=False)
-        ]
-        if potential_foods.empty:
-            print("No cooked meals found in the dataset.")
-            return selected_foods
-        while total_calories < calorie_target:
-            food = potential_foods.sample().iloc[0]
-            total_calories += food['Caloric Value']
-            total_protein += food['Protein']
-            total_carbs += food['Carbohydrates']
-            total_fat += food['Fat']
+    def on_best_plan_generated(self, plans):
+        _, week = plans[0]
+        self.on_week_generated(week)
 
+    def on_generation_error(self, error):
+        self.on_generation_finished()
+        self.update_nutrient_summary()
+        wx.MessageBox(f"Error generating meal plan: {error}", "Error", wx.OK | wx.ICON_ERROR)
+
+    def on_generation_finished(self):
+        self.generation_task = None
+        self.generate_meal_plan_button1.SetLabel(GENERATE_LABEL)
+        self.best_plan_button.SetLabel(BEST_PLAN_LABEL)
+
+    def generate_balanced_meal(self, meal='Lunch'):
+        """ Select cooked foods, and their portions, that meet the nutrient targets of meal. """
+        optimizer = self.get_optimizer()
+        rows, portions, _ = optimizer.optimize_meal(self.meal_targets[meal], np.random.default_rng(self.seed))
+        if self.record_reader is None:
+            self.record_reader = FoodRecordReader(self.food_dataset)
+        selected_foods = []
+        for row_id, portion in zip(rows, portions):
+            food = self.record_reader.read(row_id)
             selected_foods.append({
-                'name': food['food'],
-                'calories': food['Caloric Value'],
-                'protein': food['Protein'],
-                'carbs': food['Carbohydrates'],
-                'fat': food['Fat']
+                'row_id': food.row_id,
+                'name': food.name,
+                'quantity': portion,
+                'calories': food.calories * portion,
+                'protein': food.protein * portion,
+                'carbs': food.carbs * portion,
+                'fat': food.fat * portion
             })
-            if total_calories >= calorie_target and total_protein >= protein_target:
-                break
-
         return selected_foods
 
-    def on_add_food(self, event):
-        dialog = FoodSearchDialogLogic(self)
+    def pick_food(self):
+        """
+        Let the user pick a food in the search dialog. Returns the food and the dataset version it
+        was read from, or (None, None).
+        """
+        dialog = self.search_dialog = FoodSearchDialogLogic(self)
+        food, version = None, None
         if dialog.ShowModal() == wx.ID_OK:
-            food = dialog.get_selected_food()
-            if food:
-                day = self.day_choice.GetStringSelection()
-                meal_dialog = wx.SingleChoiceDialog(self, "Choose a meal", "Add to Meal",
-                                                    ['Breakfast', 'Lunch', 'Dinner', 'Snack'])
-                if meal_dialog.ShowModal() == wx.ID_OK:
-                    meal = meal_dialog.GetStringSelection()
-                    self.meal_plan_manager.add_food(day, meal, food)
-                    self.update_meal_plan_display()
-                meal_dialog.Destroy()
+            food, version = dialog.get_selected_food(), dialog.dataset_version
+        self.search_dialog = None
         dialog.Destroy()
+        return food, version
+
+    def get_current_food(self, food, version):
+        """ food, read again if the dataset was reloaded since; None if it is no longer in it. """
+        food = self.repository.current_record(food, version)
+        if food is None:
+            wx.MessageBox("The dataset was reloaded and this food is no longer in it.", "Food Not Found",
+                          wx.OK | wx.ICON_WARNING)
+        return food
+
+    def on_add_food(self, event):
+        food, version = self.pick_food()
+        if food:
+            day = self.day_choice.GetStringSelection()
+            meal_dialog = wx.SingleChoiceDialog(self, "Choose a meal", "Add to Meal", MEALS)
+            if meal_dialog.ShowModal() == wx.ID_OK:
+                meal = meal_dialog.GetStringSelection()
+                # The dataset may have been reloaded while the meal was chosen
+                food = self.get_current_food(food, version)
+                if food:
+                    handle = self.meal_plan_manager.add_food(day, meal, food)
+                    row = self.meal_plan_table.insert_entry(self.meal_plan_manager.get_entry(handle))
+                    self.meal_plan_list.MakeCellVisible(row, 0)
+                    self.update_nutrient_summary()
+            meal_dialog.Destroy()
 
 
     def on_change_food(self, event):
         row = self.meal_plan_list.GetGridCursorRow()
-        if row != -1:
-            day = self.meal_plan_list.GetCellValue(row, 0)
-            meal = self.meal_plan_list.GetCellValue(row, 1)
-            food_name = self.meal_plan_list.GetCellValue(row, 2)
-
-            dialog = FoodSearchDialogLogic(self)
-            if dialog.ShowModal() == wx.ID_OK:
-                new_food = dialog.get_selected_food()
-                if new_food:
-                    self.meal_plan_manager.change_food(day, meal, food_name, new_food)
-                    self.update_meal_plan_display()
-            dialog.Destroy()
+        handle = self.meal_plan_table.get_handle(row)
+        if handle is not None:
+            new_food, version = self.pick_food()
+            if new_food:
+                new_food = self.get_current_food(new_food, version)
+            if new_food:
+                self.meal_plan_manager.change_food(handle, new_food)
+                self.meal_plan_table.update_entry(row, self.meal_plan_manager.get_entry(handle))
+                self.update_nutrient_summary()
 
     def on_remove_food(self, event):
         row = self.meal_plan_list.GetGridCursorRow()
-        if row != -1:
-            day = self.meal_plan_list.GetCellValue(row, 0)
-            meal = self.meal_plan_list.GetCellValue(row, 1)
-            food_name = self.meal_plan_list.GetCellValue(row, 2)
-            self.meal_plan_manager.remove_food(day, meal, food_name)
-            self.update_meal_plan_display()
+        handle = self.meal_plan_table.get_handle(row)
+        if handle is not None:
+            self.meal_plan_manager.remove_food(handle)
+            self.meal_plan_table.delete_row(row)
+            self.update_nutrient_summary()
 
     def on_clear_meal_plan(self, event):
         self.meal_plan_manager.clear_meal_plan()
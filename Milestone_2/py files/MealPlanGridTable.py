@@ -0,0 +1,97 @@
+import bisect
+import wx
+import wx.grid
+from FoodRepository import format_value
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+MEALS = ['Breakfast', 'Lunch', 'Dinner', 'Snack']
+COLUMNS = [("Day", 'day', 100), ("Meal", 'meal', 80), ("Food", 'name', 200), ("Calories", 'calories', 80),
+           ("Protein (g)", 'protein', 80), ("Carbs (g)", 'carbs', 80), ("Fat (g)", 'fat', 80)]
+
+
+class MealPlanGridTable(wx.grid.GridTableBase):
+    """
+    Virtual table over the meal plan entries on screen, kept sorted by day and meal. Adding,
+    changing or removing a food inserts, rewrites or deletes a single row, so the grid never
+    rebuilds the rows that did not change.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.entries = []
+        self.keys = []  # (day, meal) position of each row, for finding where a new entry goes
+
+    def set_entries(self, day_plans):
+        """ Replace every row with the entries of {day: {meal: [food dicts]}}. """
+        old_rows = len(self.entries)
+        self.entries, self.keys = [], []
+        for day, day_plan in day_plans.items():
+            for meal, foods in day_plan.items():
+                for food in foods:
+                    self.entries.append(dict(food, day=day, meal=meal))
+                    self.keys.append(_key(day, meal))
+        self._notify(old_rows)
+
+    def insert_entry(self, entry):
+        """ Insert entry after the last row of its meal and return the grid row it was put in. """
+        key = _key(entry['day'], entry['meal'])
+        row = bisect.bisect_right(self.keys, key)
+        self.entries.insert(row, entry)
+        self.keys.insert(row, key)
+        self._send(wx.grid.GRIDTABLE_NOTIFY_ROWS_INSERTED, row, 1)
+        return row
+
+    def update_entry(self, row, entry):
+        self.entries[row] = entry
+        view = self.GetView()
+        if view is not None:
+            view.RefreshBlock(row, 0, row, len(COLUMNS) - 1)
+
+    def delete_row(self, row):
+        del self.entries[row]
+        del self.keys[row]
+        self._send(wx.grid.GRIDTABLE_NOTIFY_ROWS_DELETED, row, 1)
+
+    def get_handle(self, row):
+        """ Meal plan entry handle shown in a grid row, or None for an invalid row. """
+        if 0 <= row < len(self.entries):
+            return self.entries[row].get('handle')
+        return None
+
+    def _notify(self, old_rows):
+        new_rows = len(self.entries)
+        if new_rows > old_rows:
+            self._send(wx.grid.GRIDTABLE_NOTIFY_ROWS_APPENDED, new_rows - old_rows)
+        elif new_rows < old_rows:
+            self._send(wx.grid.GRIDTABLE_NOTIFY_ROWS_DELETED, new_rows, old_rows - new_rows)
+        view = self.GetView()
+        if view is not None:
+            view.ForceRefresh()
+
+    def _send(self, message_id, *arguments):
+        view = self.GetView()
+        if view is not None:
+            view.ProcessTableMessage(wx.grid.GridTableMessage(self, message_id, *arguments))
+
+    def GetNumberRows(self):
+        return len(self.entries)
+
+    def GetNumberCols(self):
+        return len(COLUMNS)
+
+    def GetColLabelValue(self, col):
+        return COLUMNS[col][0]
+
+    def IsEmptyCell(self, row, col):
+        return False
+
+    def GetValue(self, row, col):
+        value = self.entries[row][COLUMNS[col][1]]
+        return value if isinstance(value, str) else format_value(value)
+
+    def SetValue(self, row, col, value):
+        pass  # Entries are changed through the meal plan manager
+
+
+def _key(day, meal):
+    return DAYS.index(day), MEALS.index(meal)
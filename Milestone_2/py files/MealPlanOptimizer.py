@@ -0,0 +1,197 @@
+import numpy as np
+from FoodSchema import FoodSchema, CALORIES, PROTEIN, CARBS, FAT
+
+COOKED_KEYWORDS = ['cooked', 'baked', 'grilled', 'roasted', 'fried', 'stewed', 'braised']
+# Dataset columns the targets apply to, in MealTargets.as_array() order
+TARGET_COLUMNS = [CALORIES, PROTEIN, CARBS, FAT]
+MAX_FOODS_PER_MEAL = 4
+SAMPLE_SIZE = 512
+# Portion sizes a food can be added in, as multiples of the dataset's serving
+PORTIONS = np.array([0.5, 1.0, 1.5, 2.0])
+RESTARTS = 8
+# Each greedy step picks at random among this many best additions, so plans vary between meals
+CHOICES_PER_STEP = 10
+DEFAULT_TOLERANCE = 0.15
+# Errors are relative to a target, or to this many units (kcal or grams) when the target is smaller, e.g. 0
+MIN_TARGET_SCALE = 1.0
+
+
+class MealTargets:
+    """ Nutrient targets for one meal; a meal is on target when every total is within tolerance of it. """
+
+    def __init__(self, calories=600, protein=30, carbs=50, fat=20, tolerance=DEFAULT_TOLERANCE):
+        self.calories = calories
+        self.protein = protein
+        self.carbs = carbs
+        self.fat = fat
+        self.tolerance = tolerance
+
+    def as_array(self):
+        return np.array([self.calories, self.protein, self.carbs, self.fat], dtype=np.float64)
+
+    def __repr__(self):
+        return (f"MealTargets(calories={self.calories}, protein={self.protein}, carbs={self.carbs}, "
+                f"fat={self.fat}, tolerance={self.tolerance})")
+
+
+DEFAULT_MEAL_TARGETS = {meal: MealTargets() for meal in ['Breakfast', 'Lunch', 'Dinner', 'Snack']}
+
+
+def target_scale(targets):
+    return np.maximum(targets, MIN_TARGET_SCALE)
+
+
+def meal_error(totals, targets):
+    """ Sum of squared relative errors of totals against a targets array; works on (..., 4) arrays. """
+    return (((totals - targets) / target_scale(targets)) ** 2).sum(axis=-1)
+
+
+def within_tolerance(totals, meal_targets):
+    targets = meal_targets.as_array()
+    return bool(np.all(np.abs(totals - targets) <= meal_targets.tolerance * target_scale(targets)))
+
+
+class CandidatePool:
+    """ The foods meals are picked from: their dataset row ids and their TARGET_COLUMNS values as a matrix. """
+
+    def __init__(self, rows, nutrients):
+        self.rows = rows
+        self.nutrients = nutrients
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def build_candidate_pool(food_dataset, keywords=COOKED_KEYWORDS, search_index=None):
+    """
+    Collect the foods whose name contains any of keywords (ignoring case), leaving out foods with
+    missing target nutrients. With a FoodSearchIndex the names are looked up instead of scanned.
+    """
+    schema = FoodSchema.of(food_dataset)
+    if search_index is not None:
+        matches = [search_index.search(keyword) for keyword in keywords]
+        rows = np.unique(np.concatenate(matches)) if matches else np.zeros(0, dtype=np.int64)
+    else:
+        names = food_dataset.iloc[:, schema.name.position]
+        rows = np.flatnonzero(names.str.contains('|'.join(keywords), case=False, na=False).to_numpy())
+    nutrients = np.column_stack([schema.column(column).values(food_dataset)[rows]
+                                 for column in TARGET_COLUMNS]).astype(np.float64)
+    complete = ~np.isnan(nutrients).any(axis=1)
+    return CandidatePool(rows[complete].astype(np.int64), nutrients[complete])
+
+
+class MealPlanOptimizer:
+    """
+    Picks up to MAX_FOODS_PER_MEAL foods from a CandidatePool, and a portion of each, per meal so
+    that their calories, protein, carbs and fat come as close as possible to the meal's targets.
+    Each meal is a randomized greedy search over SAMPLE_SIZE random candidates times PORTIONS:
+    every step adds one of the CHOICES_PER_STEP (food, portion) pairs that lower the error most,
+    then one pass replaces each pick with the best one if that helps. The best of RESTARTS
+    searches is kept. The random numbers for a meal are drawn in one batch from a seeded
+    generator, so the same seed always gives the same plan.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.rows = pool.rows
+        self.nutrients = pool.nutrients
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _draw(self, rng):
+        """ Draw the candidates and choices for every step of every restart of one meal at once. """
+        steps = 2 * MAX_FOODS_PER_MEAL  # Greedy steps plus replacement steps
+        if len(self) <= SAMPLE_SIZE:
+            candidates = None  # Small pools are searched whole
+        else:
+            candidates = rng.integers(0, len(self), size=(RESTARTS, steps, SAMPLE_SIZE))
+        return candidates, rng.integers(0, CHOICES_PER_STEP, size=(RESTARTS, steps))
+
+    def _best_addition(self, totals, targets, picks, candidates, choice=0):
+        """ Return (error, pool position, portion) of the choice-th best food of candidates to add to totals. """
+        if candidates is None:
+            candidates = np.arange(len(self))
+        # errors[i, j]: error after adding PORTIONS[j] of candidate i
+        additions = self.nutrients[candidates, None, :] * PORTIONS[None, :, None]
+        errors = meal_error(totals + additions, targets).ravel()
+        errors[np.isin(np.repeat(candidates, len(PORTIONS)), picks)] = np.inf  # Each food at most once per meal
+        if choice > 0 and len(errors) > choice:
+            best = np.argpartition(errors, choice)[:choice + 1]
+            chosen = best[np.argsort(errors[best], kind='stable')][choice]
+        else:
+            chosen = np.argmin(errors)
+        best, portion = divmod(chosen, len(PORTIONS))
+        return errors[chosen], candidates[best], PORTIONS[portion]
+
+    def _search(self, meal_targets, candidates, choices):
+        targets = meal_targets.as_array()
+        picks, portions = [], []
+        totals = np.zeros(len(targets))
+        error = meal_error(totals, targets)
+        step = 0
+        for step in range(MAX_FOODS_PER_MEAL):
+            sample = None if candidates is None else candidates[step]
+            new_error, pick, portion = self._best_addition(totals, targets, picks, sample, choices[step])
+            if new_error >= error:
+                break
+            picks.append(pick)
+            portions.append(portion)
+            totals = totals + self.nutrients[pick] * portion
+            error = new_error
+            if within_tolerance(totals, meal_targets):
+                return picks, portions, totals, error
+        # Try replacing each pick with a better food or portion
+        for i in range(len(picks)):
+            sample = None if candidates is None else candidates[MAX_FOODS_PER_MEAL + i]
+            rest = totals - self.nutrients[picks[i]] * portions[i]
+            new_error, pick, portion = self._best_addition(rest, targets, picks[:i] + picks[i + 1:], sample)
+            if new_error < error:
+                picks[i], portions[i] = pick, portion
+                totals = rest + self.nutrients[pick] * portion
+                error = new_error
+        return picks, portions, totals, error
+
+    def optimize_meal(self, meal_targets, rng):
+        """ Return (row ids, portions, totals) of the best meal found for meal_targets. """
+        best = [], [], np.zeros(len(TARGET_COLUMNS)), np.inf
+        if len(self) == 0:
+            return self.rows[:0], np.zeros(0), best[2]
+        candidates, choices = self._draw(rng)
+        for restart in range(RESTARTS):
+            result = self._search(meal_targets, None if candidates is None else candidates[restart], choices[restart])
+            if result[3] < best[3]:
+                best = result
+            if within_tolerance(best[2], meal_targets):
+                break
+        picks, portions, totals, _ = best
+        return self.rows[np.array(picks, dtype=np.int64)], np.array(portions, dtype=np.float64), totals
+
+    def generate_week(self, days, meals, meal_targets=None, seed=None, progress=None):
+        """
+        Return {day: {meal: (row ids, portions)}} for every meal of days. meal_targets maps a
+        meal to its MealTargets; meals missing from it use the defaults. progress, if given, is
+        called with (days done, len(days)) after each day.
+        """
+        meal_targets = meal_targets or DEFAULT_MEAL_TARGETS
+        rng = np.random.default_rng(seed)
+        week = {}
+        for done, day in enumerate(days, 1):
+            week[day] = {}
+            for meal in meals:
+                rows, portions, _ = self.optimize_meal(meal_targets.get(meal, MealTargets()), rng)
+                week[day][meal] = rows, portions
+            if progress is not None:
+                progress(done, len(days))
+        return week
+
+    def week_error(self, week, meal_targets=None):
+        """ Score a generate_week result: the mean error of its meals against their targets, lower is better. """
+        meal_targets = meal_targets or DEFAULT_MEAL_TARGETS
+        errors = []
+        for meals in week.values():
+            for meal, (rows, portions) in meals.items():
+                positions = np.searchsorted(self.rows, rows)  # Pool rows are sorted
+                totals = (self.nutrients[positions] * portions[:, None]).sum(axis=0)
+                errors.append(meal_error(totals, meal_targets.get(meal, MealTargets()).as_array()))
+        return float(np.mean(errors)) if errors else 0.0
@@ -0,0 +1,114 @@
+import numpy as np
+from FoodSchema import FoodSchema
+
+
+class NutrientRange:
+    """ A min/max constraint on one nutrient column. Either bound may be None. """
+
+    def __init__(self, column, minimum=None, maximum=None, inclusive=True):
+        self.column = column
+        self.minimum = minimum
+        self.maximum = maximum
+        self.inclusive = inclusive
+
+    def key(self):
+        return self.column, self.minimum, self.maximum, self.inclusive
+
+    def __repr__(self):
+        return f"NutrientRange({self.column!r}, minimum={self.minimum}, maximum={self.maximum}, inclusive={self.inclusive})"
+
+
+class NutrientFilter:
+    """
+    Evaluates any number of NutrientRange constraints over the dataset without copying it.
+    Columns are resolved through the dataset's FoodSchema and their arrays read once. mask()
+    builds one boolean mask in place; apply() and top_n() use per-column sorted indexes, built
+    the first time a column is queried, so a range is two binary searches and a top-N list is a
+    slice.
+    """
+
+    def __init__(self, food_data, schema=None):
+        self.food_data = food_data
+        self.schema = schema if schema is not None else FoodSchema.of(food_data)
+        self.column_arrays = {}
+        self.sorted_indexes = {}
+
+    def __len__(self):
+        return len(self.food_data)
+
+    def find_column(self, name):
+        """ Resolve a column by name or alias through the dataset's FoodSchema; SchemaError if it has none. """
+        return self.schema.column(name).name
+
+    def get_array(self, column):
+        handle = self.schema.column(column)
+        if handle.name not in self.column_arrays:
+            self.column_arrays[handle.name] = handle.values(self.food_data)
+        return self.column_arrays[handle.name]
+
+    def mask(self, ranges):
+        mask = np.ones(len(self), dtype=bool)
+        scratch = np.empty(len(self), dtype=bool)
+        for nutrient_range in ranges:
+            values = self.get_array(nutrient_range.column)
+            if nutrient_range.minimum is not None:
+                compare = np.greater_equal if nutrient_range.inclusive else np.greater
+                compare(values, nutrient_range.minimum, out=scratch)
+                mask &= scratch
+            if nutrient_range.maximum is not None:
+                compare = np.less_equal if nutrient_range.inclusive else np.less
+                compare(values, nutrient_range.maximum, out=scratch)
+                mask &= scratch
+        return mask
+
+    def sorted_index(self, column):
+        """ Return (order, sorted_values) for column; missing values sort to the end. """
+        column = self.find_column(column)
+        if column not in self.sorted_indexes:
+            values = self.get_array(column)
+            order = np.argsort(values, kind='stable')
+            if len(order) < np.iinfo(np.int32).max:
+                order = order.astype(np.int32)
+            self.sorted_indexes[column] = order, values[order]
+        return self.sorted_indexes[column]
+
+    def range_slice(self, nutrient_range):
+        """ Return (order, start, end) so that order[start:end] are the rows inside nutrient_range. """
+        order, sorted_values = self.sorted_index(nutrient_range.column)
+        end = np.searchsorted(sorted_values, np.nan)  # First missing value
+        start = 0
+        if nutrient_range.minimum is not None:
+            side = 'left' if nutrient_range.inclusive else 'right'
+            start = np.searchsorted(sorted_values[:end], nutrient_range.minimum, side=side)
+        if nutrient_range.maximum is not None:
+            side = 'right' if nutrient_range.inclusive else 'left'
+            end = np.searchsorted(sorted_values[:end], nutrient_range.maximum, side=side)
+        return order, start, max(start, end)
+
+    def apply(self, ranges):
+        """ Return the ids, in dataset order, of the rows that satisfy every range. """
+        if not ranges:
+            return np.arange(len(self))
+        # Start from the most selective range, then check the others on its rows only
+        slices = [(self.range_slice(nutrient_range), nutrient_range) for nutrient_range in ranges]
+        (order, start, end), best = min(slices, key=lambda item: item[0][2] - item[0][1])
+        rows = np.sort(order[start:end]).astype(np.int64)
+        for nutrient_range in ranges:
+            if nutrient_range is best or len(rows) == 0:
+                continue
+            values = self.get_array(nutrient_range.column)[rows]
+            keep = np.ones(len(rows), dtype=bool)
+            if nutrient_range.minimum is not None:
+                keep &= values >= nutrient_range.minimum if nutrient_range.inclusive else values > nutrient_range.minimum
+            if nutrient_range.maximum is not None:
+                keep &= values <= nutrient_range.maximum if nutrient_range.inclusive else values < nutrient_range.maximum
+            rows = rows[keep]
+        return rows
+
+    def top_n(self, column, n, largest=True):
+        """ Return the ids of the n rows with the largest (or smallest) values in column, best first. """
+        order, sorted_values = self.sorted_index(column)
+        end = np.searchsorted(sorted_values, np.nan)
+        if largest:
+            return order[max(end - n, 0):end][::-1].astype(np.int64)
+        return order[:min(n, end)].astype(np.int64)
@@ -0,0 +1,153 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from DatasetCache import check_source, hash_file
+from DatasetIngest import ColumnStats
+from FoodSchema import read_food_csv, read_header, validate_header
+from FoodSearchIndex import FoodSearchIndex, SearchIndexBuilder, INDEX_ARRAYS
+
+STORE_FORMAT_VERSION = 3
+STORE_SUFFIX = '.store'
+BUILD_CHUNK_SIZE = 100000
+
+
+def get_store_dir(csv_path):
+    """ The store lives next to the CSV, e.g. Food_Nutrition_Dataset.store/ """
+    return os.path.splitext(csv_path)[0] + STORE_SUFFIX
+
+
+class NutrientMatrix:
+    """
+    Memory-mapped view of the dataset: a row-major float32 matrix holding every nutrient column,
+    a separate table of food names and the search index saved with them. Pages are read from
+    disk only when they are touched. Like a SqliteFoodStore it is used as the dataset itself:
+    column_values() returns views of the mapped arrays, so opening it copies nothing into memory.
+    """
+
+    def __init__(self, names, matrix, name_column, nutrient_columns, search_index=None):
+        self.names = names
+        self.matrix = matrix
+        self.name_column = name_column
+        self.nutrient_columns = nutrient_columns
+        self.columns = [name_column] + list(nutrient_columns)
+        self.search_index = search_index
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @property
+    def nbytes(self):
+        return self.names.nbytes + self.matrix.nbytes
+
+    def column_values(self, position):
+        return self.names if position == 0 else self.matrix[:, position - 1]
+
+    def head(self, n=5):
+        food_data = pd.DataFrame(self.matrix[:n], columns=self.nutrient_columns)
+        food_data.insert(0, self.name_column, self.names[:n].astype(object))
+        return food_data
+
+    def column_stats(self, chunk_size=BUILD_CHUNK_SIZE):
+        """ ColumnStats of every nutrient column, read a chunk of rows at a time. """
+        stats = ColumnStats([str(column) for column in self.nutrient_columns])
+        for start in range(0, len(self), chunk_size):
+            stats.update(self.matrix[start:start + chunk_size].astype(np.float64))
+        return stats
+
+    def to_frame(self):
+        """ Wrap the matrix in a DataFrame without copying it; only the name column is held in memory. """
+        food_data = pd.DataFrame(self.matrix, columns=self.nutrient_columns, copy=False)
+        food_data.insert(0, self.name_column, self.names.astype(object))
+        return food_data
+
+
+def build_store(csv_path, store_dir, chunk_size=BUILD_CHUNK_SIZE):
+    """ Convert the CSV into a store chunk by chunk, so only one chunk of nutrients is in memory at a time. """
+    os.makedirs(store_dir, exist_ok=True)
+    meta_path = os.path.join(store_dir, 'meta.json')
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    stat = os.stat(csv_path)
+    matrix_path = os.path.join(store_dir, 'nutrients.f32')
+    names = []
+    builder = SearchIndexBuilder()
+    columns = None
+    rows = 0
+
+    with open(matrix_path + '.tmp', 'wb') as f:
+        for chunk in read_food_csv(csv_path, chunksize=chunk_size):
+            if columns is None:
+                columns = chunk.columns.tolist()
+            chunk_names = chunk.iloc[:, 0].fillna('').astype(str).tolist()
+            names.extend(chunk_names)
+            builder.add(chunk_names)
+            np.ascontiguousarray(chunk.iloc[:, 1:].to_numpy(dtype=np.float32)).tofile(f)
+            rows += len(chunk)
+    if columns is None:
+        # A header-only CSV gives no chunks; the store is empty but keeps the header's columns
+        columns = validate_header(read_header(csv_path))
+    os.replace(matrix_path + '.tmp', matrix_path)
+    np.save(os.path.join(store_dir, 'names.npy'), np.array(names, dtype=str))
+    # The search index is saved too, so opening the store does not rebuild it
+    search_index = builder.build()
+    np.save(os.path.join(store_dir, 'search_names.npy'), np.array(search_index.names, dtype=str))
+    for name, array in search_index.to_arrays().items():
+        np.save(os.path.join(store_dir, f'index_{name}.npy'), array)
+
+    metadata = {
+        'format_version': STORE_FORMAT_VERSION,
+        'name_column': columns[0],
+        'nutrient_columns': columns[1:],
+        'rows': rows,
+        'source_mtime': stat.st_mtime_ns,
+        'source_size': stat.st_size,
+        'source_hash': hash_file(csv_path),
+    }
+    # The metadata is written last, so a half-built store is never mistaken for a valid one
+    with open(meta_path, 'w') as f:
+        json.dump(metadata, f)
+    return metadata
+
+
+def read_store_metadata(store_dir):
+    try:
+        with open(os.path.join(store_dir, 'meta.json')) as f:
+            metadata = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if metadata.get('format_version') != STORE_FORMAT_VERSION:
+        return None
+    return metadata
+
+
+def open_store(store_dir, metadata):
+    shape = (metadata['rows'], len(metadata['nutrient_columns']))
+    if metadata['rows'] == 0:
+        return NutrientMatrix(np.array([], dtype=str), np.zeros(shape, dtype=np.float32),
+                              metadata['name_column'], metadata['nutrient_columns'], FoodSearchIndex([]))
+    load = lambda name: np.load(os.path.join(store_dir, name + '.npy'), mmap_mode='r')
+    matrix = np.memmap(os.path.join(store_dir, 'nutrients.f32'), dtype=np.float32, mode='r', shape=shape)
+    search_index = FoodSearchIndex(load('search_names'), arrays={name: load(f'index_{name}') for name in INDEX_ARRAYS})
+    return NutrientMatrix(load('names'), matrix, metadata['name_column'], metadata['nutrient_columns'], search_index)
+
+
+def load_nutrient_matrix(csv_path):
+    """
+    Open the memory-mapped store for csv_path, building or rebuilding it first if the CSV changed.
+    Returns (nutrient_matrix, loaded_from_store).
+    """
+    store_dir = get_store_dir(csv_path)
+    metadata = read_store_metadata(store_dir)
+    if metadata is not None:
+        stat = os.stat(csv_path)
+        unchanged, source_hash = check_source(metadata, csv_path, stat)
+        if unchanged:
+            if source_hash is not None:
+                metadata.update(source_mtime=stat.st_mtime_ns, source_size=stat.st_size)
+                with open(os.path.join(store_dir, 'meta.json'), 'w') as f:
+                    json.dump(metadata, f)
+            return open_store(store_dir, metadata), True
+
+    metadata = build_store(csv_path, store_dir)
+    return open_store(store_dir, metadata), False
@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+class QueryCache:
+    """
+    LRU cache of search and filter results. Entries hold row id arrays (and scores), never
+    DataFrames, and the least recently used ones are evicted once max_bytes is exceeded.
+    Keys include the dataset version, so reloading the dataset never serves stale rows.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(query, ranges, version):
+        """ Build a key from the search text, the NutrientRanges applied and the dataset version. """
+        filters = tuple(sorted((nutrient_range.key() for nutrient_range in ranges), key=repr))
+        return query.lower(), filters, version
+
+    def get(self, key):
+        with self._lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key][0]
+
+    def put(self, key, value):
+        """ Store a tuple of numpy arrays. Values larger than the whole cache are not stored. """
+        size = sum(array.nbytes for array in value)
+        if size > self.max_bytes:
+            return
+        for array in value:
+            array.flags.writeable = False  # Shared between callers, so nobody may change it
+        with self._lock:
+            if key in self.entries:
+                self.current_bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.current_bytes = 0
+
+    def get_stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
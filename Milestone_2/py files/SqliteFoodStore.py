@@ -0,0 +1,306 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from DatasetCache import check_source, hash_file
+from DatasetIngest import ColumnStats, INGEST_CHUNK_SIZE
+from FoodSchema import FoodSchema, NAME_COLUMN, CALORIES, PROTEIN, CARBS, FAT, read_food_csv
+from FoodSearchIndex import NGRAM_SIZE, SEARCH_RESULT_LIMIT, normalize_name
+from MealPlanOptimizer import CandidatePool, COOKED_KEYWORDS, TARGET_COLUMNS
+
+DATABASE_FORMAT_VERSION = 1
+DATABASE_SUFFIX = '.sqlite'
+# Nutrients with a B-tree index; filters on other columns scan the table
+INDEXED_COLUMNS = [CALORIES, PROTEIN, CARBS, FAT]
+PAGE_SIZE = 256
+MAX_CACHED_PAGES = 64
+
+
+def get_database_path(csv_path):
+    """ The database lives next to the CSV, e.g. Food_Nutrition_Dataset.sqlite """
+    return os.path.splitext(csv_path)[0] + DATABASE_SUFFIX
+
+
+def quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _like_pattern(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _match_phrase(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def build_database(csv_path, database_path, chunk_size=INGEST_CHUNK_SIZE):
+    """
+    Import the CSV into a new SQLite database chunk by chunk: a foods table keyed by row id, an
+    FTS5 trigram index over the lowercased names and B-tree indexes on INDEXED_COLUMNS. It is
+    written to a temporary file and moved into place, so readers never see a half-built one.
+    """
+    stat = os.stat(csv_path)
+    temp_path = f'{database_path}.{os.getpid()}.tmp'
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    connection = sqlite3.connect(temp_path)
+    try:
+        columns = None
+        rows = 0
+        for chunk in read_food_csv(csv_path, chunksize=chunk_size):
+            if columns is None:
+                columns = chunk.columns.tolist()
+                definitions = ', '.join(f'{quote(column)} REAL' for column in columns[1:])
+                connection.execute(f'CREATE TABLE foods (row_id INTEGER PRIMARY KEY, {quote(NAME_COLUMN)} TEXT, '
+                                   f'name_key TEXT{", " + definitions if definitions else ""})')
+            names = chunk[NAME_COLUMN].tolist()
+            # SQLite stores NaN as NULL, so missing nutrients stay missing
+            nutrients = chunk.iloc[:, 1:].to_numpy(dtype=np.float64).tolist()
+            connection.executemany(
+                f'INSERT INTO foods VALUES ({", ".join("?" * (len(columns) + 2))})',
+                ([rows + i, name if isinstance(name, str) else None, normalize_name(name)] + values
+                 for i, (name, values) in enumerate(zip(names, nutrients))))
+            rows += len(chunk)
+        if columns is None:
+            columns = [NAME_COLUMN]
+            connection.execute(f'CREATE TABLE foods (row_id INTEGER PRIMARY KEY, {quote(NAME_COLUMN)} TEXT, name_key TEXT)')
+
+        connection.execute("CREATE VIRTUAL TABLE food_names USING fts5(name_key, content='foods', "
+                           "content_rowid='row_id', tokenize='trigram')")
+        connection.execute("INSERT INTO food_names(food_names) VALUES ('rebuild')")
+        for column in INDEXED_COLUMNS:
+            if column in columns:
+                connection.execute(f'CREATE INDEX {quote("index " + column)} ON foods ({quote(column)})')
+        connection.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value)')
+        metadata = {
+            'format_version': DATABASE_FORMAT_VERSION,
+            'columns': '\n'.join(columns),
+            'rows': rows,
+            'source_mtime': stat.st_mtime_ns,
+            'source_size': stat.st_size,
+            'source_hash': hash_file(csv_path),
+        }
+        connection.executemany('INSERT INTO meta VALUES (?, ?)', metadata.items())
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(temp_path, database_path)
+
+
+def read_metadata(database_path):
+    if not os.path.exists(database_path):
+        return None
+    try:
+        connection = sqlite3.connect(f'file:{database_path}?mode=ro', uri=True)
+        try:
+            metadata = dict(connection.execute('SELECT key, value FROM meta'))
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return None
+    if metadata.get('format_version') != DATABASE_FORMAT_VERSION:
+        return None
+    return metadata
+
+
+def open_food_store(csv_path, database_path=None):
+    """
+    Open the SQLite store for csv_path, importing the CSV first if the database is missing or
+    the CSV changed. Returns (store, loaded_from_database).
+    """
+    database_path = database_path or get_database_path(csv_path)
+    metadata = read_metadata(database_path)
+    if metadata is not None:
+        unchanged, _ = check_source(metadata, csv_path, os.stat(csv_path))
+        if unchanged:
+            return SqliteFoodStore(database_path), True
+    build_database(csv_path, database_path)
+    return SqliteFoodStore(database_path), False
+
+
+class StoreColumn:
+    """
+    One column of a SqliteFoodStore used like an array: column[row_id] or column[row_ids]
+    reads the rows' pages from the store's page cache, querying the database on a miss.
+    """
+
+    def __init__(self, store, position):
+        self.store = store
+        self.position = position
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, rows):
+        if np.ndim(rows) == 0:
+            return self.store.get_row(int(rows))[self.position]
+        values = [self.store.get_row(int(row))[self.position] for row in np.asarray(rows).ravel()]
+        return np.array(values, dtype=object if self.position == 0 else np.float64)
+
+
+class SqliteFoodStore:
+    """
+    The dataset kept in a SQLite database instead of in memory. Searches, nutrient filters and
+    the meal generator's candidate selection run as indexed SQL queries that return row ids,
+    and rows are only read when shown or used, a page at a time through a bounded cache, so
+    memory use does not grow with the dataset. The database is opened read-only, so several
+    app instances can share one file. Exposes the query methods of FoodSearchIndex
+    (ranked_search, search, prefix_search) and NutrientFilter (apply) for the frames to use.
+    """
+
+    def __init__(self, database_path):
+        self.database_path = database_path
+        self.connection = sqlite3.connect(f'file:{database_path}?mode=ro', uri=True, check_same_thread=False)
+        self._lock = threading.Lock()  # One connection is shared by the GUI and background queries
+        metadata = dict(self._query('SELECT key, value FROM meta'))
+        self.columns = metadata['columns'].split('\n')
+        self.schema = FoodSchema(self.columns)
+        self.row_count = int(metadata['rows'])
+        self.select_columns = ', '.join(quote(column) for column in self.columns)
+        self.pages = OrderedDict()
+
+    def __len__(self):
+        return self.row_count
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
+
+    def _query(self, sql, parameters=()):
+        with self._lock:
+            return self.connection.execute(sql, parameters).fetchall()
+
+    def column_values(self, position):
+        return StoreColumn(self, position)
+
+    def get_row(self, row_id):
+        """ Return the values of a row as a tuple in column order; missing values are NaN, as in a DataFrame. """
+        if not 0 <= row_id < self.row_count:
+            raise IndexError(f"Row {row_id} is out of range for {self.row_count} rows")
+        page_number = row_id // PAGE_SIZE
+        with self._lock:
+            page = self.pages.get(page_number)
+            if page is not None:
+                self.pages.move_to_end(page_number)
+        if page is None:
+            start = page_number * PAGE_SIZE
+            rows = self._query(f'SELECT {self.select_columns} FROM foods WHERE row_id >= ? AND row_id < ? '
+                               f'ORDER BY row_id', (start, start + PAGE_SIZE))
+            page = [tuple(np.nan if value is None else value for value in row) for row in rows]
+            with self._lock:
+                self.pages[page_number] = page
+                while len(self.pages) > MAX_CACHED_PAGES:
+                    self.pages.popitem(last=False)
+        return page[row_id - page_number * PAGE_SIZE]
+
+    def find_rows(self, names):
+        """ Return the first row id of every food name in names, or -1 where there is no such food. """
+        names = list(names)
+        first_rows = {}
+        for start in range(0, len(names), 500):  # SQLite limits the number of parameters per query
+            batch = [name for name in names[start:start + 500] if isinstance(name, str)]
+            if batch:
+                first_rows.update(self._query(f'SELECT {quote(NAME_COLUMN)}, MIN(row_id) FROM foods WHERE '
+                                              f'{quote(NAME_COLUMN)} IN ({", ".join("?" * len(batch))}) '
+                                              f'GROUP BY {quote(NAME_COLUMN)}', batch))
+        return np.array([first_rows.get(name, -1) if isinstance(name, str) else -1 for name in names], dtype=np.int64)
+
+    def head(self, n=5):
+        return pd.DataFrame([self.get_row(row) for row in range(min(n, self.row_count))], columns=self.columns)
+
+    def _matching(self, query):
+        """ SQL condition and parameters for rows whose lowercased name contains query. """
+        if len(query) >= NGRAM_SIZE:
+            return 'row_id IN (SELECT rowid FROM food_names WHERE food_names MATCH ?)', [_match_phrase(query)]
+        # The trigram index cannot match fewer than three characters, so short queries scan the names
+        return "name_key LIKE ? ESCAPE '\\'", ['%' + _like_pattern(query) + '%']
+
+    def search(self, query, within=None):
+        """ Return the row ids, in dataset order, of every food whose name contains query; within is ignored. """
+        query = query.lower()
+        if not query:
+            return np.arange(self.row_count, dtype=np.int64)
+        condition, parameters = self._matching(query)
+        rows = self._query(f'SELECT row_id FROM foods WHERE {condition} ORDER BY row_id', parameters)
+        return np.array([row[0] for row in rows], dtype=np.int64)
+
+    def prefix_search(self, prefix):
+        rows = self._query("SELECT row_id FROM foods WHERE name_key LIKE ? ESCAPE '\\' ORDER BY row_id",
+                           [_like_pattern(prefix.lower()) + '%'])
+        return np.array([row[0] for row in rows], dtype=np.int64)
+
+    def ranked_search(self, query, limit=SEARCH_RESULT_LIMIT, offset=0):
+        """
+        Return one page of (rows, scores) for query, best first, scored like FoodSearchIndex.rank
+        scores exact matches: names starting with the query first, then names the query covers
+        more of, then dataset order. Typo-tolerant matches are only found by the in-memory index.
+        """
+        query = query.lower()
+        if not query:
+            rows = np.arange(offset, min(offset + limit, self.row_count), dtype=np.int64)
+            return rows, np.ones(len(rows))
+        condition, parameters = self._matching(query)
+        rows = self._query(
+            f"SELECT row_id, 1.0 + CAST(? AS REAL) / max(length(name_key), 1) + (substr(name_key, 1, ?) = ?) AS score "
+            f"FROM foods WHERE {condition} ORDER BY score DESC, row_id LIMIT ? OFFSET ?",
+            [len(query), len(query), query] + parameters + [limit, offset])
+        return (np.array([row[0] for row in rows], dtype=np.int64),
+                np.array([row[1] for row in rows], dtype=np.float64))
+
+    def find_column(self, name):
+        """ Resolve a column like NutrientFilter.find_column. """
+        return self.schema.column(name).name
+
+    def _range_condition(self, nutrient_range):
+        conditions, parameters = [], []
+        column = quote(self.find_column(nutrient_range.column))
+        if nutrient_range.minimum is not None:
+            conditions.append(f'{column} {">=" if nutrient_range.inclusive else ">"} ?')
+            parameters.append(nutrient_range.minimum)
+        if nutrient_range.maximum is not None:
+            conditions.append(f'{column} {"<=" if nutrient_range.inclusive else "<"} ?')
+            parameters.append(nutrient_range.maximum)
+        return conditions, parameters
+
+    def apply(self, ranges, limit=None, offset=0):
+        """ Return the ids, in dataset order, of the rows that satisfy every NutrientRange; optionally one page of them. """
+        conditions, parameters = [], []
+        for nutrient_range in ranges:
+            range_conditions, range_parameters = self._range_condition(nutrient_range)
+            conditions += range_conditions
+            parameters += range_parameters
+        sql = 'SELECT row_id FROM foods'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY row_id'
+        if limit is not None:
+            sql += ' LIMIT ? OFFSET ?'
+            parameters += [limit, offset]
+        return np.array([row[0] for row in self._query(sql, parameters)], dtype=np.int64)
+
+    def candidate_pool(self, keywords=COOKED_KEYWORDS):
+        """ The meal generator's CandidatePool, selected by the database: see build_candidate_pool. """
+        matches = [self._matching(keyword.lower()) for keyword in keywords]
+        if not matches:
+            return CandidatePool(np.zeros(0, dtype=np.int64), np.zeros((0, len(TARGET_COLUMNS))))
+        condition = ' OR '.join(f'({sql})' for sql, _ in matches)
+        complete = ' AND '.join(f'{quote(column)} IS NOT NULL' for column in TARGET_COLUMNS)
+        rows = self._query(f'SELECT row_id, {", ".join(quote(column) for column in TARGET_COLUMNS)} FROM foods '
+                           f'WHERE ({condition}) AND {complete} ORDER BY row_id',
+                           [parameter for _, parameters in matches for parameter in parameters])
+        return CandidatePool(np.array([row[0] for row in rows], dtype=np.int64),
+                             np.array([row[1:] for row in rows], dtype=np.float64).reshape(len(rows), len(TARGET_COLUMNS)))
+
+    def column_stats(self):
+        """ ColumnStats of every nutrient column, aggregated by the database. """
+        stats = ColumnStats(self.columns[1:])
+        if len(stats.columns) == 0:
+            return stats
+        aggregates = ', '.join(f'COUNT({quote(c)}), MIN({quote(c)}), MAX({quote(c)}), TOTAL({quote(c)})'
+                               for c in stats.columns)
+        values = np.array(self._query(f'SELECT {aggregates} FROM foods')[0], dtype=np.float64).reshape(-1, 4)
+        stats.count = values[:, 0].astype(np.int64)
+        stats.minimum, stats.maximum, stats.total = values[:, 1], values[:, 2], values[:, 3]
+        return stats
@@ -0,0 +1,29 @@
+import time
+
+# Taken when this module is first imported, which main.py does before anything else
+START_TIME = time.perf_counter()
+
+_marks = []
+
+
+def mark(label):
+    """ Record how long after startup label happened. Only the first mark of a label is kept. """
+    if not any(existing == label for existing, _ in _marks):
+        _marks.append((label, time.perf_counter() - START_TIME))
+
+
+def get_marks():
+    return list(_marks)
+
+
+def report():
+    """ Return the startup timeline as text, one mark per line, in the order they happened. """
+    lines = ["Startup timing:"]
+    lines += [f"  {seconds * 1000:8.1f} ms  {label}" for label, seconds in sorted(_marks, key=lambda item: item[1])]
+    return "\n".join(lines)
+
+
+def reset():
+    global START_TIME
+    START_TIME = time.perf_counter()
+    _marks.clear()
@@ -1,64 +1,363 @@
+import StartupTiming  # First, so the startup report measures every import
+import os
+import importlib
 import wx
 import warnings
-import pandas as pd  # To handle the dataset
+import numpy as np
 
 from MainFrame import MainFrame
-from DatasetListLogic import DatasetListLogic
-from MealPlanFrameLogic import MealPlanFrameLogic
+from BackgroundTasks import TaskExecutor
+from FoodSchema import FOOD_COLUMNS
+
+# The dataset, the secondary frames and matplotlib are imported on first use, not here
+StartupTiming.mark("imports done")
 
 warnings.filterwarnings("ignore", category=wx.wxPyDeprecationWarning)
 
+# Set NUTRIPRO_PREWARM=0 to skip importing the secondary frames in the background after startup
+PREWARM = os.environ.get('NUTRIPRO_PREWARM', '1') != '0'
+# Seconds between checks for changed dataset CSVs, which are then reloaded; 0 turns the checks off
+REFRESH_INTERVAL = float(os.environ.get('NUTRIPRO_REFRESH_SECONDS', '5'))
+PREWARM_MODULES = ['DatasetListLogic', 'MealPlanFrameLogic', 'ComparisonChart', 'matplotlib.backends.backend_wxagg']
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+MEALS = ['Breakfast', 'Lunch', 'Dinner', 'Snack']
+INITIAL_CAPACITY = 64
+
+
 class MealPlanManager:
+    """
+    Meal plan kept as dataset row ids and quantities in array-backed slots. add_food returns a
+    handle (the entry's slot) and removing or changing an entry by handle is O(1). Handles of
+    removed entries are reused, so they must not be kept after the entry is removed.
+    Totals of every nutrient column per meal, per day and for the week are updated on every
+    change, so reading them never walks the plan.
+    """
+
     def __init__(self, food_dataset):
-        self.meal_plan = {day: {'Breakfast': [], 'Lunch': [], 'Dinner': [], 'Snack': []} for day in
-                          ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']}
+        self._set_columns(food_dataset)
+
+        self.row_ids = np.zeros(0, dtype=np.int64)
+        self.quantities = np.zeros(0)
+        self.entry_days = np.zeros(0, dtype=np.int8)
+        self.entry_meals = np.zeros(0, dtype=np.int8)
+        self.in_use = np.zeros(0, dtype=bool)
+        self.free_slots = []
+        self.entry_count = 0
+        self._grow(INITIAL_CAPACITY)
+        # Handles per meal; dicts keep insertion order and delete in O(1)
+        self.meal_plan = {day: {meal: {} for meal in MEALS} for day in DAYS}
+
+        self.meal_totals = np.zeros((len(DAYS), len(MEALS), len(self.nutrient_columns)))
+        self.day_totals = np.zeros((len(DAYS), len(self.nutrient_columns)))
+        self.week_totals = np.zeros(len(self.nutrient_columns))
+
+    def _set_columns(self, food_dataset):
         self.food_dataset = food_dataset
+        if hasattr(food_dataset, 'column_values'):
+            # A SqliteFoodStore or NutrientMatrix: every column after the name is a nutrient, read by row
+            positions = range(1, len(food_dataset.columns))
+            column_values = food_dataset.column_values
+        else:
+            # Every numeric column after the name; the arrays are views, the dataset is not copied
+            positions = [i for i in range(1, food_dataset.shape[1]) if np.issubdtype(food_dataset.dtypes.iloc[i], np.number)]
+            column_values = lambda i: food_dataset.iloc[:, i].to_numpy()
+        self.food_names = column_values(0)
+        self.nutrient_columns = [str(food_dataset.columns[i]) for i in positions]
+        self.nutrient_arrays = [column_values(i) for i in positions]
+        self.food_positions = {key: self.nutrient_columns.index(column) for key, column in FOOD_COLUMNS.items()}
+
+    def __len__(self):
+        return self.entry_count
+
+    def set_dataset(self, food_dataset, find_rows):
+        """
+        Switch to a reloaded dataset. find_rows(names) returns the row id of each food name in it,
+        or -1; entries move to their food's new row, and entries whose food is gone are removed.
+        Totals are recomputed, since the nutrient columns may have changed. Returns how many
+        entries were removed.
+        """
+        handles = np.flatnonzero(self.in_use)
+        names = [self.food_names[row_id] for row_id in self.row_ids[handles]]
+        self._set_columns(food_dataset)
+        new_rows = np.asarray(find_rows(names) if names else [], dtype=np.int64)
+        self.row_ids[handles] = new_rows
+        for handle in handles[new_rows < 0]:
+            del self.meal_plan[DAYS[self.entry_days[handle]]][MEALS[self.entry_meals[handle]]][handle]
+            self.in_use[handle] = False
+            self.free_slots.append(handle)
+            self.entry_count -= 1
+        self.meal_totals, self.day_totals, self.week_totals = self.compute_totals()
+        return int((new_rows < 0).sum())
+
+    def _grow(self, extra):
+        capacity = len(self.row_ids)
+        self.row_ids = np.concatenate([self.row_ids, np.zeros(extra, dtype=np.int64)])
+        self.quantities = np.concatenate([self.quantities, np.zeros(extra)])
+        self.entry_days = np.concatenate([self.entry_days, np.zeros(extra, dtype=np.int8)])
+        self.entry_meals = np.concatenate([self.entry_meals, np.zeros(extra, dtype=np.int8)])
+        self.in_use = np.concatenate([self.in_use, np.zeros(extra, dtype=bool)])
+        # Popped from the end, so the lowest free slot is used first
+        self.free_slots.extend(range(capacity + extra - 1, capacity - 1, -1))
 
-    def add_food(self, day, meal, food):
-        self.meal_plan[day][meal].append(food)
+    @staticmethod
+    def _row_id(food):
+        """ Foods are passed as a dataset row id, a FoodRecord or a food dict carrying one. """
+        if isinstance(food, dict):
+            if 'row_id' not in food:
+                raise ValueError(f"Food {food.get('name')!r} does not reference a dataset row")
+            return int(food['row_id'])
+        return int(getattr(food, 'row_id', food))
+
+    def _check_handle(self, handle):
+        if not 0 <= handle < len(self.in_use) or not self.in_use[handle]:
+            raise KeyError(f"No meal plan entry with handle {handle}")
+
+    def get_nutrients(self, rows):
+        """ Return the (len(rows), nutrient columns) matrix of the given dataset rows. """
+        return np.column_stack([values[rows] for values in self.nutrient_arrays]).astype(np.float64)
+
+    def _update_totals(self, handle, sign):
+        """ Add (sign=1) or subtract (sign=-1) an entry's nutrients from its meal, day and week totals. """
+        day, meal = self.entry_days[handle], self.entry_meals[handle]
+        values = self.get_nutrients([self.row_ids[handle]])[0] * (sign * self.quantities[handle])
+        self.meal_totals[day, meal] += values
+        self.day_totals[day] += values
+        self.week_totals += values
+
+    def add_food(self, day, meal, food, quantity=1.0):
+        """ Add a food to a meal and return the new entry's handle. """
+        if not self.free_slots:
+            self._grow(len(self.row_ids))
+        handle = self.free_slots.pop()
+        self.row_ids[handle] = self._row_id(food)
+        self.quantities[handle] = quantity
+        self.entry_days[handle] = DAYS.index(day)
+        self.entry_meals[handle] = MEALS.index(meal)
+        self.in_use[handle] = True
+        self.meal_plan[day][meal][handle] = None
+        self.entry_count += 1
+        self._update_totals(handle, 1)
+        return handle
+
+    def change_food(self, handle, new_food, quantity=None):
+        """ Point an entry at a different food, keeping its place in the meal. """
+        self._check_handle(handle)
+        row_id = self._row_id(new_food)
+        self._update_totals(handle, -1)
+        self.row_ids[handle] = row_id
+        if quantity is not None:
+            self.quantities[handle] = quantity
+        self._update_totals(handle, 1)
+
+    def remove_food(self, handle):
+        self._check_handle(handle)
+        day, meal = self.entry_days[handle], self.entry_meals[handle]
+        self._update_totals(handle, -1)
+        del self.meal_plan[DAYS[day]][MEALS[meal]][handle]
+        self.in_use[handle] = False
+        self.free_slots.append(handle)
+        self.entry_count -= 1
+        # Emptied totals are reset, so rounding errors from subtracting cannot build up
+        if not self.meal_plan[DAYS[day]][MEALS[meal]]:
+            self.meal_totals[day, meal] = 0
+            if not any(self.meal_plan[DAYS[day]].values()):
+                self.day_totals[day] = 0
+            if self.entry_count == 0:
+                self.week_totals[:] = 0
+
+    def get_entry(self, handle, all_nutrients=False):
+        """
+        Return the entry as a food dict; nutrient values are scaled by its quantity. With
+        all_nutrients, 'nutrients' maps every nutrient column to its value as well.
+        """
+        self._check_handle(handle)
+        row_id = self.row_ids[handle]
+        quantity = self.quantities[handle]
+        entry = {'handle': handle, 'row_id': int(row_id), 'name': self.food_names[row_id], 'quantity': quantity,
+                 'day': DAYS[self.entry_days[handle]], 'meal': MEALS[self.entry_meals[handle]]}
+        for key, position in self.food_positions.items():
+            entry[key] = self.nutrient_arrays[position][row_id] * quantity
+        if all_nutrients:
+            values = self.get_nutrients([row_id])[0] * quantity
+            entry['nutrients'] = dict(zip(self.nutrient_columns, values.tolist()))
+        return entry
+
+    def get_meal_entries(self, day, meal):
+        return list(self.meal_plan[day][meal])
 
     def get_meal_plan(self):
-        return self.meal_plan
+        """ Return the plan as {day: {meal: [food dicts]}}. """
+        return {day: {meal: [self.get_entry(handle) for handle in handles] for meal, handles in meals.items()}
+                for day, meals in self.meal_plan.items()}
 
-    def change_food(self, day, meal, old_food_name, new_food):
-        for i, food in enumerate(self.meal_plan[day][meal]):
-            if food['name'] == old_food_name:
-                self.meal_plan[day][meal][i] = new_food
-                break
+    def get_totals(self, day=None, meal=None):
+        """ Return {nutrient column: total} for one meal, one day, or the whole week if day is None. """
+        if day is None:
+            totals = self.week_totals
+        elif meal is None:
+            totals = self.day_totals[DAYS.index(day)]
+        else:
+            totals = self.meal_totals[DAYS.index(day), MEALS.index(meal)]
+        return dict(zip(self.nutrient_columns, totals.tolist()))
 
-    def remove_food(self, day, meal, food_name):
-        self.meal_plan[day][meal] = [food for food in self.meal_plan[day][meal] if food['name'] != food_name]
+    def compute_totals(self):
+        """
+        Compute (meal_totals, day_totals, week_totals) from scratch: the quantities of the entries,
+        spread over one row per meal of the week, times the nutrient rows of their foods.
+        """
+        handles = np.flatnonzero(self.in_use)
+        weights = np.zeros((len(DAYS) * len(MEALS), len(handles)))
+        weights[self.entry_days[handles] * len(MEALS) + self.entry_meals[handles], np.arange(len(handles))] = \
+            self.quantities[handles]
+        meal_totals = (weights @ self.get_nutrients(self.row_ids[handles])).reshape(len(DAYS), len(MEALS), -1)
+        day_totals = meal_totals.sum(axis=1)
+        return meal_totals, day_totals, day_totals.sum(axis=0)
 
     def clear_meal_plan(self):
+        self.in_use[:] = False
+        self.free_slots = list(range(len(self.row_ids) - 1, -1, -1))
+        self.entry_count = 0
         for day in self.meal_plan:
             for meal in self.meal_plan[day]:
-                self.meal_plan[day][meal] = []
+                self.meal_plan[day][meal] = {}
+        self.meal_totals[:] = 0
+        self.day_totals[:] = 0
+        self.week_totals[:] = 0
 
     def clear_meal_plan_for_day(self, day):
         """ Clear the meal plan for a specific day (used in random meal generation) """
-        self.meal_plan[day] = {'Breakfast': [], 'Lunch': [], 'Dinner': [], 'Snack': []}
+        for meal in MEALS:
+            for handle in list(self.meal_plan[day][meal]):
+                self.remove_food(handle)
 
 
 class MainApp(wx.App):
     def OnInit(self):
-        self.food_dataset = pd.read_csv('Food_Nutrition_Dataset.csv')
-        self.meal_plan_manager = MealPlanManager(self.food_dataset)
+        self.food_repository = None
+        self.food_dataset = None
+        self.meal_plan_manager = None
+        self.pending_action = None  # Frame to open once the dataset has loaded
+        self.dataset_preview = None  # First rows of a CSV that is still being read
         self.main_frame = MainFrame(None)
+        self.main_frame_title = self.main_frame.GetTitle()
         self.main_frame.search_comparison_button.Bind(wx.EVT_BUTTON, self.on_search_compare)
         self.main_frame.meal_plan_button.Bind(wx.EVT_BUTTON, self.on_meal_plan)
         self.main_frame.exit_button.Bind(wx.EVT_BUTTON, self.on_exit)
         self.main_frame.Show()
+        StartupTiming.mark("main window shown")
+        wx.CallAfter(StartupTiming.mark, "main loop running")
         self.dataset_list = None
         self.meal_plan_frame = None
+        self.refresh_task = None
+        self.refresh_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.on_refresh_timer, self.refresh_timer)
+
+        # Parsed once and shared by every frame; loading on a worker thread keeps the main window responsive
+        self.task_executor = TaskExecutor.get_instance()
+        self.task_executor.submit(load_repository, self.on_dataset_preview, on_done=self.on_dataset_loaded,
+                                  on_progress=self.on_dataset_progress, on_error=self.on_dataset_error)
 
         return True
 
+    def OnExit(self):
+        self.refresh_timer.Stop()
+        self.task_executor.shutdown()
+        return 0
+
+    def on_dataset_progress(self, rows_read, total, message):
+        # Only called while the first load streams a changed CSV in; reloads by refresh() report nothing
+        self.main_frame.SetTitle(f"{self.main_frame_title} - loading dataset, {message}")
+
+    def on_dataset_preview(self, preview):
+        """ The first rows have been read; a dataset list asked for while loading opens on them. """
+        self.dataset_preview = preview
+        if self.pending_action == self.show_dataset_list:
+            self.pending_action = None
+            self.main_frame.SetCursor(wx.NullCursor)
+            self.show_dataset_list()
+
+    def on_dataset_loaded(self, repository):
+        self.main_frame.SetTitle(self.main_frame_title)
+        self.food_repository = repository
+        self.food_dataset = repository.get_view()
+        self.meal_plan_manager = MealPlanManager(self.food_dataset)
+        self.dataset_preview = None
+        StartupTiming.mark("dataset loaded")
+        if self.dataset_list is not None:
+            # Opened on the preview; now it can search and filter the whole dataset
+            self.dataset_list.bind_repository(repository, self.meal_plan_manager)
+        self.main_frame.SetCursor(wx.NullCursor)
+        if self.pending_action is not None:
+            action, self.pending_action = self.pending_action, None
+            action()
+        if REFRESH_INTERVAL > 0:
+            self.refresh_timer.Start(int(REFRESH_INTERVAL * 1000))
+        if PREWARM:
+            self.task_executor.submit(prewarm, repository, on_done=self.on_prewarmed)
+        else:
+            print(StartupTiming.report())
+
+    def on_refresh_timer(self, event):
+        """ Reload the dataset on a worker thread if one of its CSVs was added to or changed on disk. """
+        if self.refresh_task is None:
+            self.refresh_task = self.task_executor.submit(refresh_repository, self.food_repository,
+                                                          on_done=self.on_refresh_done, on_error=self.on_refresh_error)
+
+    def on_refresh_done(self, reloaded):
+        self.refresh_task = None
+        if reloaded:
+            self.on_dataset_reloaded(self.food_repository)
+
+    def on_refresh_error(self, error):
+        # The dataset already shown is kept; the next check tries again
+        self.refresh_task = None
+        print(f"Could not reload the dataset: {error}")
+
+    def on_dataset_reloaded(self, repository):
+        """ Move the meal plan and the open frames over to the reloaded dataset. """
+        self.food_dataset = repository.get_view()
+        removed = self.meal_plan_manager.set_dataset(self.food_dataset, repository.find_rows)
+        if self.dataset_list is not None:
+            self.dataset_list.bind_repository(repository)
+        if self.meal_plan_frame is not None:
+            self.meal_plan_frame.bind_repository(repository)
+        if removed:
+            wx.MessageBox(f"The dataset was reloaded; {removed} meal plan entries whose food is no longer in it were removed.",
+                          "Dataset Reloaded", wx.OK | wx.ICON_INFORMATION)
+
+    def on_prewarmed(self, failed_modules):
+        StartupTiming.mark("prewarm done")
+        for module, error in failed_modules:
+            print(f"Could not prewarm {module}: {error}")
+        print(StartupTiming.report())
+
+    def on_dataset_error(self, error):
+        self.main_frame.SetTitle(self.main_frame_title)
+        self.pending_action = None
+        self.main_frame.SetCursor(wx.NullCursor)
+        wx.MessageBox(f"Error loading dataset: {error}", "Error", wx.OK | wx.ICON_ERROR)
+
+    def when_dataset_loaded(self, action):
+        """ Run action now if the dataset is loaded, or else as soon as it is. """
+        if self.meal_plan_manager is not None:
+            action()
+        else:
+            self.pending_action = action  # Only the last frame asked for is opened
+            self.main_frame.SetCursor(wx.Cursor(wx.CURSOR_WAIT))
+
     def on_search_compare(self, event):
         self.show_dataset_list()
 
     def show_dataset_list(self):
+        if self.meal_plan_manager is None and self.dataset_preview is None:
+            self.when_dataset_loaded(self.show_dataset_list)
+            return
         if self.dataset_list is None:
-            self.dataset_list = DatasetListLogic(self.main_frame, self.meal_plan_manager)
+            from DatasetListLogic import DatasetListLogic
+            preview = self.dataset_preview if self.meal_plan_manager is None else None
+            self.dataset_list = DatasetListLogic(self.main_frame, self.meal_plan_manager, preview)
+            StartupTiming.mark("dataset list created")
         self.dataset_list.Show()
         self.main_frame.Hide()
         if self.meal_plan_frame:
@@ -68,8 +367,13 @@ class MainApp(wx.App):
         self.show_meal_plan()
 
     def show_meal_plan(self):
+        if self.meal_plan_manager is None:
+            self.when_dataset_loaded(self.show_meal_plan)
+            return
         if self.meal_plan_frame is None:
+            from MealPlanFrameLogic import MealPlanFrameLogic
             self.meal_plan_frame = MealPlanFrameLogic(self.main_frame, self.meal_plan_manager)
+            StartupTiming.mark("meal plan frame created")
         self.meal_plan_frame.Show()
         self.main_frame.Hide()
         if self.dataset_list:
@@ -79,6 +383,38 @@ class MainApp(wx.App):
         self.main_frame.Close()
 
 
+def load_repository(task, on_preview):
+    """ Load the shared repository; on_preview(preview) gets the first chunk of a CSV that is streamed in. """
+    from FoodRepository import FoodRepository  # Imports pandas, so it is kept off the startup path
+    previewed = False
+
+    def on_chunk(rows_read, preview):
+        nonlocal previewed
+        if not previewed:
+            previewed = True
+            task.send(on_preview, preview)
+        task.report_progress(rows_read, 0, f"{rows_read:,} foods read")
+
+    return FoodRepository.get_instance(on_chunk=on_chunk)
+
+
+def refresh_repository(task, repository):
+    return repository.refresh()
+
+
+def prewarm(task, repository):
+    """ Import the secondary frames and build the meal generator's pool so that opening them later is quick. """
+    failed_modules = []
+    for module in PREWARM_MODULES:
+        task.check_cancelled()
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            failed_modules.append((module, e))
+    repository.get_candidate_pool()
+    return failed_modules
+
+
 if __name__ == '__main__':
     app = MainApp()
     app.MainLoop()
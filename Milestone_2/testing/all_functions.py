@@ -1,4 +1,5 @@
 import pandas as pd
+import numpy as np
 
 #  Load CSV File
 def load_food_dataset(file_path):
@@ -47,3 +48,217 @@ def clear_meal_plan():
 def clear_meal_plan_for_day(meal_plan, day):
     meal_plan[day] = {'Breakfast': [], 'Lunch': [], 'Dinner': [], 'Snack': []}
 
+
+#  Index-based meal plan, same as MealPlanManager in main.py
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+MEALS = ['Breakfast', 'Lunch', 'Dinner', 'Snack']
+# Food dict keys and the dataset columns they are read from
+FOOD_COLUMNS = {'calories': 'Caloric Value', 'protein': 'Protein', 'carbs': 'Carbohydrates', 'fat': 'Fat'}
+INITIAL_CAPACITY = 64
+
+
+class MealPlanManager:
+    """
+    Meal plan kept as dataset row ids and quantities in array-backed slots. add_food returns a
+    handle (the entry's slot) and removing or changing an entry by handle is O(1). Handles of
+    removed entries are reused, so they must not be kept after the entry is removed.
+    Totals of every nutrient column per meal, per day and for the week are updated on every
+    change, so reading them never walks the plan.
+    """
+
+    def __init__(self, food_dataset):
+        self._set_columns(food_dataset)
+
+        self.row_ids = np.zeros(0, dtype=np.int64)
+        self.quantities = np.zeros(0)
+        self.entry_days = np.zeros(0, dtype=np.int8)
+        self.entry_meals = np.zeros(0, dtype=np.int8)
+        self.in_use = np.zeros(0, dtype=bool)
+        self.free_slots = []
+        self.entry_count = 0
+        self._grow(INITIAL_CAPACITY)
+        # Handles per meal; dicts keep insertion order and delete in O(1)
+        self.meal_plan = {day: {meal: {} for meal in MEALS} for day in DAYS}
+
+        self.meal_totals = np.zeros((len(DAYS), len(MEALS), len(self.nutrient_columns)))
+        self.day_totals = np.zeros((len(DAYS), len(self.nutrient_columns)))
+        self.week_totals = np.zeros(len(self.nutrient_columns))
+
+    def _set_columns(self, food_dataset):
+        self.food_dataset = food_dataset
+        if hasattr(food_dataset, 'column_values'):
+            # A SqliteFoodStore or NutrientMatrix: every column after the name is a nutrient, read by row
+            positions = range(1, len(food_dataset.columns))
+            column_values = food_dataset.column_values
+        else:
+            # Every numeric column after the name; the arrays are views, the dataset is not copied
+            positions = [i for i in range(1, food_dataset.shape[1]) if np.issubdtype(food_dataset.dtypes.iloc[i], np.number)]
+            column_values = lambda i: food_dataset.iloc[:, i].to_numpy()
+        self.food_names = column_values(0)
+        self.nutrient_columns = [str(food_dataset.columns[i]) for i in positions]
+        self.nutrient_arrays = [column_values(i) for i in positions]
+        self.food_positions = {key: self.nutrient_columns.index(column) for key, column in FOOD_COLUMNS.items()}
+
+    def __len__(self):
+        return self.entry_count
+
+    def set_dataset(self, food_dataset, find_rows):
+        """
+        Switch to a reloaded dataset. find_rows(names) returns the row id of each food name in it,
+        or -1; entries move to their food's new row, and entries whose food is gone are removed.
+        Totals are recomputed, since the nutrient columns may have changed. Returns how many
+        entries were removed.
+        """
+        handles = np.flatnonzero(self.in_use)
+        names = [self.food_names[row_id] for row_id in self.row_ids[handles]]
+        self._set_columns(food_dataset)
+        new_rows = np.asarray(find_rows(names) if names else [], dtype=np.int64)
+        self.row_ids[handles] = new_rows
+        for handle in handles[new_rows < 0]:
+            del self.meal_plan[DAYS[self.entry_days[handle]]][MEALS[self.entry_meals[handle]]][handle]
+            self.in_use[handle] = False
+            self.free_slots.append(handle)
+            self.entry_count -= 1
+        self.meal_totals, self.day_totals, self.week_totals = self.compute_totals()
+        return int((new_rows < 0).sum())
+
+    def _grow(self, extra):
+        capacity = len(self.row_ids)
+        self.row_ids = np.concatenate([self.row_ids, np.zeros(extra, dtype=np.int64)])
+        self.quantities = np.concatenate([self.quantities, np.zeros(extra)])
+        self.entry_days = np.concatenate([self.entry_days, np.zeros(extra, dtype=np.int8)])
+        self.entry_meals = np.concatenate([self.entry_meals, np.zeros(extra, dtype=np.int8)])
+        self.in_use = np.concatenate([self.in_use, np.zeros(extra, dtype=bool)])
+        # Popped from the end, so the lowest free slot is used first
+        self.free_slots.extend(range(capacity + extra - 1, capacity - 1, -1))
+
+    @staticmethod
+    def _row_id(food):
+        """ Foods are passed as a dataset row id, a FoodRecord or a food dict carrying one. """
+        if isinstance(food, dict):
+            if 'row_id' not in food:
+                raise ValueError(f"Food {food.get('name')!r} does not reference a dataset row")
+            return int(food['row_id'])
+        return int(getattr(food, 'row_id', food))
+
+    def _check_handle(self, handle):
+        if not 0 <= handle < len(self.in_use) or not self.in_use[handle]:
+            raise KeyError(f"No meal plan entry with handle {handle}")
+
+    def get_nutrients(self, rows):
+        """ Return the (len(rows), nutrient columns) matrix of the given dataset rows. """
+        return np.column_stack([values[rows] for values in self.nutrient_arrays]).astype(np.float64)
+
+    def _update_totals(self, handle, sign):
+        """ Add (sign=1) or subtract (sign=-1) an entry's nutrients from its meal, day and week totals. """
+        day, meal = self.entry_days[handle], self.entry_meals[handle]
+        values = self.get_nutrients([self.row_ids[handle]])[0] * (sign * self.quantities[handle])
+        self.meal_totals[day, meal] += values
+        self.day_totals[day] += values
+        self.week_totals += values
+
+    def add_food(self, day, meal, food, quantity=1.0):
+        """ Add a food to a meal and return the new entry's handle. """
+        if not self.free_slots:
+            self._grow(len(self.row_ids))
+        handle = self.free_slots.pop()
+        self.row_ids[handle] = self._row_id(food)
+        self.quantities[handle] = quantity
+        self.entry_days[handle] = DAYS.index(day)
+        self.entry_meals[handle] = MEALS.index(meal)
+        self.in_use[handle] = True
+        self.meal_plan[day][meal][handle] = None
+        self.entry_count += 1
+        self._update_totals(handle, 1)
+        return handle
+
+    def change_food(self, handle, new_food, quantity=None):
+        """ Point an entry at a different food, keeping its place in the meal. """
+        self._check_handle(handle)
+        row_id = self._row_id(new_food)
+        self._update_totals(handle, -1)
+        self.row_ids[handle] = row_id
+        if quantity is not None:
+            self.quantities[handle] = quantity
+        self._update_totals(handle, 1)
+
+    def remove_food(self, handle):
+        self._check_handle(handle)
+        day, meal = self.entry_days[handle], self.entry_meals[handle]
+        self._update_totals(handle, -1)
+        del self.meal_plan[DAYS[day]][MEALS[meal]][handle]
+        self.in_use[handle] = False
+        self.free_slots.append(handle)
+        self.entry_count -= 1
+        # Emptied totals are reset, so rounding errors from subtracting cannot build up
+        if not self.meal_plan[DAYS[day]][MEALS[meal]]:
+            self.meal_totals[day, meal] = 0
+            if not any(self.meal_plan[DAYS[day]].values()):
+                self.day_totals[day] = 0
+            if self.entry_count == 0:
+                self.week_totals[:] = 0
+
+    def get_entry(self, handle, all_nutrients=False):
+        """
+        Return the entry as a food dict; nutrient values are scaled by its quantity. With
+        all_nutrients, 'nutrients' maps every nutrient column to its value as well.
+        """
+        self._check_handle(handle)
+        row_id = self.row_ids[handle]
+        quantity = self.quantities[handle]
+        entry = {'handle': handle, 'row_id': int(row_id), 'name': self.food_names[row_id], 'quantity': quantity,
+                 'day': DAYS[self.entry_days[handle]], 'meal': MEALS[self.entry_meals[handle]]}
+        for key, position in self.food_positions.items():
+            entry[key] = self.nutrient_arrays[position][row_id] * quantity
+        if all_nutrients:
+            values = self.get_nutrients([row_id])[0] * quantity
+            entry['nutrients'] = dict(zip(self.nutrient_columns, values.tolist()))
+        return entry
+
+    def get_meal_entries(self, day, meal):
+        return list(self.meal_plan[day][meal])
+
+    def get_meal_plan(self):
+        """ Return the plan as {day: {meal: [food dicts]}}. """
+        return {day: {meal: [self.get_entry(handle) for handle in handles] for meal, handles in meals.items()}
+                for day, meals in self.meal_plan.items()}
+
+    def get_totals(self, day=None, meal=None):
+        """ Return {nutrient column: total} for one meal, one day, or the whole week if day is None. """
+        if day is None:
+            totals = self.week_totals
+        elif meal is None:
+            totals = self.day_totals[DAYS.index(day)]
+        else:
+            totals = self.meal_totals[DAYS.index(day), MEALS.index(meal)]
+        return dict(zip(self.nutrient_columns, totals.tolist()))
+
+    def compute_totals(self):
+        """
+        Compute (meal_totals, day_totals, week_totals) from scratch: the quantities of the entries,
+        spread over one row per meal of the week, times the nutrient rows of their foods.
+        """
+        handles = np.flatnonzero(self.in_use)
+        weights = np.zeros((len(DAYS) * len(MEALS), len(handles)))
+        weights[self.entry_days[handles] * len(MEALS) + self.entry_meals[handles], np.arange(len(handles))] = \
+            self.quantities[handles]
+        meal_totals = (weights @ self.get_nutrients(self.row_ids[handles])).reshape(len(DAYS), len(MEALS), -1)
+        day_totals = meal_totals.sum(axis=1)
+        return meal_totals, day_totals, day_totals.sum(axis=0)
+
+    def clear_meal_plan(self):
+        self.in_use[:] = False
+        self.free_slots = list(range(len(self.row_ids) - 1, -1, -1))
+        self.entry_count = 0
+        for day in self.meal_plan:
+            for meal in self.meal_plan[day]:
+                self.meal_plan[day][meal] = {}
+        self.meal_totals[:] = 0
+        self.day_totals[:] = 0
+        self.week_totals[:] = 0
+
+    def clear_meal_plan_for_day(self, day):
+        """ Clear the meal plan for a specific day (used in random meal generation) """
+        for meal in MEALS:
+            for handle in list(self.meal_plan[day][meal]):
+                self.remove_food(handle)
@@ -0,0 +1,127 @@
+import threading
+import pytest
+import numpy as np
+from BackgroundTasks import TaskExecutor, QueryRunner
+from QueryCache import QueryCache
+
+
+class GuiQueue:
+    """ Stands in for wx.CallAfter: callbacks are queued and run when the test pumps the queue. """
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def call_after(self, function, *args):
+        with self.lock:
+            self.calls.append((function, args))
+
+    def pump(self):
+        with self.lock:
+            calls, self.calls = self.calls, []
+        for function, args in calls:
+            function(*args)
+
+
+@pytest.fixture
+def gui():
+    return GuiQueue()
+
+
+@pytest.fixture
+def executor(gui):
+    executor = TaskExecutor(call_after=gui.call_after)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def test_result_is_delivered_through_call_after(executor, gui):
+    results = []
+    task = executor.submit(lambda task, a, b: a + b, 2, 3, on_done=results.append)
+    task.future.result(timeout=5)
+    assert results == []  # Nothing runs on the worker thread
+    gui.pump()
+    assert results == [5]
+    assert task.done()
+
+
+def test_send_runs_on_gui_thread_until_cancelled(executor, gui):
+    received = []
+    task = executor.submit(lambda task: task.send(received.append, 'first rows'))
+    task.future.result(timeout=5)
+    assert received == []
+    gui.pump()
+    assert received == ['first rows']
+    task.send(received.append, 'more rows')
+    task.cancel()
+    gui.pump()
+    assert received == ['first rows']
+
+
+def test_progress_and_error(executor, gui):
+    progress, errors = [], []
+
+    def work(task):
+        for i in range(3):
+            task.report_progress(i + 1, 3, 'step')
+        raise ValueError('broken')
+
+    task = executor.submit(work, on_progress=lambda *args: progress.append(args), on_error=errors.append)
+    with pytest.raises(ValueError):
+        task.future.result(timeout=5)
+    gui.pump()
+    assert progress == [(1, 3, 'step'), (2, 3, 'step'), (3, 3, 'step')]
+    assert isinstance(errors[0], ValueError)
+
+
+def test_cancel_stops_task_and_callbacks(executor, gui):
+    started, release = threading.Event(), threading.Event()
+    steps, results = [], []
+
+    def work(task):
+        started.set()
+        release.wait(5)
+        for i in range(100):
+            task.report_progress(i, 100)
+            steps.append(i)
+        return 'finished'
+
+    task = executor.submit(work, on_done=results.append, on_progress=lambda *args: None)
+    started.wait(5)
+    task.cancel()
+    release.set()
+    assert task.future.result(timeout=5) is None
+    gui.pump()
+    assert steps == [] and results == []
+    assert task.cancelled
+
+
+def test_progress_queued_before_cancel_is_dropped(executor, gui):
+    progress = []
+    task = executor.submit(lambda task: task.report_progress(1, 2), on_progress=lambda *args: progress.append(args))
+    task.future.result(timeout=5)
+    task.cancel()
+    gui.pump()
+    assert progress == []
+
+
+def test_query_runner_caches_and_keeps_latest_result(executor, gui):
+    cache, results, errors = QueryCache(), [], []
+    runner = QueryRunner(errors.append, executor)
+    release = threading.Event()
+    runner.run(cache, 'slow', lambda: release.wait(5) and (np.array([1]),), results.append, background=True)
+    slow_task = runner.task
+    runner.run(cache, 'fast', lambda: (np.array([2]),), results.append, background=True)
+    assert slow_task.cancelled, "A newer query cancels the pending one."
+    release.set()
+    runner.task.future.result(timeout=5)
+    gui.pump()
+    assert [result[0].tolist() for result in results] == [[2]]
+    assert not runner.pending
+    runner.run(cache, 'fast', lambda: pytest.fail("The result is cached."), results.append, background=True)
+    assert results[-1][0].tolist() == [2] and not runner.pending
+    runner.run(cache, 'broken', lambda: 1 / 0, results.append, background=True)
+    with pytest.raises(ZeroDivisionError):
+        runner.task.future.result(timeout=5)
+    gui.pump()
+    assert isinstance(errors[0], ZeroDivisionError) and not runner.pending
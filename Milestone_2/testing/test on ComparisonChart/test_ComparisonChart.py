@@ -0,0 +1,41 @@
+import pytest
+from matplotlib.figure import Figure
+from ComparisonChart import ComparisonChart
+
+
+@pytest.fixture
+def chart():
+    return ComparisonChart(Figure())
+
+
+def test_update_sets_bar_heights(chart):
+    chart.update(['Chicken', 'Apple'], [[200, 30, 0, 5], [95, 0.5, 25, 0.3]])
+    assert len(chart.bars) == 4
+    assert [bar.get_height() for bar in chart.bars[0]] == [200, 95]
+    assert [bar.get_height() for bar in chart.bars[2]] == [0, 25]
+    assert [label.get_text() for label in chart.axes.get_xticklabels()] == ['Chicken', 'Apple']
+    assert chart.axes.get_ylim() == pytest.approx((0, 220))
+
+
+def test_same_food_count_reuses_bars(chart):
+    chart.update(['Chicken', 'Apple'], [[200, 30, 0, 5], [95, 0.5, 25, 0.3]])
+    bars = chart.bars
+    patches = list(chart.bars[0])
+    chart.update(['Rice', 'Egg'], [[130, 2.7, 28, 0.3], [78, 6, 0.6, 5]])
+    assert chart.bars is bars
+    assert list(chart.bars[0]) == patches
+    assert [bar.get_height() for bar in chart.bars[0]] == [130, 78]
+
+
+def test_different_food_count_replaces_bars(chart):
+    chart.update(['Chicken', 'Apple'], [[200, 30, 0, 5], [95, 0.5, 25, 0.3]])
+    chart.update(['Rice'], [[130, 2.7, 28, 0.3]])
+    assert [len(container) for container in chart.bars] == [1, 1, 1, 1]
+    assert len(chart.axes.patches) == 4  # Old bars were removed from the axes
+
+
+def test_empty_update(chart):
+    chart.update(['Chicken'], [[200, 30, 0, 5]])
+    chart.update([], [])
+    assert len(chart.axes.patches) == 0
+    assert chart.axes.get_ylim() == (0, 1)
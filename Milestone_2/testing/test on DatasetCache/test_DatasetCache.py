@@ -0,0 +1,94 @@
+import os
+import pytest
+import numpy as np
+import pandas as pd
+from DatasetCache import get_cache_path, load_dataset, read_cache
+from DatasetIngest import DatasetIngest
+
+
+@pytest.fixture
+def dataset_file(tmp_path):
+    file_path = tmp_path / "foods.csv"
+    pd.DataFrame({
+        'food': ['apple', 'banana', 'apple'],
+        'Caloric Value': [52, 89, 52],
+        'Protein': [0.3, 1.1, 0.3],
+    }).to_csv(file_path, index=False)
+    return str(file_path)
+
+
+def test_first_load_writes_cache(dataset_file):
+    food_data, from_cache = load_dataset(dataset_file)
+    assert not from_cache
+    assert os.path.exists(get_cache_path(dataset_file))
+    assert food_data['Protein'].dtype == np.float32
+
+
+def test_second_load_uses_cache(dataset_file):
+    parsed, _ = load_dataset(dataset_file)
+    cached, from_cache = load_dataset(dataset_file)
+    assert from_cache
+    pd.testing.assert_frame_equal(parsed, cached)
+
+
+def test_touched_file_with_same_content_uses_cache(dataset_file):
+    load_dataset(dataset_file)
+    stat = os.stat(dataset_file)
+    os.utime(dataset_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    _, from_cache = load_dataset(dataset_file)
+    assert from_cache, "Only the mtime changed, so the cache should still be used."
+    _, metadata, _ = read_cache(get_cache_path(dataset_file))
+    assert metadata['source_mtime'] == os.stat(dataset_file).st_mtime_ns
+
+
+def test_changed_file_rebuilds_cache(dataset_file):
+    load_dataset(dataset_file)
+    with open(dataset_file, 'a') as f:
+        f.write("cherry,50,1.0\n")
+    food_data, from_cache = load_dataset(dataset_file)
+    assert not from_cache
+    assert food_data['food'].tolist()[-1] == 'cherry'
+
+
+def test_corrupt_cache_is_ignored(dataset_file):
+    with open(get_cache_path(dataset_file), 'wb') as f:
+        f.write(b'not a cache')
+    food_data, from_cache = load_dataset(dataset_file)
+    assert not from_cache
+    assert len(food_data) == 3
+
+
+def test_missing_names_stay_missing_in_cache(tmp_path):
+    file_path = str(tmp_path / "unnamed.csv")
+    pd.DataFrame({'food': ['apple', None, 'apple'], 'Protein': [0.3, 1.0, 0.3]}).to_csv(file_path, index=False)
+    parsed, _ = load_dataset(file_path)
+    cached, from_cache = load_dataset(file_path)
+    assert from_cache
+    assert pd.isna(parsed['food'][1]) and pd.isna(cached['food'][1])
+    pd.testing.assert_frame_equal(parsed, cached)
+
+
+def test_truncated_cache_is_rebuilt(dataset_file):
+    load_dataset(dataset_file)
+    cache_path = get_cache_path(dataset_file)
+    with open(cache_path, 'rb') as f:
+        content = f.read()
+    with open(cache_path, 'wb') as f:
+        f.write(content[:len(content) // 2])
+    food_data, from_cache = load_dataset(dataset_file)
+    assert not from_cache
+    assert len(food_data) == 3
+    assert load_dataset(dataset_file)[1]
+
+
+def test_cache_hit_reuses_saved_search_index(dataset_file):
+    ingest = DatasetIngest(dataset_file)
+    load_dataset(dataset_file, ingest=ingest)
+    cached_ingest = DatasetIngest(dataset_file)
+    _, from_cache = load_dataset(dataset_file, ingest=cached_ingest)
+    assert from_cache
+    built, saved = ingest.search_index, cached_ingest.search_index
+    assert saved is not None
+    for query in ['a', 'app', 'banana', 'bananna']:
+        assert saved.ranked_search(query)[0].tolist() == built.ranked_search(query)[0].tolist()
+    assert saved.prefix_search('ap').tolist() == [0, 2]
@@ -0,0 +1,84 @@
+import os
+import pytest
+import numpy as np
+import pandas as pd
+from DatasetFederation import FederatedDataset, dedup_key
+from FoodRepository import FoodRepository
+from FoodSearchIndex import FoodSearchIndex
+
+
+def write_csv(path, foods):
+    pd.DataFrame({
+        'food': [food[0] for food in foods],
+        'Caloric Value': [food[1] for food in foods],
+        'Protein': [food[2] for food in foods],
+        'Carbohydrates': [20.0] * len(foods),
+        'Fat': [5.0] * len(foods),
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def touch(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+@pytest.fixture
+def sources(tmp_path):
+    north = write_csv(tmp_path / "north.csv", [('Apple', 52, 0.3), ('Grilled Chicken', 239, 27.3), ('Rye Bread', 259, 8.5)])
+    south = write_csv(tmp_path / "south.csv", [('apple', 50, 0.2), ('Baked  Plantain', 140, 1.2), ('Rice', 130, 2.7)])
+    yield north, south
+    FoodRepository.clear_instances()
+
+
+def test_dedup_key():
+    assert dedup_key(' Apple  Pie ') == dedup_key('apple pie')
+    assert dedup_key(None) == ''
+
+
+def test_merge_keeps_first_source_for_duplicates(sources):
+    federation = FederatedDataset(sources, use_cache=False)
+    food_data = federation.food_data
+    assert food_data['food'].tolist() == ['Apple', 'Grilled Chicken', 'Rye Bread', 'Baked  Plantain', 'Rice']
+    assert food_data['Caloric Value'].tolist()[0] == 52
+    assert food_data['Protein'].dtype == np.float32
+    assert federation.get_source(3) == (sources[1], 1)
+
+
+def test_merged_search_index_matches_a_fresh_one(sources):
+    federation = FederatedDataset(sources, use_cache=False)
+    index = FoodSearchIndex(federation.food_data['food'])
+    for query in ['apple', 'ric', 'bread', 'plantain']:
+        assert federation.search_index.search(query).tolist() == index.search(query).tolist()
+    np.testing.assert_array_equal(federation.search_index.gram_rows, index.gram_rows)
+
+
+def test_refresh_only_rereads_changed_sources(sources):
+    federation = FederatedDataset(sources, use_cache=False)
+    north = federation.sources[sources[0]]
+    assert federation.refresh() == []
+    write_csv(sources[1], [('Rice', 130, 2.7), ('Lentil Soup', 90, 6.0)])
+    touch(sources[1])
+    assert federation.refresh() == [sources[1]]
+    assert federation.sources[sources[0]] is north
+    assert federation.food_data['food'].tolist()[-2:] == ['Rice', 'Lentil Soup']
+    assert federation.search_index.search('lentil').tolist() == [4]
+
+
+def test_remove_source(sources):
+    federation = FederatedDataset(sources, use_cache=False)
+    federation.remove_source(sources[0])
+    assert federation.food_data['food'].tolist() == ['apple', 'Baked  Plantain', 'Rice']
+
+
+def test_repository_over_several_sources(sources):
+    repository = FoodRepository.get_instance(list(sources), use_cache=False)
+    assert len(repository.food_data) == 5
+    assert repository.search_index.search('plantain').tolist() == [3]
+    assert repository.get_candidate_pool().rows.tolist() == [1, 3]  # Grilled and baked foods of both sources
+    assert not repository.refresh()
+    write_csv(sources[0], [('Oat Porridge', 71, 2.5)])
+    touch(sources[0])
+    assert repository.refresh()
+    assert repository.version == 2
+    assert repository.food_data['food'].tolist()[0] == 'Oat Porridge'
@@ -0,0 +1,68 @@
+import pytest
+import numpy as np
+import pandas as pd
+from DatasetIngest import DatasetIngest, ColumnStats
+from FoodSchema import read_food_csv
+from FoodSearchIndex import FoodSearchIndex
+
+
+@pytest.fixture
+def dataset_file(tmp_path):
+    file_path = tmp_path / "foods.csv"
+    pd.DataFrame({
+        'food': ['apple', 'banana', 'grilled chicken', 'apple pie', 'baked apple', None, 'rice'],
+        'Caloric Value': [52, 89, 239, 237, 95, 10, 130],
+        'Notes': ['a', 'b', 'c', 'd', 'e', 'f', 'g'],
+        'Protein': [0.3, 1.1, 27.3, 2.4, 0.4, np.nan, 2.7],
+    }).to_csv(file_path, index=False)
+    return str(file_path)
+
+
+def test_chunked_read_matches_one_read(dataset_file):
+    ingest = DatasetIngest(dataset_file, chunk_size=3)
+    food_data = ingest.run()
+    expected = read_food_csv(dataset_file)
+    assert food_data.columns.tolist() == ['food', 'Caloric Value', 'Protein']
+    assert food_data['Protein'].dtype == np.float32
+    np.testing.assert_array_equal(food_data['Caloric Value'].to_numpy(), expected['Caloric Value'].to_numpy())
+    np.testing.assert_array_equal(food_data['Protein'].to_numpy(), expected['Protein'].to_numpy())
+    assert food_data['food'].tolist()[:5] == expected['food'].tolist()[:5]
+
+
+def test_search_index_is_built_while_reading(dataset_file):
+    ingest = DatasetIngest(dataset_file, chunk_size=2)
+    food_data = ingest.run()
+    index = FoodSearchIndex(food_data['food'])
+    for query in ['apple', 'ch', 'rice', 'zzz']:
+        assert ingest.search_index.search(query).tolist() == index.search(query).tolist()
+    np.testing.assert_array_equal(ingest.search_index.gram_rows, index.gram_rows)
+
+
+def test_on_chunk_reports_progress_and_first_page(dataset_file):
+    calls = []
+    ingest = DatasetIngest(dataset_file, chunk_size=3, on_chunk=lambda rows, preview: calls.append((rows, len(preview))))
+    ingest.run()
+    assert calls == [(3, 3), (6, 3), (7, 3)]
+    assert ingest.preview['food'].tolist() == ['apple', 'banana', 'grilled chicken']
+
+
+def test_column_stats_skip_missing_values(dataset_file):
+    ingest = DatasetIngest(dataset_file, chunk_size=2)
+    food_data = ingest.run()
+    protein = ingest.stats.get('Protein')
+    assert protein['count'] == 6
+    assert protein['minimum'] == pytest.approx(0.3)
+    assert protein['maximum'] == pytest.approx(27.3)
+    assert protein['mean'] == pytest.approx(34.2 / 6, rel=1e-5)
+    # Computing them afterwards from the loaded dataset gives the same numbers
+    np.testing.assert_allclose(ColumnStats.of(food_data, chunk_size=4).mean(), ingest.stats.mean())
+
+
+def test_empty_file(tmp_path):
+    file_path = tmp_path / "empty.csv"
+    file_path.write_text("food,Caloric Value\n")
+    ingest = DatasetIngest(str(file_path))
+    food_data = ingest.run()
+    assert len(food_data) == 0
+    assert len(ingest.search_index) == 0
+    assert ingest.stats.get('Caloric Value')['count'] == 0
@@ -1,9 +1,9 @@
 import pytest
 import wx
 import pandas as pd
-import matplotlib.pyplot as plt
 
 from DatasetListLogic import DatasetListLogic
+from FoodRecord import FoodRecord
 
 
 @pytest.fixture(scope='module')
@@ -55,9 +55,9 @@ def test_on_search(setup_app, mocker):
 def test_on_apply_filters(setup_app):
     app = setup_app
     app.food_data = pd.DataFrame({
-        'Name': ['Chicken', 'Tofu', 'Pasta'],
+        'food': ['Chicken', 'Tofu', 'Pasta'],
         'Protein': [30, 8, 5],
-        'Carbohydrate': [0, 2, 25],
+        'Carbohydrates': [0, 2, 25],
         'Fat': [5, 3, 1]
     })
 
@@ -67,15 +67,19 @@ def test_on_apply_filters(setup_app):
     assert app.food_list.GetCellValue(0, 0) == 'Chicken'
 
 
+def food_dataset():
+    return pd.DataFrame({
+        'food': ['Chicken'],
+        'Caloric Value': [200.0],
+        'Fat': [5.0],
+        'Carbohydrates': [0.0],
+        'Protein': [30.5]
+    })
+
+
 def test_on_add_to_comparison(setup_app):
     app = setup_app
-    app.food_data = pd.DataFrame({
-        'Name': ['Chicken'],
-        'Calories': [200],
-        'Protein': [30],
-        'Carbs': [0],
-        'Fat': [5]
-    })
+    app.food_data = food_dataset()
     app.display_results(app.food_data)
 
     app.food_list.SetGridCursor(0, 0)
@@ -83,18 +87,51 @@ def test_on_add_to_comparison(setup_app):
     wx.Yield()
 
     assert app.comparison_list.GetCellValue(0, 0) == 'Chicken'
-
-
-def test_get_non_empty_rows(setup_app):
+    assert app.comparison_list.GetCellValue(0, 2) == '30.5'
+    assert app.comparison_foods[-1].protein == 30.5
+
+
+def test_preview_then_bind_repository(setup_app, mocker):
+    preview_list = DatasetListLogic(setup_app.GetParent(), None, preview=food_dataset())
+    assert preview_list.food_list.GetCellValue(0, 0) == 'Chicken'
+    assert not preview_list.search_button.IsEnabled()
+    assert not preview_list.add_to_meal_plan.IsEnabled()
+
+    repository = mocker.Mock()
+    repository.get_view.return_value = pd.concat([food_dataset(), food_dataset()], ignore_index=True)
+    repository.version = 2
+    meal_plan_manager = mocker.Mock()
+    preview_list.bind_repository(repository, meal_plan_manager)
+
+    assert preview_list.search_button.IsEnabled()
+    assert preview_list.food_list.GetNumberRows() == 2
+    assert preview_list.meal_plan_manager is meal_plan_manager
+    assert preview_list.dataset_version == 2
+    preview_list.Destroy()
+
+
+def test_store_filter_reads_pages_on_scroll(setup_app, tmp_path, monkeypatch):
+    import DatasetListLogic as dataset_list_logic
+    from NutrientFilter import NutrientRange
+    from QueryCache import QueryCache
+    from SqliteFoodStore import open_food_store
+    file_path = tmp_path / "foods.csv"
+    pd.DataFrame({'food': [f'food {i}' for i in range(5)], 'Protein': [30.0] * 5}).to_csv(file_path, index=False)
+    store, _ = open_food_store(str(file_path))
+    monkeypatch.setattr(dataset_list_logic, 'FILTER_PAGE_SIZE', 2)
     app = setup_app
-    app.comparison_list.AppendRows(3)
-    app.comparison_list.SetCellValue(0, 0, 'Chicken')
-    app.comparison_list.SetCellValue(1, 0, '')
-    app.comparison_list.SetCellValue(2, 0, 'Apple')
+    app.food_data = app.nutrient_filter = app.nutrient_filter_source = store
+    app.query_cache = QueryCache()
 
-    non_empty_rows = app.get_non_empty_rows()
-
-    assert non_empty_rows == [0, 2]
+    app.apply_nutrient_filters([NutrientRange('Protein', minimum=20)])
+    assert app.food_list.GetNumberRows() == 2
+    # Every row read is visible, so each call reads the next page
+    app.load_more_filter_rows()
+    app.load_more_filter_rows()
+    assert app.food_list.GetNumberRows() == 5
+    assert app.food_list.GetCellValue(4, 0) == 'food 4'
+    assert app.paged_ranges is None
+    store.close()
 
 
 def test_on_clear_comparison(setup_app):
@@ -112,42 +149,31 @@ def test_on_clear_comparison(setup_app):
 
 def test_on_generate_chart(setup_app, mocker):
     app = setup_app
-    app.comparison_list.AppendRows(2)
-    app.comparison_list.SetCellValue(0, 0, 'Chicken')
-    app.comparison_list.SetCellValue(0, 1, '200')
-    app.comparison_list.SetCellValue(0, 2, '30')
-    app.comparison_list.SetCellValue(0, 3, '0')
-    app.comparison_list.SetCellValue(0, 4, '5')
-
-    mocker.patch('matplotlib.pyplot.show')
+    app.comparison_foods = [FoodRecord(0, 'Chicken', 200.0, 30.0, 0.0, 5.0)]
 
     app.on_generate_chart(None)
+    chart = app.comparison_chart
+    figure = chart.figure
+    assert chart.bars[0][0].get_height() == 200
 
-    plt.show.assert_called_once()
+    app.comparison_foods[0].calories = 250.0
+    app.on_generate_chart(None)
+    assert app.comparison_chart is chart and chart.figure is figure  # Reused, not recreated
+    assert chart.bars[0][0].get_height() == 250
 
 
 def test_get_food_from_grid(setup_app):
     app = setup_app
-    app.food_data = pd.DataFrame({
-        'Name': ['Chicken'],
-        'Calories': [200],
-        'Protein': [30],
-        'Carbs': [0],
-        'Fat': [5]
-    })
+    app.food_data = food_dataset()
     app.display_results(app.food_data)
 
-    app.food_list.SetCellValue(0, 0, 'Chicken')
-    app.food_list.SetCellValue(0, 1, '200')
-    app.food_list.SetCellValue(0, 8, '30')
-    app.food_list.SetCellValue(0, 6, '0')
-    app.food_list.SetCellValue(0, 2, '5')
-
     food = app.get_food_from_grid(0)
 
+    assert isinstance(food, FoodRecord)
+    assert food.row_id == 0
     assert food['name'] == 'Chicken'
     assert food['calories'] == 200
-    assert food['protein'] == 30
+    assert food['protein'] == 30.5
     assert food['carbs'] == 0
     assert food['fat'] == 5
 
@@ -0,0 +1,41 @@
+import pytest
+import numpy as np
+import pandas as pd
+from FoodRecord import FoodRecord, FoodRecordReader
+
+
+@pytest.fixture
+def food_data():
+    return pd.DataFrame({
+        'food': ['chicken grilled', 'apple'],
+        'Caloric Value': np.array([200, 52], dtype=np.float32),
+        'Fat': np.array([5, 0.2], dtype=np.float32),
+        'Carbohydrates': np.array([0, 14], dtype=np.float32),
+        'Protein': np.array([30, 0.3], dtype=np.float32),
+    })
+
+
+def test_reader_reads_typed_values(food_data):
+    record = FoodRecordReader(food_data).read(np.int64(1))
+    assert record.row_id == 1 and type(record.row_id) is int
+    assert record.name == 'apple'
+    assert type(record.protein) is float
+    # The stored float32 value itself, not a value parsed back from its display text
+    assert record.protein == float(np.float32(0.3))
+    assert (record.calories, record.carbs, record.fat) == (52.0, 14.0, float(np.float32(0.2)))
+
+
+def test_record_reads_like_a_food_dict():
+    record = FoodRecord(3, 'rice', 130.0, 2.7, 28.0, 0.3)
+    assert record['name'] == 'rice'
+    assert record['row_id'] == 3
+    assert record.get('fiber') is None
+    with pytest.raises(KeyError):
+        record['fiber']
+
+
+def test_record_has_no_instance_dict():
+    record = FoodRecord(0, 'rice', 130.0, 2.7, 28.0, 0.3)
+    assert not hasattr(record, '__dict__')
+    with pytest.raises(AttributeError):
+        record.fiber = 1.0
@@ -0,0 +1,150 @@
+import os
+import pytest
+import pandas as pd
+from FoodRepository import FoodRepository
+from FoodRecord import FoodRecordReader
+
+
+@pytest.fixture
+def dataset_file(tmp_path):
+    file_path = tmp_path / "foods.csv"
+    pd.DataFrame({
+        'food': ['Apple', 'Banana', 'Chicken'],
+        'Caloric Value': [52, 89, 239],
+        'Protein': [0.3, 1.1, 27.3],
+    }).to_csv(file_path, index=False)
+    yield str(file_path)
+    FoodRepository.clear_instances()
+
+
+def test_get_instance_loads_once(dataset_file):
+    first = FoodRepository.get_instance(dataset_file)
+    second = FoodRepository.get_instance(dataset_file)
+    assert first is second, "The same repository should be shared for the same file."
+    assert first.version == 1, "The dataset should only be parsed once."
+
+
+def test_get_view_shares_data(dataset_file):
+    repository = FoodRepository.get_instance(dataset_file)
+    view = repository.get_view()
+    assert view is not repository.food_data
+    assert view['food'].tolist() == ['Apple', 'Banana', 'Chicken']
+
+
+def test_get_stats(dataset_file):
+    stats = FoodRepository.get_instance(dataset_file).get_stats()
+    assert stats['rows'] == 3
+    assert stats['columns'] == 3
+    assert stats['memory_usage'] > 0
+    assert stats['load_time'] >= 0
+
+
+def test_candidate_pool_is_built_once_per_version(tmp_path):
+    file_path = tmp_path / "meals.csv"
+    pd.DataFrame({
+        'food': ['Apple', 'Baked Potato', 'Grilled Chicken'],
+        'Caloric Value': [52, 161, 239],
+        'Protein': [0.3, 4.3, 27.3],
+        'Carbohydrates': [14.0, 37.0, 0.0],
+        'Fat': [0.2, 0.2, 14.0],
+    }).to_csv(file_path, index=False)
+    repository = FoodRepository(str(file_path), use_cache=False)
+    pool = repository.get_candidate_pool()
+    assert pool.rows.tolist() == [1, 2]
+    assert repository.get_candidate_pool(['chick']).rows.tolist() == [2]
+    assert repository.get_candidate_pool() is pool
+    repository.load()
+    assert repository.get_candidate_pool() is not pool
+
+def test_missing_file_is_not_cached(tmp_path):
+    missing_file = str(tmp_path / "missing.csv")
+    with pytest.raises(FileNotFoundError):
+        FoodRepository.get_instance(missing_file)
+    assert not FoodRepository._instances
+
+
+def test_mmap_backend(dataset_file):
+    repository = FoodRepository(dataset_file, backend='mmap')
+    assert repository.nutrient_matrix is not None
+    assert repository.mapped_bytes > 0
+    view = repository.get_view()
+    assert view is repository.nutrient_matrix
+    assert view.column_values(0).tolist() == ['Apple', 'Banana', 'Chicken']
+    assert repository.search_index.search('an').tolist() == [1]
+    assert repository.get_column_stats().get('Protein')['maximum'] == pytest.approx(27.3)
+
+
+def test_unknown_backend(dataset_file):
+    with pytest.raises(ValueError):
+        FoodRepository(dataset_file, backend='parquet')
+
+
+def test_streamed_load_keeps_index_and_stats(dataset_file):
+    progress = []
+    repository = FoodRepository(dataset_file, use_cache=False, on_chunk=lambda rows, preview: progress.append(rows))
+    assert progress == [3]
+    assert repository.search_index.search('an').tolist() == [1]
+    assert repository.get_column_stats() is repository.column_stats
+    assert repository.get_column_stats().get('Protein')['maximum'] == pytest.approx(27.3)
+
+
+def test_sqlite_backend(dataset_file):
+    repository = FoodRepository(dataset_file, backend='sqlite')
+    assert repository.get_view() is repository.store
+    assert repository.search_index is repository.store
+    assert repository.search_index.ranked_search('an')[0].tolist() == [1]
+    assert repository.get_column_stats().get('Caloric Value')['maximum'] == 239
+    assert repository.get_stats()['rows'] == 3
+    assert not repository.loaded_from_cache
+    assert FoodRepository(dataset_file, backend='sqlite').loaded_from_cache
+
+
+def test_find_rows(dataset_file):
+    for backend in ['pandas', 'sqlite']:
+        repository = FoodRepository(dataset_file, backend=backend)
+        assert repository.find_rows(['Chicken', 'Pear', 'Apple']).tolist() == [2, -1, 0]
+
+
+def test_refresh_does_not_report_progress(dataset_file):
+    progress = []
+    repository = FoodRepository(dataset_file, use_cache=False, on_chunk=lambda rows, preview: progress.append(rows))
+    with open(dataset_file, 'a') as f:
+        f.write("Pear,57,0.4\n")
+    os.utime(dataset_file, ns=(0, 10 ** 18))
+    assert repository.refresh()
+    assert progress == [3], "Only the first load reports its progress."
+
+
+def test_refresh_reloads_changed_file(dataset_file):
+    repository = FoodRepository(dataset_file, use_cache=False)
+    assert not repository.refresh()
+    pd.DataFrame({
+        'food': ['Pear', 'Apple'],
+        'Caloric Value': [57, 52],
+        'Protein': [0.4, 0.3],
+    }).to_csv(dataset_file, index=False)
+    os.utime(dataset_file, ns=(0, 10 ** 18))  # A new mtime even where the clock is coarse
+    assert repository.refresh()
+    assert repository.version == 2
+    assert repository.get_view()['food'].tolist() == ['Pear', 'Apple']
+    assert repository.find_rows(['Apple']).tolist() == [1]
+
+
+def test_current_record_follows_reload(tmp_path):
+    file_path = str(tmp_path / "foods.csv")
+
+    def write_foods(names):
+        pd.DataFrame({'food': names, 'Caloric Value': 52, 'Protein': 0.3, 'Carbohydrates': 14, 'Fat': 0.2}
+                     ).to_csv(file_path, index=False)
+
+    write_foods(['Apple', 'Banana'])
+    repository = FoodRepository(file_path, use_cache=False)
+    reader = FoodRecordReader(repository.get_view(), repository.schema)
+    apple, banana = reader.read(0), reader.read(1)
+    assert repository.current_record(apple, repository.version) is apple
+    write_foods(['Pear', 'Apple'])
+    os.utime(file_path, ns=(0, 10 ** 18))
+    assert repository.refresh()
+    current = repository.current_record(apple, 1)
+    assert (current.name, current.row_id) == ('Apple', 1), "Row 0 now holds another food."
+    assert repository.current_record(banana, 1) is None
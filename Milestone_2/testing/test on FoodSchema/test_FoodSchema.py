@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+import pytest
+import numpy as np
+import pandas as pd
+from FoodSchema import FoodSchema, SchemaError, read_food_csv, validate_header
+
+
+@pytest.fixture
+def dataset_file(tmp_path):
+    file_path = tmp_path / "foods.csv"
+    pd.DataFrame({
+        'food': ['apple', 'chicken'],
+        'Caloric Value': [52, 239],
+        'Notes': ['fresh', 'roasted'],
+        'Fat': [0.2, 13.6],
+        'Protein': [0.3, 27.3],
+    }).to_csv(file_path, index=False)
+    return str(file_path)
+
+
+def test_validate_header_keeps_known_columns_in_file_order():
+    assert validate_header(['food', 'Protein', 'Notes', 'Caloric Value']) == ['food', 'Protein', 'Caloric Value']
+
+
+@pytest.mark.parametrize('columns', [[], ['Protein', 'food'], ['food', 'Fat', 'Fat']])
+def test_validate_header_rejects_bad_headers(columns):
+    with pytest.raises(SchemaError):
+        validate_header(columns)
+
+
+def test_read_food_csv_reads_schema_columns_with_their_dtypes(dataset_file):
+    food_data = read_food_csv(dataset_file)
+    assert food_data.columns.tolist() == ['food', 'Caloric Value', 'Fat', 'Protein']
+    assert food_data['Protein'].dtype == np.float32
+    assert food_data['food'].tolist() == ['apple', 'chicken']
+
+
+def test_schema_resolves_column_handles(dataset_file):
+    food_data = read_food_csv(dataset_file)
+    schema = FoodSchema.of(food_data)
+    assert schema.name.position == 0
+    assert schema.protein.position == 3
+    assert schema.protein.dtype == np.float32
+    assert schema.calories.values(food_data).tolist() == [52, 239]
+    assert [handle.name for handle in schema.nutrients] == ['Caloric Value', 'Fat', 'Protein']
+    assert 'Carbohydrates' not in schema
+    with pytest.raises(SchemaError):
+        schema.carbs
+
+
+def test_import_does_not_load_pandas():
+    # main.py imports the column names at startup, before pandas is needed
+    code = "import sys, FoodSchema; print('pandas' in sys.modules)"
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(sys.modules['FoodSchema'].__file__))
+    assert result.stdout.strip() == 'False'
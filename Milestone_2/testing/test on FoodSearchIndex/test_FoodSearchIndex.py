@@ -0,0 +1,95 @@
+import pytest
+import pandas as pd
+from FoodSearchIndex import FoodSearchIndex, IncrementalSearch
+
+
+@pytest.fixture(scope='module')
+def food_names():
+    return pd.Series(['Cream Cheese', 'cheddar cheese', 'broccoli raw', 'Broccoli Cooked', 'apple', None])
+
+
+@pytest.fixture(scope='module')
+def index(food_names):
+    return FoodSearchIndex(food_names)
+
+
+@pytest.mark.parametrize('query', ['', 'c', 'ch', 'che', 'cheese', 'BROCCOLI', 'ccoli c', 'xyz', 'eese'])
+def test_search_matches_substring_scan(index, food_names, query):
+    expected = food_names.fillna('').str.lower().str.contains(query.lower(), regex=False, na=False)
+    assert index.search(query).tolist() == expected[expected].index.tolist()
+
+
+@pytest.mark.parametrize('query, rows', [('a', [0, 1]), ('b', [1]), ('ab', [1]), ('z', [2]), ('yz', [2]), ('zx', [])])
+def test_short_queries_match_name_endings(query, rows):
+    # Characters in a name's last two places, or in names shorter than a trigram, start no trigram
+    index = FoodSearchIndex(['A', 'ab', 'xyz', ''])
+    assert index.search(query).tolist() == rows
+    reopened = FoodSearchIndex(index.names, arrays=index.to_arrays())
+    assert reopened.search(query).tolist() == rows
+
+
+def test_search_treats_query_literally(index):
+    assert index.search('(').tolist() == []
+
+
+def test_prefix_search(index):
+    assert index.prefix_search('broc').tolist() == [2, 3]
+    assert index.prefix_search('cheese').tolist() == []
+    assert index.prefix_search('').tolist() == [0, 1, 2, 3, 4, 5]
+
+
+def test_empty_index():
+    index = FoodSearchIndex([])
+    assert len(index) == 0
+    assert index.search('apple').tolist() == []
+
+
+def test_search_within_rows(index):
+    assert index.search('cheese', within=index.search('ch')).tolist() == [0, 1]
+    assert index.search('broccoli', within=index.search('raw')).tolist() == [2]
+
+
+def test_incremental_search_narrows_previous_results(index, mocker):
+    search = IncrementalSearch(index)
+    assert search.search('b').tolist() == [2, 3]
+    spy = mocker.spy(index, 'search')
+    assert search.search('bro').tolist() == [2, 3]
+    assert search.search('broccoli c').tolist() == [3]
+    assert spy.call_args_list[0].args[1].tolist() == [2, 3], "The extended query should only narrow the last results."
+
+
+def test_incremental_search_restarts_on_new_query(index):
+    search = IncrementalSearch(index)
+    search.search('broccoli')
+    assert search.search('apple').tolist() == [4]
+    assert search.search('').tolist() == [0, 1, 2, 3, 4, 5]
+
+
+def test_ranked_search_orders_exact_matches(index):
+    rows, scores = index.ranked_search('cheese', limit=10)
+    assert rows.tolist()[:2] == [0, 1], "Shorter names covered more by the query should rank first."
+    assert all(score > 1 for score in scores[:2])
+    assert list(scores) == sorted(scores, reverse=True)
+
+
+def test_ranked_search_tolerates_typos(index):
+    rows, scores = index.ranked_search('brocoli', limit=10)
+    assert set(rows.tolist()[:2]) == {2, 3}
+    assert all(0 < score < 1 for score in scores)
+
+
+def test_incremental_ranked_search_passes_min_score(index):
+    search = IncrementalSearch(index)
+    assert search.ranked_search('brocoli', limit=10)[0].tolist() == index.ranked_search('brocoli', limit=10)[0].tolist()
+    rows, _ = search.ranked_search('brocoli', limit=10, min_score=0.99)
+    assert len(rows) == 0
+
+
+def test_ranked_search_limit(index):
+    rows, scores = index.ranked_search('e', limit=2)
+    assert len(rows) == 2 and len(scores) == 2
+
+
+def test_ranked_search_no_match(index):
+    rows, scores = index.ranked_search('zzzz')
+    assert len(rows) == 0
@@ -0,0 +1,61 @@
+import pytest
+import numpy as np
+import pandas as pd
+from MealPlanOptimizer import MealPlanOptimizer, build_candidate_pool
+from MealPlanBatch import generate_plans
+
+DAYS = ['Monday', 'Tuesday']
+MEALS = ['Lunch', 'Dinner']
+
+
+@pytest.fixture
+def pool():
+    rng = np.random.default_rng(0)
+    count = 300
+    return build_candidate_pool(pd.DataFrame({
+        'food': [f"baked food {i}" for i in range(count)],
+        'Caloric Value': rng.uniform(50, 500, count),
+        'Protein': rng.uniform(0, 40, count),
+        'Carbohydrates': rng.uniform(0, 60, count),
+        'Fat': rng.uniform(0, 30, count),
+    }))
+
+
+def test_returns_best_plans_first(pool):
+    plans = generate_plans(pool, DAYS, MEALS, count=10, top_n=3, seed=1, workers=1)
+    assert len(plans) == 3
+    errors = [error for error, _ in plans]
+    assert errors == sorted(errors)
+    all_errors = sorted(error for error, _ in generate_plans(pool, DAYS, MEALS, count=10, top_n=10, seed=1, workers=1))
+    assert errors == all_errors[:3]
+
+
+def test_error_matches_plan(pool):
+    error, week = generate_plans(pool, DAYS, MEALS, count=4, seed=2, workers=1)[0]
+    assert set(week) == set(DAYS)
+    assert error == pytest.approx(MealPlanOptimizer(pool).week_error(week))
+
+
+def test_process_pool_gives_same_plans(pool):
+    serial = generate_plans(pool, DAYS, MEALS, count=20, top_n=5, seed=3, workers=1)
+    parallel = generate_plans(pool, DAYS, MEALS, count=20, top_n=5, seed=3, workers=2)
+    assert [error for error, _ in parallel] == [error for error, _ in serial]
+    for (_, serial_week), (_, parallel_week) in zip(serial, parallel):
+        assert serial_week['Monday']['Lunch'][0].tolist() == parallel_week['Monday']['Lunch'][0].tolist()
+
+
+def test_progress_is_reported_per_batch(pool):
+    progress = []
+    generate_plans(pool, DAYS, MEALS, count=20, seed=4, workers=1, progress=lambda done, total: progress.append((done, total)))
+    assert progress == [(8, 20), (16, 20), (20, 20)]
+
+
+def test_raising_from_progress_stops_the_pool(pool):
+    class Stop(Exception):
+        pass
+
+    def stop(done, total):
+        raise Stop()
+
+    with pytest.raises(Stop):
+        generate_plans(pool, DAYS, MEALS, count=40, seed=5, workers=2, progress=stop)
@@ -21,6 +21,7 @@ def setup_app():
         'Saturday': {'Breakfast': [{'name': 'Smoothie', 'calories': 180, 'protein': 5, 'carbs': 35, 'fat': 2}]},
         'Sunday': {'Breakfast': [{'name': 'Toast', 'calories': 80, 'protein': 3, 'carbs': 15, 'fat': 1}]},
     }
+    meal_plan_manager.get_totals.return_value = {'Caloric Value': 150, 'Protein': 5, 'Carbohydrates': 27, 'Fat': 3, 'Sodium': 0.1}
 
     meal_plan_logic = MealPlanFrameLogic(frame, meal_plan_manager)
 
@@ -62,8 +63,28 @@ def test_update_nutrient_summary(setup_app):
 def test_on_generate_random_meal_plan(setup_app):
     app = setup_app
     app.on_generate_random_meal_plan(None)
+    app.generation_task.future.result(timeout=10)  # Generated on a worker thread
+    wx.Yield()
     assert app.meal_plan_manager.clear_meal_plan.called
 
+def test_on_generate_best_plan(setup_app):
+    app = setup_app
+    app.meal_plan_manager.clear_meal_plan.reset_mock()
+    app.on_generate_best_plan(None)
+    assert app.best_plan_button.GetLabel() == "Cancel Generation"
+    app.generation_task.future.result(timeout=60)  # Worker processes, waited for on a worker thread
+    wx.Yield()
+    assert app.meal_plan_manager.clear_meal_plan.called
+    assert app.best_plan_button.GetLabel() == "Best of 64 Plans"
+
+def test_generate_best_plan_again_cancels(setup_app):
+    app = setup_app
+    app.on_generate_best_plan(None)
+    task = app.generation_task
+    app.on_generate_best_plan(None)
+    assert task.cancelled
+    assert app.generation_task is None
+
 def test_generate_balanced_meal(setup_app):
     app = setup_app
     selected_foods = app.generate_balanced_meal()
@@ -80,10 +101,9 @@ def test_on_add_food(setup_app, mocker):
 
 def test_on_remove_food(setup_app):
     app = setup_app
-    app.meal_plan_list.AppendRows(1)
-    app.meal_plan_list.SetCellValue(0, 0, 'Monday')
-    app.meal_plan_list.SetCellValue(0, 1, 'Breakfast')
-    app.meal_plan_list.SetCellValue(0, 2, 'Chicken')
+    app.meal_plan_table.set_entries({'Monday': {'Breakfast': [
+        {'handle': 0, 'name': 'Chicken', 'calories': 200, 'protein': 30, 'carbs': 0, 'fat': 8}]}})
+    app.meal_plan_list.SetGridCursor(0, 0)
 
     app.on_remove_food(None)
     assert app.meal_plan_manager.remove_food.called
@@ -108,3 +128,26 @@ def test_on_back_to_main_menu(setup_app, mocker):
 
     app.on_back_to_main_menu(None)
     mock_app().main_frame.Show.assert_called_once()
+
+def test_meal_plan_table_keeps_day_and_meal_order(setup_app):
+    table = setup_app.meal_plan_table
+    table.set_entries({'Monday': {'Breakfast': [{'handle': 0, 'name': 'Oatmeal', 'calories': 150, 'protein': 5, 'carbs': 27, 'fat': 3}],
+                                  'Dinner': [{'handle': 1, 'name': 'Steak', 'calories': 500, 'protein': 40, 'carbs': 0, 'fat': 30}]}})
+    row = table.insert_entry({'handle': 2, 'day': 'Monday', 'meal': 'Lunch', 'name': 'Salad',
+                              'calories': 100, 'protein': 2, 'carbs': 10, 'fat': 5})
+    assert row == 1
+    assert setup_app.meal_plan_list.GetNumberRows() == 3
+    assert table.GetValue(1, 2) == 'Salad'
+    table.delete_row(0)
+    assert table.get_handle(0) == 2
+    assert setup_app.meal_plan_list.GetNumberRows() == 2
+
+def test_bind_repository(setup_app, mocker):
+    app = setup_app
+    repository = app.repository
+    mocker.patch.object(app, 'update_meal_plan_display')
+    app.get_optimizer()
+    app.bind_repository(repository)
+    assert app.optimizer is None
+    assert app.generation_task is None
+    app.update_meal_plan_display.assert_called_once()
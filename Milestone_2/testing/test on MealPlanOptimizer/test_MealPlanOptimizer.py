@@ -0,0 +1,101 @@
+import time
+import pytest
+import numpy as np
+import pandas as pd
+from MealPlanOptimizer import MealPlanOptimizer, MealTargets, build_candidate_pool, within_tolerance
+from FoodSearchIndex import FoodSearchIndex
+
+MEALS = ['Breakfast', 'Lunch', 'Dinner', 'Snack']
+
+
+@pytest.fixture
+def food_data():
+    rng = np.random.default_rng(0)
+    count = 2000
+    return pd.DataFrame({
+        'food': [f"{'grilled' if i % 2 else 'raw'} food {i}" for i in range(count)],
+        'Caloric Value': rng.uniform(50, 500, count),
+        'Protein': rng.uniform(0, 40, count),
+        'Carbohydrates': rng.uniform(0, 60, count),
+        'Fat': rng.uniform(0, 30, count),
+    })
+
+
+def test_pool_only_holds_cooked_foods(food_data):
+    food_data.loc[1, 'Protein'] = np.nan  # Rows with missing nutrients cannot be scored
+    pool = build_candidate_pool(food_data)
+    assert len(pool) == 999
+    assert all('grilled' in name for name in food_data['food'].iloc[pool.rows])
+    assert pool.nutrients[0].tolist() == food_data.iloc[3, 1:].tolist()
+
+
+def test_pool_from_search_index_matches_scan(food_data):
+    food_data.loc[5, 'food'] = 'Pan FRIED fish'
+    indexed = build_candidate_pool(food_data, search_index=FoodSearchIndex(food_data['food']))
+    scanned = build_candidate_pool(food_data)
+    assert indexed.rows.tolist() == scanned.rows.tolist()
+    assert 5 in indexed.rows
+
+
+def test_meal_meets_targets(food_data):
+    optimizer = MealPlanOptimizer(build_candidate_pool(food_data))
+    rng = np.random.default_rng(1)
+    targets = MealTargets(calories=700, protein=40, carbs=60, fat=25, tolerance=0.1)
+    rows, portions, totals = optimizer.optimize_meal(targets, rng)
+    assert within_tolerance(totals, targets)
+    nutrients = food_data[['Caloric Value', 'Protein', 'Carbohydrates', 'Fat']].to_numpy()
+    assert totals == pytest.approx((nutrients[rows] * portions[:, None]).sum(axis=0))
+    assert len(set(rows.tolist())) == len(rows)
+
+
+def test_zero_target_is_scored_without_dividing_by_zero(food_data):
+    food_data['Carbohydrates'] = np.where(np.arange(len(food_data)) % 4 == 1, 0.0, food_data['Carbohydrates'])
+    optimizer = MealPlanOptimizer(build_candidate_pool(food_data))
+    targets = MealTargets(calories=400, protein=30, carbs=0, fat=15, tolerance=0.2)
+    with np.errstate(all='raise'):
+        rows, portions, totals = optimizer.optimize_meal(targets, np.random.default_rng(3))
+    assert len(rows) > 0
+    assert np.isfinite(optimizer.week_error({'Monday': {'Lunch': (rows, portions)}}, {'Lunch': targets}))
+    assert totals[2] == pytest.approx(0.0)
+
+
+def test_week_is_reproducible(food_data):
+    optimizer = MealPlanOptimizer(build_candidate_pool(food_data))
+    first = optimizer.generate_week(['Monday', 'Tuesday'], MEALS, seed=42)
+    second = optimizer.generate_week(['Monday', 'Tuesday'], MEALS, seed=42)
+    for day in first:
+        for meal in MEALS:
+            assert first[day][meal][0].tolist() == second[day][meal][0].tolist()
+            assert first[day][meal][1].tolist() == second[day][meal][1].tolist()
+
+
+def test_per_meal_targets(food_data):
+    optimizer = MealPlanOptimizer(build_candidate_pool(food_data))
+    snack = MealTargets(calories=200, protein=10, carbs=20, fat=8)
+    week = optimizer.generate_week(['Monday'], ['Snack', 'Dinner'], {'Snack': snack}, seed=3)
+    nutrients = food_data[['Caloric Value', 'Protein', 'Carbohydrates', 'Fat']].to_numpy()
+    rows, portions = week['Monday']['Snack']
+    assert within_tolerance((nutrients[rows] * portions[:, None]).sum(axis=0), snack)
+    rows, portions = week['Monday']['Dinner']  # Default targets
+    assert within_tolerance((nutrients[rows] * portions[:, None]).sum(axis=0), MealTargets())
+
+
+def test_empty_pool():
+    food_data = pd.DataFrame({'food': ['apple'], 'Caloric Value': [52.0], 'Protein': [0.3],
+                              'Carbohydrates': [14.0], 'Fat': [0.2]})
+    week = MealPlanOptimizer(build_candidate_pool(food_data)).generate_week(['Monday'], MEALS, seed=0)
+    assert all(len(rows) == 0 for rows, _ in week['Monday'].values())
+
+
+def test_week_is_fast_on_large_pool(food_data):
+    optimizer = MealPlanOptimizer(build_candidate_pool(pd.concat([food_data] * 100, ignore_index=True)))
+    start = time.perf_counter()
+    optimizer.generate_week(range(7), MEALS, seed=0)
+    assert time.perf_counter() - start < 1.0
+
+
+def test_week_reports_progress_per_day(food_data):
+    calls = []
+    optimizer = MealPlanOptimizer(build_candidate_pool(food_data))
+    optimizer.generate_week(['Monday', 'Tuesday', 'Wednesday'], MEALS, seed=0, progress=lambda *args: calls.append(args))
+    assert calls == [(1, 3), (2, 3), (3, 3)]
@@ -0,0 +1,73 @@
+import pytest
+import numpy as np
+import pandas as pd
+from NutrientFilter import NutrientFilter, NutrientRange
+from FoodSchema import SchemaError
+
+
+@pytest.fixture
+def nutrient_filter():
+    food_data = pd.DataFrame({
+        'food': ['Chicken', 'Tofu', 'Pasta', 'Salmon'],
+        'Protein': [30.0, 8.0, 5.0, 20.0],
+        'Carbohydrates': [0.0, 2.0, 25.0, 0.0],
+        'Fat': [5.0, 3.0, 1.0, np.nan],
+    })
+    return NutrientFilter(food_data)
+
+
+def test_find_column(nutrient_filter):
+    assert nutrient_filter.find_column('Protein') == 'Protein'
+    assert nutrient_filter.find_column('carbohydrates') == 'Carbohydrates'
+    assert nutrient_filter.apply([NutrientRange('Carbs', maximum=1)]).tolist() == [0, 3]
+    for name in ['Sodium', 'carbohydrate', 'Prot']:  # Missing columns and partial names do not resolve
+        with pytest.raises(SchemaError):
+            nutrient_filter.find_column(name)
+
+
+def test_no_ranges_matches_everything(nutrient_filter):
+    assert nutrient_filter.apply([]).tolist() == [0, 1, 2, 3]
+
+
+def test_inclusive_and_exclusive_bounds(nutrient_filter):
+    assert nutrient_filter.apply([NutrientRange('Protein', minimum=20)]).tolist() == [0, 3]
+    assert nutrient_filter.apply([NutrientRange('Protein', minimum=20, inclusive=False)]).tolist() == [0]
+
+
+def test_multiple_ranges(nutrient_filter):
+    ranges = [
+        NutrientRange('Protein', minimum=4, maximum=25),
+        NutrientRange('Carbohydrates', maximum=20),
+        NutrientRange('Fat', maximum=5),
+    ]
+    assert nutrient_filter.apply(ranges).tolist() == [1], "Missing values should never match a range."
+
+
+def test_mask_does_not_change_dataset(nutrient_filter):
+    before = nutrient_filter.food_data.copy()
+    nutrient_filter.mask([NutrientRange('Fat', maximum=2)])
+    pd.testing.assert_frame_equal(before, nutrient_filter.food_data)
+
+
+def test_apply_matches_mask(nutrient_filter):
+    ranges = [NutrientRange('Protein', minimum=5, maximum=30, inclusive=False), NutrientRange('Fat', minimum=1)]
+    expected = np.flatnonzero(nutrient_filter.mask(ranges))
+    assert nutrient_filter.apply(ranges).tolist() == expected.tolist() == [1]
+
+
+def test_sorted_index_is_built_lazily(nutrient_filter):
+    assert nutrient_filter.sorted_indexes == {}
+    nutrient_filter.apply([NutrientRange('Protein', minimum=10)])
+    assert list(nutrient_filter.sorted_indexes) == ['Protein']
+
+
+def test_range_with_no_rows(nutrient_filter):
+    assert nutrient_filter.apply([NutrientRange('Protein', minimum=50)]).tolist() == []
+    assert nutrient_filter.apply([NutrientRange('Protein', minimum=20, maximum=10)]).tolist() == []
+
+
+def test_top_n(nutrient_filter):
+    assert nutrient_filter.top_n('Protein', 2).tolist() == [0, 3]
+    assert nutrient_filter.top_n('Carbohydrates', 1).tolist() == [2]
+    assert nutrient_filter.top_n('Protein', 2, largest=False).tolist() == [2, 1]
+    assert nutrient_filter.top_n('Fat', 10).tolist() == [0, 1, 2], "Missing values should not be ranked."
@@ -0,0 +1,76 @@
+import pytest
+import numpy as np
+import pandas as pd
+from NutrientMatrixStore import load_nutrient_matrix
+
+
+@pytest.fixture
+def dataset_file(tmp_path):
+    file_path = tmp_path / "foods.csv"
+    pd.DataFrame({
+        'food': ['apple', 'banana', 'chicken'],
+        'Caloric Value': [52, 89, 239],
+        'Protein': [0.3, 1.1, 27.3],
+        'Fat': [0.2, 0.3, 13.6],
+    }).to_csv(file_path, index=False)
+    return str(file_path)
+
+
+def test_build_and_reopen_store(dataset_file):
+    matrix, from_store = load_nutrient_matrix(dataset_file)
+    assert not from_store
+    reopened, from_store = load_nutrient_matrix(dataset_file)
+    assert from_store
+    assert isinstance(reopened.matrix, np.memmap)
+    assert reopened.matrix.dtype == np.float32
+    assert reopened.matrix.shape == (3, 3)
+    assert reopened.matrix.flags['C_CONTIGUOUS']
+    assert reopened.names.tolist() == ['apple', 'banana', 'chicken']
+
+
+def test_small_chunks_build_the_same_matrix(dataset_file, tmp_path):
+    from NutrientMatrixStore import build_store, open_store
+    metadata = build_store(dataset_file, str(tmp_path / "chunked.store"), chunk_size=1)
+    matrix = open_store(str(tmp_path / "chunked.store"), metadata)
+    np.testing.assert_allclose(matrix.matrix[2], [239, 27.3, 13.6], rtol=1e-6)
+
+
+def test_reopened_store_maps_names_and_search_index(dataset_file):
+    built, _ = load_nutrient_matrix(dataset_file)
+    reopened, from_store = load_nutrient_matrix(dataset_file)
+    assert from_store
+    assert isinstance(reopened.names, np.memmap)
+    assert isinstance(reopened.search_index.gram_rows, np.memmap)
+    assert isinstance(reopened.column_values(2), np.memmap)
+    for query in ['an', 'chicken', 'bananna']:
+        assert reopened.search_index.ranked_search(query)[0].tolist() == built.search_index.ranked_search(query)[0].tolist()
+    assert reopened.search_index.prefix_search('b').tolist() == [1]
+
+
+def test_to_frame_does_not_copy_matrix(dataset_file):
+    matrix, _ = load_nutrient_matrix(dataset_file)
+    food_data = matrix.to_frame()
+    assert food_data.columns.tolist() == ['food', 'Caloric Value', 'Protein', 'Fat']
+    assert np.shares_memory(food_data['Protein'].to_numpy(), matrix.matrix)
+    assert food_data[food_data['Protein'] > 20]['food'].tolist() == ['chicken']
+
+
+def test_changed_csv_rebuilds_store(dataset_file):
+    load_nutrient_matrix(dataset_file)
+    with open(dataset_file, 'a') as f:
+        f.write("rice,130,2.7,0.3\n")
+    matrix, from_store = load_nutrient_matrix(dataset_file)
+    assert not from_store
+    assert len(matrix) == 4
+
+
+def test_header_only_csv_builds_empty_store(tmp_path):
+    file_path = str(tmp_path / "empty.csv")
+    with open(file_path, 'w') as f:
+        f.write("food,Caloric Value,Protein\n")
+    matrix, from_store = load_nutrient_matrix(file_path)
+    assert not from_store
+    assert matrix.matrix.shape == (0, 2)
+    reopened, from_store = load_nutrient_matrix(file_path)
+    assert from_store
+    assert reopened.to_frame().columns.tolist() == ['food', 'Caloric Value', 'Protein']
@@ -0,0 +1,60 @@
+import pytest
+import numpy as np
+from QueryCache import QueryCache
+from NutrientFilter import NutrientRange
+
+
+def rows(count):
+    return (np.arange(count, dtype=np.int64),)
+
+
+def test_make_key_normalizes_query_and_filters():
+    protein = NutrientRange('Protein', minimum=20)
+    fat = NutrientRange('Fat', maximum=5)
+    assert QueryCache.make_key('Apple', [protein, fat], 1) == QueryCache.make_key('apple', [fat, protein], 1)
+    assert QueryCache.make_key('apple', [], 1) != QueryCache.make_key('apple', [], 2)
+    both_bounds = [NutrientRange('Protein', maximum=30), NutrientRange('Protein', minimum=20)]
+    assert QueryCache.make_key('', both_bounds, 1) == QueryCache.make_key('', both_bounds[::-1], 1)
+
+
+def test_hits_and_misses():
+    cache = QueryCache()
+    assert cache.get('a') is None
+    cache.put('a', rows(3))
+    assert cache.get('a')[0].tolist() == [0, 1, 2]
+    stats = cache.get_stats()
+    assert stats['hits'] == 1 and stats['misses'] == 1
+    assert stats['hit_rate'] == 0.5
+
+
+def test_cached_arrays_are_read_only():
+    cache = QueryCache()
+    cache.put('a', rows(3))
+    with pytest.raises(ValueError):
+        cache.get('a')[0][0] = 5
+
+
+def test_least_recently_used_is_evicted():
+    cache = QueryCache(max_bytes=rows(10)[0].nbytes * 2)
+    cache.put('a', rows(10))
+    cache.put('b', rows(10))
+    cache.get('a')
+    cache.put('c', rows(10))
+    assert cache.get('b') is None, "b was used least recently, so it should be evicted."
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.get_stats()['evictions'] == 1
+    assert cache.get_stats()['bytes'] <= cache.max_bytes
+
+
+def test_value_larger_than_cache_is_not_stored():
+    cache = QueryCache(max_bytes=8)
+    cache.put('a', rows(10))
+    assert cache.get_stats()['entries'] == 0
+
+
+def test_get_or_compute(mocker):
+    cache = QueryCache()
+    compute = mocker.Mock(return_value=rows(2))
+    cache.get_or_compute('a', compute)
+    cache.get_or_compute('a', compute)
+    compute.assert_called_once()
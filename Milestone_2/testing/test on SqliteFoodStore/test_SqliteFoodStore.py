@@ -0,0 +1,114 @@
+import pytest
+import numpy as np
+import pandas as pd
+from SqliteFoodStore import open_food_store, build_database, SqliteFoodStore, PAGE_SIZE
+from FoodSearchIndex import FoodSearchIndex
+from FoodRecord import FoodRecordReader
+from NutrientFilter import NutrientFilter, NutrientRange
+from MealPlanOptimizer import build_candidate_pool
+from FoodSchema import SchemaError
+
+
+@pytest.fixture
+def dataset_file(tmp_path):
+    file_path = tmp_path / "foods.csv"
+    pd.DataFrame({
+        'food': ['Apple Pie', 'apple', 'Baked Apple', 'Grilled Chicken', 'Banana', '50%_fat cheese'],
+        'Caloric Value': [237, 52, 90, 239, 89, 300],
+        'Protein': [2.0, 0.3, 0.5, 27.3, 1.1, None],
+        'Carbohydrates': [34.0, 14.0, 22.0, 0.0, 23.0, 1.0],
+        'Fat': [11.0, 0.2, 0.3, 14.0, 0.3, 25.0],
+    }).to_csv(file_path, index=False)
+    return str(file_path)
+
+
+def test_build_and_reopen_database(dataset_file):
+    store, from_database = open_food_store(dataset_file)
+    assert not from_database
+    assert len(store) == 6
+    assert store.columns == ['food', 'Caloric Value', 'Protein', 'Carbohydrates', 'Fat']
+    reopened, from_database = open_food_store(dataset_file)
+    assert from_database
+    assert reopened.head(2)['food'].tolist() == ['Apple Pie', 'apple']
+
+
+def test_changed_csv_rebuilds_database(dataset_file):
+    open_food_store(dataset_file)
+    with open(dataset_file, 'a') as f:
+        f.write("Rice,130,2.7,28.0,0.3\n")
+    store, from_database = open_food_store(dataset_file)
+    assert not from_database
+    assert len(store) == 7
+    assert store.search('rice').tolist() == [6]
+
+
+def test_ranked_search_matches_in_memory_index(dataset_file):
+    store, _ = open_food_store(dataset_file)
+    index = FoodSearchIndex(pd.read_csv(dataset_file)['food'].tolist())
+    for query in ['apple', 'Apple', 'ap', 'a', 'chicken', '%_f', 'missing']:
+        rows, scores = store.ranked_search(query)
+        expected_rows, expected_scores = index.rank(query, index.search(query))
+        assert rows.tolist() == expected_rows.tolist(), query
+        np.testing.assert_allclose(scores, expected_scores)
+        assert store.search(query).tolist() == index.search(query).tolist(), query
+
+
+def test_ranked_search_pages(dataset_file):
+    store, _ = open_food_store(dataset_file)
+    rows, _ = store.ranked_search('a')
+    first, _ = store.ranked_search('a', limit=2)
+    second, _ = store.ranked_search('a', limit=2, offset=2)
+    assert first.tolist() + second.tolist() == rows[:4].tolist()
+
+
+def test_filters_match_nutrient_filter(dataset_file):
+    store, _ = open_food_store(dataset_file)
+    nutrient_filter = NutrientFilter(pd.read_csv(dataset_file))
+    for ranges in [[], [NutrientRange('Protein', 1)], [NutrientRange('Calories', 80, 240), NutrientRange('Fat', maximum=1)],
+                   [NutrientRange('Fat', 0.3, 0.3, inclusive=False)]]:
+        assert store.apply(ranges).tolist() == nutrient_filter.apply(ranges).tolist(), ranges
+    assert store.apply([NutrientRange('Fat', 1)], limit=2, offset=1).tolist() == [3, 5]
+    with pytest.raises(SchemaError):
+        store.apply([NutrientRange('Vitamin C', 1)])
+    with pytest.raises(SchemaError):
+        store.apply([NutrientRange('calor', 1)])
+
+
+def test_candidate_pool_matches_build_candidate_pool(dataset_file):
+    store, _ = open_food_store(dataset_file)
+    food_data = pd.read_csv(dataset_file)
+    for keywords in [['baked', 'grilled'], ['pie', 'ch']]:
+        pool = store.candidate_pool(keywords)
+        expected = build_candidate_pool(food_data, keywords)
+        assert pool.rows.tolist() == expected.rows.tolist()
+        np.testing.assert_allclose(pool.nutrients, expected.nutrients, rtol=1e-6)
+
+
+def test_columns_read_rows_through_page_cache(tmp_path):
+    file_path = tmp_path / "many.csv"
+    count = PAGE_SIZE * 2 + 5
+    pd.DataFrame({'food': [f'food {i}' for i in range(count)], 'Protein': np.arange(count)}).to_csv(file_path, index=False)
+    database_path = str(tmp_path / "many.sqlite")
+    build_database(str(file_path), database_path, chunk_size=100)
+    store = SqliteFoodStore(database_path)
+    protein = store.column_values(1)
+    assert len(protein) == count
+    assert protein[count - 1] == count - 1
+    assert protein[[0, PAGE_SIZE, count - 1]].tolist() == [0, PAGE_SIZE, count - 1]
+    assert store.column_values(0)[PAGE_SIZE + 1] == f'food {PAGE_SIZE + 1}'
+    assert len(store.pages) == 3
+    with pytest.raises(IndexError):
+        protein[count]
+
+
+def test_missing_values_read_as_nan(dataset_file):
+    store, _ = open_food_store(dataset_file)
+    assert np.isnan(store.column_values(2)[5])
+    record = FoodRecordReader(store).read(3)
+    assert record.name == 'Grilled Chicken'
+    assert record.protein == pytest.approx(27.3)
+
+
+def test_column_stats(dataset_file):
+    stats = open_food_store(dataset_file)[0].column_stats()
+    assert stats.get('Protein') == pytest.approx({'count': 5, 'minimum': 0.3, 'maximum': 27.3, 'mean': 6.24})
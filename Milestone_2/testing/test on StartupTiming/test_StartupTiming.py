@@ -0,0 +1,19 @@
+import StartupTiming
+
+
+def test_marks_are_kept_once_in_order():
+    StartupTiming.reset()
+    StartupTiming.mark("main window shown")
+    StartupTiming.mark("dataset loaded")
+    StartupTiming.mark("main window shown")  # Repeated marks are ignored
+    marks = StartupTiming.get_marks()
+    assert [label for label, _ in marks] == ["main window shown", "dataset loaded"]
+    assert 0 <= marks[0][1] <= marks[1][1]
+
+
+def test_report():
+    StartupTiming.reset()
+    StartupTiming.mark("imports done")
+    report = StartupTiming.report().splitlines()
+    assert report[0] == "Startup timing:"
+    assert report[1].endswith("ms  imports done")
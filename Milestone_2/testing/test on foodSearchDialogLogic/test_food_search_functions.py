@@ -46,29 +46,40 @@ def test_on_search(food_search_dialog, mocker):
 def test_display_results(food_search_dialog):
     # Sample data
     results = pd.DataFrame({
-        'Food': ['Apple', 'Banana'],
-        'Calories': [52, 96],
-        'Protein': [0.3, 1.3],
-        'Carbs': [14, 27],
-        'Fat': [0.2, 0.3]
+        'food': ['Apple', 'Banana'],
+        'Caloric Value': [52, 96],
+        'Fat': [0.2, 0.3],
+        'Sugars': [10.4, 12.2],
+        'Carbohydrates': [14, 27],
+        'Protein': [0.3, 1.3]
     })
 
     food_search_dialog.display_results(results)
 
-    # Check if rows are populated
+    # Check if rows are populated, with only the name and macro columns in a fixed order
     assert food_search_dialog.food_list.GetNumberRows() == 2
+    assert food_search_dialog.food_list.GetNumberCols() == 5
+    assert food_search_dialog.food_list.GetColLabelValue(2) == 'Protein'
     assert food_search_dialog.food_list.GetCellValue(0, 0) == 'Apple'
     assert food_search_dialog.food_list.GetCellValue(1, 0) == 'Banana'
 
 
 def test_on_select_food(food_search_dialog, mocker):
     # Mocking grid selection
+    food_search_dialog.display_results(pd.DataFrame({
+        'food': ['Apple'],
+        'Caloric Value': [52.0],
+        'Fat': [0.2],
+        'Carbohydrates': [14.0],
+        'Protein': [0.3]
+    }))
     mocker.patch.object(food_search_dialog.food_list, 'GetGridCursorRow', return_value=0)
-    mocker.patch.object(food_search_dialog.food_list, 'GetCellValue', side_effect=['Apple', '52', '0.3', '14', '0.2'])
+    mocker.patch.object(food_search_dialog, 'EndModal')
 
     food_search_dialog.on_select_food(None)
 
-    # Validate the selected food details
+    # Values come from the dataset row, not from the grid's cell text
+    assert food_search_dialog.selected_food.row_id == 0
     assert food_search_dialog.selected_food['name'] == 'Apple'
     assert food_search_dialog.selected_food['calories'] == 52.0
     assert food_search_dialog.selected_food['protein'] == 0.3
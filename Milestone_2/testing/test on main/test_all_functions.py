@@ -1,8 +1,10 @@
 import pytest
 from all_functions import (
     load_food_dataset, create_empty_meal_plan, generate_meal_plan_string,
-    add_food, remove_food, change_food, clear_meal_plan, clear_meal_plan_for_day
+    add_food, remove_food, change_food, clear_meal_plan, clear_meal_plan_for_day,
+    MealPlanManager
 )
+import pandas as pd
 
 # Test for load_food_dataset
 def test_load_food_dataset():
@@ -134,3 +136,138 @@ def test_clear_empty_day():
     meal_plan = create_empty_meal_plan()
     clear_meal_plan_for_day(meal_plan, 'Monday')  # Clear an already empty day
     assert all(len(meal_plan['Monday'][meal]) == 0 for meal in meal_plan['Monday']), "Clearing an empty day should not cause errors."
+
+
+@pytest.fixture
+def food_dataset():
+    return pd.DataFrame({
+        'food': ['Oatmeal', 'Pancakes', 'Eggs'],
+        'Caloric Value': [150.0, 200.0, 140.0],
+        'Fat': [3.0, 8.0, 10.0],
+        'Carbohydrates': [27.0, 35.0, 1.0],
+        'Protein': [5.0, 6.0, 12.0],
+    })
+
+# Tests for MealPlanManager
+def test_manager_add_food(food_dataset):
+    manager = MealPlanManager(food_dataset)
+    handle = manager.add_food('Monday', 'Breakfast', 0, quantity=2)
+    entry = manager.get_entry(handle)
+    assert entry['name'] == 'Oatmeal'
+    assert entry['calories'] == 300.0
+    assert (entry['day'], entry['meal']) == ('Monday', 'Breakfast')
+    assert manager.get_meal_plan()['Monday']['Breakfast'] == [entry]
+
+def test_manager_add_food_dict(food_dataset):
+    manager = MealPlanManager(food_dataset)
+    handle = manager.add_food('Monday', 'Lunch', {'row_id': 2, 'name': 'Eggs'})
+    assert manager.get_entry(handle)['protein'] == 12.0
+    with pytest.raises(ValueError):
+        manager.add_food('Monday', 'Lunch', {'name': 'Eggs'})  # No dataset row to refer to
+
+def test_manager_remove_food(food_dataset):
+    manager = MealPlanManager(food_dataset)
+    first = manager.add_food('Monday', 'Breakfast', 0)
+    second = manager.add_food('Monday', 'Breakfast', 0)  # Same food twice, removed by handle
+    manager.remove_food(first)
+    assert manager.get_meal_entries('Monday', 'Breakfast') == [second]
+    assert len(manager) == 1
+    with pytest.raises(KeyError):
+        manager.remove_food(first)
+
+def test_manager_change_food(food_dataset):
+    manager = MealPlanManager(food_dataset)
+    manager.add_food('Monday', 'Breakfast', 2)
+    handle = manager.add_food('Monday', 'Breakfast', 0)
+    manager.add_food('Monday', 'Breakfast', 2)
+    manager.change_food(handle, 1)
+    names = [food['name'] for food in manager.get_meal_plan()['Monday']['Breakfast']]
+    assert names == ['Eggs', 'Pancakes', 'Eggs']
+
+def test_manager_grows_and_reuses_slots(food_dataset):
+    manager = MealPlanManager(food_dataset)
+    handles = [manager.add_food('Sunday', 'Snack', i % 3) for i in range(200)]
+    assert len(manager) == 200
+    manager.remove_food(handles[10])
+    assert manager.add_food('Sunday', 'Dinner', 1) == handles[10]
+
+def test_manager_clear(food_dataset):
+    manager = MealPlanManager(food_dataset)
+    manager.add_food('Monday', 'Breakfast', 0)
+    manager.add_food('Tuesday', 'Lunch', 1)
+    manager.clear_meal_plan_for_day('Monday')
+    assert manager.get_meal_entries('Monday', 'Breakfast') == []
+    assert len(manager) == 1
+    manager.clear_meal_plan()
+    assert len(manager) == 0
+
+def test_manager_totals(food_dataset):
+    manager = MealPlanManager(food_dataset)
+    oatmeal = manager.add_food('Monday', 'Breakfast', 0)
+    manager.add_food('Monday', 'Lunch', 2, quantity=2)
+    manager.add_food('Tuesday', 'Dinner', 1)
+    assert manager.get_totals('Monday', 'Breakfast')['Caloric Value'] == 150.0
+    assert manager.get_totals('Monday') == {'Caloric Value': 430.0, 'Fat': 23.0, 'Carbohydrates': 29.0, 'Protein': 29.0}
+    assert manager.get_totals()['Caloric Value'] == 630.0
+
+    manager.change_food(oatmeal, 1)
+    assert manager.get_totals('Monday')['Caloric Value'] == 480.0
+    manager.remove_food(oatmeal)
+    assert manager.get_totals('Monday', 'Breakfast')['Caloric Value'] == 0.0
+    assert manager.get_totals()['Caloric Value'] == 480.0
+    manager.clear_meal_plan_for_day('Tuesday')
+    assert manager.get_totals('Tuesday')['Caloric Value'] == 0.0
+    manager.clear_meal_plan()
+    assert not any(manager.get_totals().values())
+
+def test_manager_totals_match_entries(food_dataset):
+    manager = MealPlanManager(food_dataset)
+    handles = [manager.add_food(day, 'Snack', i % 3, quantity=0.1 * i) for i, day in enumerate(['Monday', 'Friday'] * 20)]
+    for handle in handles[::3]:
+        manager.remove_food(handle)
+    entries = [food for meals in manager.get_meal_plan().values() for foods in meals.values() for food in foods]
+    assert manager.get_totals()['Fat'] == pytest.approx(sum(food['fat'] for food in entries))
+
+def test_manager_all_nutrients(food_dataset):
+    food_dataset['Sodium'] = [2.0, 400.0, 140.0]
+    manager = MealPlanManager(food_dataset)
+    handle = manager.add_food('Monday', 'Breakfast', 1, quantity=0.5)
+    entry = manager.get_entry(handle, all_nutrients=True)
+    assert entry['nutrients']['Sodium'] == 200.0
+    assert entry['calories'] == 100.0
+    assert manager.get_totals()['Sodium'] == 200.0
+
+def test_manager_compute_totals(food_dataset):
+    manager = MealPlanManager(food_dataset)
+    for i, day in enumerate(['Monday', 'Wednesday', 'Sunday'] * 10):
+        handle = manager.add_food(day, ['Lunch', 'Snack'][i % 2], i % 3, quantity=1 + i % 4)
+        if i % 5 == 0:
+            manager.change_food(handle, (i + 1) % 3)
+        elif i % 7 == 0:
+            manager.remove_food(handle)
+    meal_totals, day_totals, week_totals = manager.compute_totals()
+    assert meal_totals == pytest.approx(manager.meal_totals)
+    assert day_totals == pytest.approx(manager.day_totals)
+    assert week_totals == pytest.approx(manager.week_totals)
+
+def test_manager_set_dataset_moves_entries_by_name(food_dataset):
+    manager = MealPlanManager(food_dataset)
+    eggs = manager.add_food('Monday', 'Breakfast', 2, quantity=2)
+    pancakes = manager.add_food('Tuesday', 'Lunch', 1)
+    reloaded = pd.DataFrame({
+        'food': ['Eggs', 'Oatmeal', 'Toast'],
+        'Caloric Value': [150.0, 150.0, 80.0],
+        'Fat': [10.0, 3.0, 1.0],
+        'Carbohydrates': [1.0, 27.0, 15.0],
+        'Protein': [12.0, 5.0, 3.0],
+        'Sodium': [0.1, 0.0, 0.2],
+    })
+    names = reloaded['food'].tolist()
+    removed = manager.set_dataset(reloaded, lambda foods: [names.index(name) if name in names else -1 for name in foods])
+    assert removed == 1
+    assert len(manager) == 1
+    assert manager.get_entry(eggs)['row_id'] == 0
+    assert manager.get_entry(eggs)['calories'] == 300
+    assert manager.get_meal_entries('Tuesday', 'Lunch') == []
+    assert manager.get_totals()['Sodium'] == pytest.approx(0.2)
+    assert pancakes in manager.free_slots